@@ -0,0 +1,44 @@
+# gcody benchmark comparing saving and loading a program as text and as a binary file
+
+from time import time
+from os import path, remove
+from numpy import array_equal
+from gcody import read, readbin
+
+
+# creating parameters
+name = path.join(path.dirname(path.abspath(__file__)), 'elefante_support.gcode')
+code = read(name)
+
+print('{:>16} {:>12} {:>10} {:>10}'.format('format', 'size (kB)', 'save (s)', 'load (s)'))
+
+# the text path parses every line again
+start = time()
+code.save('bench.gcode')
+t_save = time() - start
+
+start = time()
+text = read('bench.gcode')
+t_load = time() - start
+print('{:>16} {:>12.0f} {:>10.3f} {:>10.3f}'.format('text', path.getsize('bench.gcode')/1e3, t_save, t_load))
+
+# the binary files are mapped or decompressed without parsing
+for compress in [False, True]:
+
+    start = time()
+    code.save('bench.gcb', format='binary', compress=compress)
+    t_save = time() - start
+
+    start = time()
+    binary = readbin('bench.gcb')
+    t_load = time() - start
+
+    # both ways give back the same program
+    assert binary.code == text.code == code.code
+    assert array_equal(binary.history, code.history)
+
+    label = 'binary (zlib)' if compress else 'binary'
+    print('{:>16} {:>12.0f} {:>10.3f} {:>10.3f}'.format(label, path.getsize('bench.gcb')/1e3, t_save, t_load))
+
+remove('bench.gcode')
+remove('bench.gcb')
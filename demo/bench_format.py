@@ -0,0 +1,58 @@
+# gcody benchmark comparing the number formatters of gsettings to str.format
+
+from timeit import timeit
+from numpy.random import RandomState
+from gcody.gformat import gformat
+
+
+# creating parameters
+n = 1000000
+repeat = 3
+
+# random coordinates between -200 and 200 like those of a print bed
+x = (RandomState(0).rand(n) - 0.5) * 400
+
+print('{:>10} {:>14} {:>14} {:>8}'.format('format', 'str.format (s)', 'gformat (s)', 'speedup'))
+
+# comparing the formatters at several precisions
+for spec in ['{:0.0f}', '{:0.2f}', '{:0.3f}', '{:0.4f}', '{:0.6f}', '{:0.8f}']:
+
+    f = gformat(spec)
+
+    # both must give exactly the same strings
+    assert f.format_array(x) == list(map(spec.format, x.tolist()))
+
+    # timing formatting the whole array
+    t_str = timeit(lambda: list(map(spec.format, x.tolist())), number=repeat) / repeat
+    t_fast = timeit(lambda: f.format_array(x), number=repeat) / repeat
+
+    print('{:>10} {:>14.3f} {:>14.3f} {:>7.1f}x'.format(spec, t_str, t_fast, t_str/t_fast))
+
+
+# writing a program with the smaller output settings. Every form must read back to
+# the same motion history, times, and filament as the full form
+from os import path
+from numpy import array_equal, allclose
+from gcody import read, gsettings
+
+name = path.join(path.dirname(path.abspath(__file__)), 'elefante_small.gcode')
+code = read(name)
+full = read(list(code.lines()))
+
+print()
+print('{:>22} {:>10} {:>10}'.format('settings', 'bytes', 'render (s)'))
+
+for label, settings in [('full', gsettings()),
+                        ('compact', gsettings(compact=True)),
+                        ('compact, omit_axes', gsettings(compact=True, omit_axes=True)),
+                        ('modal', gsettings(modal=True)),
+                        ('compact, modal', gsettings(compact=True, modal=True))]:
+
+    t_render = timeit(lambda: list(code.lines(settings)), number=repeat) / repeat
+    lines = list(code.lines(settings))
+
+    back = read(lines)
+    assert array_equal(back.history, full.history)
+    assert allclose(back.t, full.t) and allclose(back.extrusion, full.extrusion)
+
+    print('{:>22} {:>10} {:>10.3f}'.format(label, sum(map(len, lines)), t_render))
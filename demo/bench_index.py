@@ -0,0 +1,51 @@
+# gcody benchmark comparing the spatial index of a program to a scan of every motion
+
+from time import time
+from os import path
+from numpy import vstack, zeros, allclose
+from numpy.random import default_rng
+from gcody import read
+from gcody.simplify import distance
+
+
+# creating parameters
+name = path.join(path.dirname(path.abspath(__file__)), 'elefante_support.gcode')
+code = read(name)
+rng = default_rng(0)
+
+# points near the path, like points clicked in a view
+history = code.history
+points = history[rng.integers(0, len(history), 1000)] + rng.normal(0, 0.5, (1000, 3))
+
+start = time()
+index = code.spatial_index()
+t_build = time() - start
+print('{} motions, built {} in {:.3f} s'.format(len(history), index, t_build))
+
+# the index only measures the segments in the cells around each point
+start = time()
+moves, dist = code.pick(points)
+t_index = time() - start
+
+# the scan measures every segment from every point
+ends = vstack((zeros(3), history))
+start = time()
+scan = [distance(p[:, None].repeat(len(history), axis=1), ends[:-1].T, ends[1:].T).min() for p in points[:100]]
+t_scan = (time() - start)*len(points)/100
+
+assert allclose(scan, dist[:100])
+print('{:>16} {:>12}'.format('method', 'pick (s)'))
+print('{:>16} {:>12.3f}'.format('scan', t_scan))
+print('{:>16} {:>12.3f}'.format('index', t_index))
+
+# the segments of one layer that overlap other segments of the layer
+layer = code.layer(code.layer_count//2)
+start = time()
+first, second, gap = layer.spatial_index().pairs(0.0)
+print('{} crossing segments in layer {} in {:.3f} s'.format(len(first), layer.first, time() - start))
+
+# the motions under clicks in a view, found along vertical lines of sight
+start = time()
+for p in points[:100]:
+    index.along(p - [0, 0, 100], p + [0, 0, 100])
+print('{:.2f} ms per line of sight'.format((time() - start)*10))
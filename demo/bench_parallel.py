@@ -0,0 +1,37 @@
+# gcody benchmark of making the layers of a program in several processes
+
+from time import time
+from functools import partial
+from os import cpu_count
+from gcody import gcode, generate
+
+
+# one layer of a square zig zag. Each move is written by itself so making the layer
+# takes a while
+def layer(k, g, n=20000):
+    z = 0.2*(k + 1)
+    g.move(0, 0, z, speed=100)
+    for i in range(n):
+        g.move(float(i % 100), float(i // 100), z, speed=20, extrude=g.extrude_pos + 0.01)
+
+
+if __name__ == '__main__':
+
+    # creating parameters
+    layers = 16
+
+    # making every layer in this process
+    start = time()
+    g = gcode()
+    for k in range(layers):
+        layer(k, g)
+    t_one = time() - start
+
+    print('{:>10} {:>10} {:>10} {:>8}'.format('processes', 'lines', 'time (s)', 'speedup'))
+    print('{:>10} {:>10} {:>10.3f} {:>7.1f}x'.format('serial', len(g), t_one, 1))
+
+    for processes in sorted({2, cpu_count() or 1}):
+        start = time()
+        p = generate([partial(layer, k) for k in range(layers)], processes=processes)
+        t = time() - start
+        print('{:>10} {:>10} {:>10.3f} {:>7.1f}x'.format(processes, len(p), t, t_one/t))
@@ -0,0 +1,49 @@
+# gcody benchmark of simplifying dense toolpaths with a chordal tolerance and
+# of replacing them with arcs
+
+from time import time
+from numpy import linspace, column_stack, cos, sin, pi, full, round
+from gcody import gcode
+
+
+# creating parameters
+n = 1000000
+tol = 1e-3
+
+# a dense flat spiral like a finely tessellated curved wall
+theta = linspace(0, 40*pi, n)
+r = 20 + theta/(40*pi)
+path = column_stack((r*cos(theta), r*sin(theta), full(n, 0.2)))
+
+print('{:>22} {:>10} {:>10} {:>14} {:>10}'.format('case', 'lines', 'removed', 'deviation', 'time (s)'))
+
+# simplifying the array before it is written
+g = gcode()
+start = time()
+removed, deviation = g.move(path, speed=30, extrude=full(n, 0.01), simplify=tol)
+print('{:>22} {:>10} {:>10} {:>14.3e} {:>10.3f}'.format('move(simplify=tol)', n, removed, deviation, time() - start))
+
+# simplifying the whole program after it is written
+g = gcode()
+g.rel_extrude()
+g.move(path, speed=30, extrude=full(n, 0.01))
+start = time()
+removed, deviation = g.simplify(tol)
+print('{:>22} {:>10} {:>10} {:>14.3e} {:>10.3f}'.format('gcode.simplify(tol)', n, removed, deviation, time() - start))
+
+# replacing the spiral with arcs
+g = gcode()
+g.rel_extrude()
+g.move(path, speed=30, extrude=full(n, 0.01))
+start = time()
+arcs, removed, deviation = g.fit_arcs(tol)
+print('{:>22} {:>10} {:>10} {:>14.3e} {:>10.3f}'.format('gcode.fit_arcs(tol)', n, removed, deviation, time() - start))
+
+# the same spiral written with 4 decimals, like a GCODE file that is read. The
+# rounding makes small turns the other way that should not split the arcs
+g = gcode()
+g.rel_extrude()
+g.move(round(path, 4), speed=30, extrude=full(n, 0.01))
+start = time()
+arcs, removed, deviation = g.fit_arcs(tol)
+print('{:>22} {:>10} {:>10} {:>14.3e} {:>10.3f}'.format('fit_arcs(tol), rounded', n, removed, deviation, time() - start))
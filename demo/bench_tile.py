@@ -0,0 +1,47 @@
+# gcody benchmark of tiling copies of a program across the bed. Saving the tiles
+# makes the lines of each copy as they are written, so the memory used does not
+# grow with the number of copies
+
+from time import time
+from os import path, remove
+from tracemalloc import start as trace, stop, get_traced_memory
+from gcody import read
+
+
+# creating parameters
+name = path.join(path.dirname(path.abspath(__file__)), 'elefante_small.gcode')
+code = read(name)
+
+print('{:>22} {:>8} {:>12} {:>12} {:>10}'.format('case', 'copies', 'size (kB)', 'peak (MB)', 'time (s)'))
+
+# gives the time taken by F and the most memory allocated while it runs. The time
+# is measured first since tracing the memory slows it down
+def measure(f):
+
+    start = time()
+    f()
+    elapsed = time() - start
+
+    trace()
+    f()
+    peak = get_traced_memory()[1]
+    stop()
+
+    return elapsed, peak
+
+
+for grid in [(2, 2), (4, 4)]:
+    for order in ['sequential', 'layers']:
+
+        tiles = code.tile(grid=grid, spacing=(40, 40), order=order)
+
+        # the lines are written one piece at a time
+        elapsed, peak = measure(lambda: tiles.save('bench.gcode'))
+        size = path.getsize('bench.gcode')
+        print('{:>22} {:>8} {:>12.0f} {:>12.1f} {:>10.3f}'.format('save, ' + order, len(tiles.offsets), size/1e3, peak/1e6, elapsed))
+
+        # a gcode object of every copy holds all of their lines and motion history
+        elapsed, peak = measure(tiles.gcode)
+        print('{:>22} {:>8} {:>12} {:>12.1f} {:>10.3f}'.format('gcode, ' + order, len(tiles.offsets), '', peak/1e6, elapsed))
+
+remove('bench.gcode')
@@ -0,0 +1,35 @@
+# gcody benchmark of reordering many short islands, like strips of infill, to reduce
+# the travel between them
+
+from time import time
+from numpy import column_stack, full, arange
+from numpy.random import RandomState
+from gcody import gcode
+from gcody.travel import order_groups
+
+
+# creating parameters
+n = 100000
+budget = 1.0
+rng = RandomState(0)
+
+print('{:>22} {:>10} {:>14} {:>14} {:>10}'.format('case', 'islands', 'travel before', 'travel after', 'time (s)'))
+
+# the start and end of short strips scattered over a 200 mm bed
+starts = column_stack((rng.rand(n, 2)*200, full(n, 0.2)))
+ends = starts + column_stack((rng.randn(n, 2), full(n, 0)))
+
+start = time()
+order, flip, before, after = order_groups(starts, ends, time_budget=budget)
+print('{:>22} {:>10} {:>14.1f} {:>14.1f} {:>10.3f}'.format('order_groups', n, before, after, time() - start))
+
+# a program of one layer of strips with a move to each strip
+g = gcode()
+g.rel_extrude()
+for i in range(n//10):
+    g.move(starts[i], speed=120)
+    g.move(column_stack((starts[i, 0] + arange(1, 4), full(3, starts[i, 1]), full(3, 0.2))), speed=30, extrude=0.05)
+
+start = time()
+before, after = g.optimize_travel(time_budget=budget)
+print('{:>22} {:>10} {:>14.1f} {:>14.1f} {:>10.3f}'.format('gcode.optimize_travel', n//10, before, after, time() - start))
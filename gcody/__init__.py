@@ -3,8 +3,12 @@
 
 # importing the core classes and functions
 from .gsettings import gsettings
+from .gmachine import gmachine
+from .gindex import gindex
 from .gcode import gcode
 from .readg import read
+from .binary import readbin
+from .parallel import generate
 from .stl import readstl, viewstl, viewmesh
 
 
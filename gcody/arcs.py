@@ -0,0 +1,218 @@
+'''
+Module with functions to fit circular arcs to paths of points so that runs of
+short G1 lines can be written as single G2 and G3 arcs
+'''
+from numpy import asarray, zeros, ones, arange, repeat, cumsum, concatenate, flatnonzero, \
+    sign, abs, sqrt, hypot, arctan2, where, maximum, minimum, add, stack, eye, pi, float64
+from numpy.linalg import det, solve
+
+
+# function that gives the length of arcs in the xy plane. A change in z makes a helix
+def arc_length(start, end, center, cw):
+    '''
+    Parameters:
+
+    > START: array of shape (n,3) of the start of each arc
+    > END: array of shape (n,3) of the end of each arc
+    > CENTER: array of shape (n,2) of the x,y center of each arc
+    > CW: boolean array of shape (n,). True for clockwise arcs (G2)
+
+    * Notes: arcs that end where they start are full circles
+    '''
+
+    start = asarray(start, dtype=float64) # numpy
+    end = asarray(end, dtype=float64) # numpy
+    center = asarray(center, dtype=float64) # numpy
+
+    # angle of the start and end around the center
+    a0 = arctan2(start[:, 1] - center[:, 1], start[:, 0] - center[:, 0]) # numpy
+    a1 = arctan2(end[:, 1] - center[:, 1], end[:, 0] - center[:, 0]) # numpy
+
+    # angle swept in the direction of the arc
+    sweep = where(cw, a0 - a1, a1 - a0) % (2*pi) # numpy
+    sweep[sweep == 0] = 2*pi
+
+    r = hypot(start[:, 0] - center[:, 0], start[:, 1] - center[:, 1]) # numpy
+
+    return sqrt((r*sweep)**2 + (end[:, 2] - start[:, 2])**2) # numpy
+
+
+# function that finds runs of points that lie on circular arcs in the xy plane
+def find_arcs(points, tol, free=None, max_radius=1000.0, min_segments=3):
+    '''
+    Parameters:
+
+    > POINTS: array of shape (n,3) of the points of the path in order
+    > TOL: the largest distance of a point or the middle of a line of the path
+        from the arc that replaces it
+    > FREE: optional boolean array of shape (n,) of the points that can be
+        removed. Arcs start and end at points that are not free
+    > MAX_RADIUS: arcs with a larger radius are left as lines
+    > MIN_SEGMENTS: the least number of lines replaced by an arc
+
+    Returns:
+
+    > START, END: arrays of shape (k,) of the index of the first and last point
+        of each arc. Points between them are replaced by the arc
+    > CENTER: array of shape (k,2) of the center of each arc from its start (I,J)
+    > CW: boolean array of shape (k,). True for clockwise arcs (G2)
+    > DEVIATION: the largest distance of the path from the arcs
+
+    * Notes: runs of points that turn the same way are fit with circles all at
+        once. Runs that do not fit are split until they do. Turns smaller than TOL
+        do not split a run so paths of rounded numbers still fit
+    '''
+
+    points = asarray(points, dtype=float64) # numpy
+    n = len(points)
+
+    if free is None:
+        free = ones(n, dtype=bool) # numpy
+    else:
+        free = asarray(free, dtype=bool).copy() # numpy
+
+    empty = zeros(0, dtype=int) # numpy
+    if n < min_segments + 1:
+        return empty, empty, zeros((0, 2)), zeros(0, dtype=bool), 0.0 # numpy
+
+    free[0] = False
+    free[-1] = False
+
+    # arcs are flat so the points around a free point must have the same z
+    z = points[:, 2]
+    free[1:-1] &= (z[1:-1] == z[:-2]) & (z[1:-1] == z[2:])
+
+    # direction the path turns at each point. Points that are less than TOL from
+    # the line between their neighbours are neutral, like the small turns of
+    # rounded numbers, and do not end an arc. The fit decides if they are on it
+    d = points[1:, :2] - points[:-1, :2]
+    cross = d[:-1, 0]*d[1:, 1] - d[:-1, 1]*d[1:, 0]
+    size = hypot(d[:-1, 0], d[:-1, 1]) * hypot(d[1:, 0], d[1:, 1]) # numpy
+    chord = hypot(d[:-1, 0] + d[1:, 0], d[:-1, 1] + d[1:, 1]) # numpy
+    turn = zeros(n, dtype=int) # numpy
+    turn[1:-1] = sign(cross) * (abs(cross) > tol*chord) # numpy
+
+    # lines much longer or shorter than the line before are usually not part of
+    # the same curve, like a straight edge that joins an arc
+    ratio = size / where(size > 0, (d[:-1]**2).sum(axis=1), 1) # numpy
+    free[1:-1] &= (ratio < 4) & (ratio > 0.25) & (chord > 0)
+
+    # arcs end where the path starts to turn the other way. Neutral points keep the
+    # direction of the last turn of their run
+    key = (turn != 0) | ~free
+    last = maximum.accumulate(where(key, arange(n), 0)) # numpy
+    before = concatenate(([0], where(free, turn, 0)[last][:-1])) # numpy
+    free &= ~((turn != 0) & (before != 0) & (turn != before))
+
+    # runs of free points. Each arc starts before and ends after its run
+    edge = diff_bool(free)
+    start = flatnonzero(edge == 1) - 1 # numpy
+    end = flatnonzero(edge == -1) # numpy
+
+    # the direction of each run is the way it turns the most
+    total = concatenate(([0.0, 0.0], cumsum(cross))) # numpy
+    cw = total[end] - total[start + 1] < 0
+
+    arcs = []
+    deviation = 0.0
+
+    while True:
+
+        # runs with too few lines are left as lines
+        long = end - start >= min_segments
+        start, end, cw = start[long], end[long], cw[long]
+
+        if len(start) == 0:
+            break
+
+        center, fits, dev, worst = _fit(points, start, end, cw, tol, max_radius)
+
+        # keeping the arcs that fit
+        arcs.append((start[fits], end[fits], center[fits], cw[fits]))
+        if fits.any():
+            deviation = max(deviation, dev[fits].max())
+
+        # splitting the other runs at the point farthest from the arc. The split is
+        # kept in the middle half of the run so runs shrink quickly
+        start, end, cw = start[~fits], end[~fits], cw[~fits]
+        quarter = (end - start)//4
+        mid = maximum(minimum(worst[~fits], end - quarter), start + quarter) # numpy
+        mid = maximum(minimum(mid, end - 1), start + 1) # numpy
+        start, end = concatenate((start, mid)), concatenate((mid, end)) # numpy
+        cw = concatenate((cw, cw)) # numpy
+
+    if len(arcs) == 0:
+        return empty, empty, zeros((0, 2)), zeros(0, dtype=bool), 0.0 # numpy
+
+    # putting the arcs in the order of the path
+    start, end, center, cw = [concatenate(i) for i in zip(*arcs)] # numpy
+    order = start.argsort()
+
+    return start[order], end[order], center[order], cw[order], float(deviation)
+
+
+# function that gives 1 where a boolean array starts being true and -1 where it
+# stops. The array is padded with false on both sides
+def diff_bool(x):
+    x = concatenate(([0], asarray(x, dtype=int), [0])) # numpy
+    return x[1:] - x[:-1]
+
+
+# hidden function that fits a circle to each run of points and checks that the
+# arc from the start to the end of the run is within the tolerance of the path
+def _fit(points, start, end, cw, tol, max_radius):
+
+    # the points of every run relative to the start of the run
+    count = end - start + 1
+    seg = repeat(arange(len(start)), count) # numpy
+    first = cumsum(count) - count # numpy
+    index = arange(count.sum()) - first[seg] + start[seg] # numpy
+    q = points[index, :2] - points[start, :2][seg]
+    x, y = q[:, 0], q[:, 1]
+    s = x*x + y*y
+
+    # least squares circle x^2 + y^2 + D x + E y + F = 0 of each run
+    sums = [add.reduceat(i, first) for i in [x*x, x*y, x, y*y, y, x*s, y*s, s]] # numpy
+    xx, xy, sx, yy, sy, xs, ys, ss = sums
+    m = stack([stack([xx, xy, sx], -1), stack([xy, yy, sy], -1),
+               stack([sx, sy, count.astype(float64)], -1)], -2) # numpy
+    rhs = -stack([xs, ys, ss], -1) # numpy
+
+    # points on a line have no circle
+    bad = abs(det(m)) <= 1e-12*abs(xx*yy*count) # numpy
+    m[bad] = eye(3) # numpy
+    c = -solve(m, rhs[:, :, None])[:, :2, 0]/2 # numpy
+
+    # moving the center onto the line halfway between the ends so both ends are
+    # exactly on the arc
+    e = points[end, :2] - points[start, :2]
+    length = hypot(e[:, 0], e[:, 1]) # numpy
+    normal = stack([-e[:, 1], e[:, 0]], -1) / where(length > 0, length, 1)[:, None] # numpy
+    along = ((c - e/2)*normal).sum(axis=1)
+    c = where((length > 0)[:, None], e/2 + along[:, None]*normal, c) # numpy
+    r = hypot(c[:, 0], c[:, 1]) # numpy
+
+    # distance of the points and the middle of the lines from the arc
+    dev = abs(hypot(x - c[seg, 0], y - c[seg, 1]) - r[seg]) # numpy
+    inner = seg[1:] == seg[:-1]
+    mx = (x[1:] + x[:-1])/2 - c[seg[1:], 0]
+    my = (y[1:] + y[:-1])/2 - c[seg[1:], 1]
+    dev[1:] = maximum(dev[1:], where(inner, abs(hypot(mx, my) - r[seg[1:]]), 0)) # numpy
+    dev_max = maximum.reduceat(dev, first) # numpy
+
+    # the first point of each run that is farthest from its arc
+    far = flatnonzero(dev == dev_max[seg]) # numpy
+    far = far[concatenate(([True], seg[far][1:] != seg[far][:-1]))] # numpy
+    worst = index[far]
+
+    # the points must go around the center in the direction of the arc and less
+    # than a full turn
+    angle = arctan2(y - c[seg, 1], x - c[seg, 0]) # numpy
+    step = (angle[1:] - angle[:-1] + pi) % (2*pi) - pi
+    step = where(cw[seg[1:]], -step, step) # numpy
+    backward = add.reduceat(concatenate(([0], where(inner, step <= 0, 0))), first) > 0 # numpy
+    sweep = add.reduceat(concatenate(([0], where(inner, step, 0))), first) # numpy
+
+    fits = ~bad & ~backward & (sweep < 2*pi) & (r <= max_radius) & (dev_max <= tol)
+
+    return c, fits, dev_max, worst
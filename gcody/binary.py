@@ -0,0 +1,326 @@
+'''
+Module with functions to save a gcode object to a compact binary file and to
+load it again without parsing any text. The file holds a header followed by
+one block of numbers for each column of the log. The motion history, times, and
+extrusion are found again from the log and only the numbers that differ are kept
+'''
+from .glog import record, MOVE
+from .simplify import fill_forward
+from numpy import memmap, frombuffer, empty, array, cumsum, packbits, unpackbits, flatnonzero, \
+    where, uint8, int64, float64, nan, dtype as np_dtype
+from json import dumps, loads
+from struct import pack, unpack
+import zlib
+
+
+# the first bytes of every binary file. The last byte is the version of the format
+MAGIC = b'GCODYB\x00\x02'
+
+# blocks start at a multiple of this many bytes so they can be mapped as arrays
+ALIGN = 64
+
+# the value of each column of the log that is not given. These columns only store
+# the values that are given
+_MISSING = {'x': nan, 'y': nan, 'z': nan, 'i': nan, 'j': nan, 'f': nan, 'e': nan,
+            'words': -1, 'com': -1}
+
+# the attributes of the gcode object that are saved with the lines
+STATE = ['coords', 'unit_sys', 'extrude_mode', 'extrude_pos', 'print_time', 'print_speed', 'count']
+
+
+# function that writes a gcode object to a binary file
+def save_binary(code, file, compress=False, meta=None):
+    '''
+    Parameters:
+
+    > CODE: the gcode object to save. The whole program must be held in memory
+    > FILE: the file name to save to
+    > COMPRESS: if true, each block is compressed with zlib. An int from 1 to 9
+        gives the level of compression. Compressed blocks can not be mapped so
+        they are read into memory when loaded
+    > META: anything that can be written as JSON. It is stored in the header and
+        given back by binary_header without loading the program
+
+    * Notes: the settings and machine of CODE are not saved. They are given to
+        readbin instead
+
+    * Notes: each number is stored in 8 bytes, so a file of numbers with few digits
+        can be larger than the text. COMPRESS makes it smaller than the text
+    '''
+
+    level = 6 if compress is True else int(compress)
+    state, blocks = to_blocks(code)
+
+    # compressing the blocks and finding where they go in the file
+    table = {}
+    data = []
+    offset = 0
+    for name, block in blocks.items():
+        raw = block.tobytes()
+        if level:
+            raw = zlib.compress(raw, level)
+
+        table[name] = {'dtype': block.dtype.str, 'shape': list(block.shape),
+                       'offset': offset, 'size': len(raw), 'codec': 'zlib' if level else None}
+        data.append(raw)
+        offset = _aligned(offset + len(raw))
+
+    # the header has the table of blocks, the commands, and the state of the printer
+    header = dumps({'blocks': table, 'state': state, 'meta': meta}, default=float).encode('utf-8')
+
+    # the blocks start after the header
+    start = _aligned(len(MAGIC) + 8 + len(header))
+
+    with open(file, 'wb') as f:
+        f.write(MAGIC)
+        f.write(pack('<Q', len(header)))
+        f.write(header)
+        for i, raw in zip(table.values(), data):
+            f.seek(start + i['offset'])
+            f.write(raw)
+
+        # making sure the file is as long as the last block
+        f.truncate(start + offset)
+
+    return
+
+
+# function that loads a gcode object from a binary file
+def readbin(file, **kwargs):
+    '''
+    Parameters:
+
+    > FILE: the file name of a file made with save_binary or gcode.save
+    > KWARGS: these are passed to an empty gcode object when it is constructed
+
+    Returns:
+
+    > CODE: a gcode object with the same lines, motion history, and state as
+        the object that was saved
+
+    * Notes: only parsing is skipped. The blocks are mapped from the file but are
+        copied into the memory of CODE so it can be changed like any gcode object
+    '''
+
+    header = binary_header(file)
+    blocks = {name: _block(file, header['start'], i) for name, i in header['blocks'].items()}
+
+    return from_blocks(header['state'], blocks, **kwargs)
+
+
+# function that breaks a gcode object into a dictionary of its state and a
+# dictionary of arrays. Used to save binary files and to send programs between
+# processes
+def to_blocks(code):
+    '''
+    Parameters:
+
+    > CODE: the gcode object. The whole program must be held in memory
+
+    Returns:
+
+    > STATE: a dictionary of the commands and the state of the printer after the
+        last line. Only holds types that can be written as JSON
+    > BLOCKS: a dictionary of arrays of the columns of the log, the motion history,
+        the times, the extrusion, the strings, and the layer index
+
+    * Notes: a block NAME.mask of packed bits marks the numbers that are stored in
+        block NAME. The others are missing or are found again from the log
+    '''
+
+    code._check_memory()
+    code._index_layers()
+    rec = code.log.view()
+
+    # the strings are stored as one block of utf-8 bytes and the end of each one
+    text = [i.encode('utf-8') for i in code.log.strings]
+    ends = cumsum([len(i) for i in text], dtype=int64) # numpy
+
+    # every column of the log is its own block. Numbers and strings that are not in
+    # a line are left out of the block and a bit mask of the ones given is stored
+    blocks = {}
+    for name in record.names:
+        col = rec[name]
+        if name in _MISSING:
+            given = col == col if col.dtype == float64 else col != _MISSING[name]
+            blocks[name] = col[given]
+            blocks[name + '.mask'] = packbits(given) # numpy
+        else:
+            blocks[name] = col
+
+    # the motion history, times, and extrusion are found from the log. Only the
+    # numbers that differ, like after relative moves, are stored
+    for name, value, guess in [('history', code.history, _guess_history),
+                               ('t', code._t.view(), _guess_t),
+                               ('extrusion', code.extrusion, _guess_extrusion)]:
+        differ = (value.view(int64) != guess(code).view(int64)).ravel()
+        blocks[name] = value.ravel()[differ]
+        blocks[name + '.mask'] = packbits(differ) # numpy
+    blocks['strings'] = frombuffer(b''.join(text), dtype=uint8) # numpy
+    blocks['string_ends'] = ends
+    blocks['layers'] = code._layers.view()
+
+    state = {i: getattr(code, i) for i in STATE}
+    state['current_pos'] = code.current_pos.tolist()
+    state['previous_pos'] = code.previous_pos.tolist()
+    state['e_idle'] = code._e_idle
+    state['ops'] = code.log.ops
+
+    # where the layer index got to so it is not made again when loaded
+    state['layer_line'] = code._layer_line
+    state['layer_state'] = dict(code._layer_state)
+
+    return state, blocks
+
+
+# function that makes a gcode object from the output of to_blocks
+def from_blocks(state, blocks, **kwargs):
+    '''
+    Parameters:
+
+    > STATE: the dictionary of commands and the state of the printer
+    > BLOCKS: the dictionary of arrays
+    > KWARGS: these are passed to an empty gcode object when it is constructed
+
+    Returns:
+
+    > CODE: the gcode object
+    '''
+
+    from .gcode import gcode
+
+    code = gcode(**kwargs)
+
+    # the tables of commands and strings are rebuilt in the same order so the
+    # indices of the records do not change
+    for i in state['ops'][1:]:
+        code.log.op(i)
+
+    text = bytes(blocks['strings'])
+    ends = blocks['string_ends'].tolist()
+    for a, b in zip([0] + ends[:-1], ends):
+        code.log.intern(text[a:b].decode('utf-8'))
+
+    # filling the records column by column
+    n = len(blocks['op'])
+    rec = empty(n, dtype=record) # numpy
+    for name in record.names:
+        if name + '.mask' in blocks:
+            given = unpackbits(blocks[name + '.mask'], count=n).astype(bool) # numpy
+            rec[name] = _MISSING[name]
+            rec[name][given] = blocks[name]
+        else:
+            rec[name] = blocks[name]
+
+    code.log.extend(rec)
+
+    # each is found from the log and what came before it, then the stored numbers
+    # are put back
+    code._history.extend(_restored(blocks, 'history', _guess_history(code)))
+    code._t.extend(_restored(blocks, 't', _guess_t(code)))
+    code._e.extend(_restored(blocks, 'extrusion', _guess_extrusion(code)))
+
+    # the state of the printer after the last line
+    for i in STATE:
+        setattr(code, i, state[i])
+    code.current_pos = array(state['current_pos'], dtype=float64) # numpy
+    code.previous_pos = array(state['previous_pos'], dtype=float64) # numpy
+    code._e_idle = state['e_idle']
+
+    # the layer index. Files without one index the layers when they are used
+    if 'layers' in blocks:
+        code._layers.clear()
+        code._layers.extend(blocks['layers'])
+        code._layer_line = state['layer_line']
+        code._layer_state = dict(state['layer_state'])
+        if code._layer_state['after'] is not None:
+            code._layer_state['after'] = tuple(code._layer_state['after'])
+
+    return code
+
+
+# function that reads only the header of a binary file
+def binary_header(file):
+    '''
+    Parameters:
+
+    > FILE: the file name of a file made with save_binary or gcode.save
+
+    Returns:
+
+    > HEADER: a dictionary with the table of blocks, the commands, the state of the
+        printer, the META given to save_binary, and the START of the blocks
+    '''
+
+    with open(file, 'rb') as f:
+        if f.read(len(MAGIC)) != MAGIC:
+            raise ValueError('{} is not a gcody binary file of this version'.format(file))
+
+        size, = unpack('<Q', f.read(8))
+        header = loads(f.read(size).decode('utf-8'))
+
+    header['start'] = _aligned(len(MAGIC) + 8 + size)
+    return header
+
+
+# hidden function that gives a block of the file as an array. Blocks that are not
+# compressed are mapped from the file instead of being read
+def _block(file, start, info):
+
+    kind = np_dtype(info['dtype']) # numpy
+    shape = tuple(info['shape'])
+
+    # empty blocks can not be mapped
+    if info['size'] == 0 or info['codec'] is not None:
+        with open(file, 'rb') as f:
+            f.seek(start + info['offset'])
+            raw = f.read(info['size'])
+        if info['codec'] == 'zlib':
+            raw = zlib.decompress(raw)
+        return frombuffer(raw, dtype=kind).reshape(shape) # numpy
+
+    return memmap(file, dtype=kind, mode='r', offset=start + info['offset'], shape=shape) # numpy
+
+
+# hidden function that gives the motion history from the log. Each axis is the last
+# one written by a move, which is right for absolute moves
+def _guess_history(code):
+
+    rec = code.log.view()
+    rec = rec[flatnonzero(rec['flags'] & MOVE)] # numpy
+
+    history = empty((len(rec), 3), dtype=float64) # numpy
+    for k, name in enumerate('xyz'):
+        history[:, k] = fill_forward(rec[name], rec[name] == rec[name], 0.0)
+
+    return history
+
+
+# hidden function that gives the time at each motion from the log and the motion
+# history, like after the program is changed
+def _guess_t(code):
+
+    moves, path, distance, v, dwell = code._segments()
+    return cumsum((distance/where(v != 0, v, 1) + dwell) * (v != 0)) # numpy
+
+
+# hidden function that gives the filament fed by each motion from the log
+def _guess_extrusion(code):
+
+    fed, pos = code._line_extrusion()
+    return fed[(code.log.view()['flags'] & MOVE) > 0]
+
+
+# hidden function that puts the stored numbers of block NAME into GUESS
+def _restored(blocks, name, guess):
+
+    flat = guess.reshape(-1)
+    stored = unpackbits(blocks[name + '.mask'], count=len(flat)).astype(bool) # numpy
+    flat[stored] = blocks[name]
+
+    return guess
+
+
+# hidden function that rounds N up to the next multiple of ALIGN
+def _aligned(n):
+    return -(-n // ALIGN) * ALIGN
@@ -0,0 +1,136 @@
+# Class of a growable block of contiguous memory for numerical records
+
+from numpy import empty, asarray, float64
+
+
+# class that stores rows of numbers in a preallocated numpy array. When the
+# array is full, the memory is doubled so appending is amortized constant time
+class gbuffer():
+
+    def __init__(self, shape=(), dtype=float64, capacity=1024):
+        '''
+        Parameters:
+
+        > SHAPE: the shape of a single row. () stores single numbers and (3,)
+            stores x,y,z points
+        > DTYPE: the numpy data type of each row
+        > CAPACITY: the number of rows to allocate before the first resize
+        '''
+
+        # the shape of a single row
+        self.shape = tuple(shape)
+
+        # preallocated memory. Only the first n rows are used
+        self.data = empty((max(int(capacity), 1),) + self.shape, dtype=dtype) # numpy
+
+        # number of rows in use
+        self.n = 0
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # adds a single row to the end of the buffer
+    def append(self, row):
+        '''
+        Parameters:
+
+        > ROW: a number or array with the shape given to the buffer
+        '''
+
+        # doubling the memory if full
+        if self.n == len(self.data):
+            self._grow(self.n + 1)
+
+        # recording the row
+        self.data[self.n] = row
+        self.n += 1
+
+        return
+
+
+    # adds many rows to the end of the buffer at once
+    def extend(self, rows):
+        '''
+        Parameters:
+
+        > ROWS: an array of shape (k,)+SHAPE
+        '''
+
+        # making rows an array of the correct type. This does nothing if it already is
+        rows = asarray(rows, dtype=self.data.dtype) # numpy
+        k = len(rows)
+
+        # making sure there is room for all the new rows
+        if self.n + k > len(self.data):
+            self._grow(self.n + k)
+
+        # copying the rows in one operation
+        self.data[self.n:self.n + k] = rows
+        self.n += k
+
+        return
+
+
+    # returns the used memory as an array without copying
+    def view(self):
+        return self.data[:self.n]
+
+
+    # keeps only the rows where KEEP is true. The rows are moved to the start of
+    # the memory so nothing new is allocated
+    def select(self, keep):
+        '''
+        Parameters:
+
+        > KEEP: boolean array of shape (n,) of the rows to keep
+        '''
+
+        rows = self.view()[keep]
+        self.data[:len(rows)] = rows
+        self.n = len(rows)
+
+        return
+
+
+    # removes all rows but keeps the memory
+    def clear(self):
+        self.n = 0
+        return
+
+
+    # hidden method that reallocates memory to hold at least NEEDED rows
+    def _grow(self, needed):
+
+        # doubling the capacity until it is large enough
+        capacity = len(self.data)
+        while capacity < needed:
+            capacity *= 2
+
+        # copying the used rows into the new memory
+        data = empty((capacity,) + self.shape, dtype=self.data.dtype) # numpy
+        data[:self.n] = self.data[:self.n]
+        self.data = data
+
+        return
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __repr__(self):
+        return repr(self.view())
+    def __str__(self):
+        return str(self.view())
+    def __len__(self):
+        return self.n
+    def __getitem__(self, index):
+        return self.view()[index]
+    def __iter__(self):
+        return iter(self.view())
+    def __array__(self, dtype=None, copy=None):
+        if dtype is None:
+            return self.view()
+        return self.view().astype(dtype)
@@ -5,23 +5,72 @@ Class gcode written by Ryan Zambrotta
 # imports -----------------------------------------------------------------------
 from .gline import gline
 from .gsettings import gsettings
+from .gbuffer import gbuffer
+from .glog import glog, MOVE, REL
+from .glayer import glayer
+from .gtile import gtile
+from .gindex import path_index
+from .gprofile import gprofile, STAGES
+from .simplify import simplify_path, fill_forward, merge_forward
+from .arcs import find_arcs, arc_length
+from .travel import order_groups
+from .planner import plan_path
+from .binary import save_binary, STATE
+from .textio import open_text
 from .helper import *
 from .visual import *
-from numpy import array, zeros, any, all, shape
-from numpy.linalg import norm
+from numpy import array, zeros, any, all, shape, column_stack, vstack, cumsum, concatenate, full, sqrt, float64, \
+    ndim, asarray, where, arange, maximum, nan, ones, isin, flatnonzero, diff, add, searchsorted, pi, \
+    uint16, int32, int64, eye, allclose, cos, sin, radians, diag, meshgrid, inf, unique, minimum, bincount, clip, append
+from numpy.linalg import norm, det
+from time import perf_counter
+
+
+# the start of the comments slicers write at each new layer, like ;LAYER:3 from Cura
+# and ;LAYER_CHANGE from PrusaSlicer
+LAYER_MARKS = ('LAYER:', 'LAYER_CHANGE')
+
+# the methods timed by profile along with the commands read from files
+PROFILED = ['arc', 'simple_move', 'extend', 'save']
 
 
 # Main GCODE class -------------------------------------------------------------
 # represents and stores all information of a path and constructs the GCODE 
 class gcode():
 
-    def __init__(self, debug_mode=False, settings=None):
+    # Contains names of all the method in GCODE. The methods are looked up by name so
+    # the object does not hold references to itself and is freed as soon as it is
+    # no longer used
+    _commands = {'G0':'rapid_move','G1':'move',
+                 'G2':'cw_arc','G3':'ccw_arc','G4':'dwell',
+                 'G10':'retract','G11':'unretract',
+                 'G20':'use_in','G21':'use_mm','G28':'go_home',
+                 'G90':'abs_move','G91':'rel_move','G92':'set_pos',
+                 'M30':'manual_mask_off',
+                 'M82':'abs_extrude','M83':'rel_extrude','M84':'stop_idle',
+                 'M103':'stop_extrude','M104':'extruders_off',
+                 'M106':'fan',
+                 'M107':'fan_off','M190':'wait_for_temp','M721':'unprime',
+                 'M734':'err_report',
+                 'M756':'first_layer_thick','M790':'new_layer',
+                 ';':'comment','\n':'blank'}
+
+    def __init__(self, debug_mode=False, settings=None, sink=None, flush_size=2**16, machine=None):
         '''
         Parameters:
 
         > DEBUG_MOVE: This causes nothing to be saved internally. It is automatically
         > SETTINGS: This is a gsettings object that that contains a dictionary
             of strings to format numbers for specific gcode commands
+        > SINK: a file name or a writable text stream. If given, lines of GCODE are
+            written to the sink as they are made instead of being kept in memory.
+            Position and time are still recorded. Call save to finish writing.
+            File names ending in .gz, .bz2, or .xz are compressed
+        > FLUSH_SIZE: the number of lines kept in memory before they are
+            written to the sink
+        > MACHINE: a gmachine object with the acceleration and speed limits of the
+            printer. If given, the time at each motion, t, and the print time
+            given by time are planned with acceleration. See plan
         '''
 
         # settings
@@ -36,14 +85,33 @@ class gcode():
             # settings is good to go!
             self.settings = settings
 
-        # creating memory blocks for GCODE
-        self.code = []
+        # creating memory blocks for GCODE. Lines are stored as numbers and are only
+        # made into text when they are saved or printed. With a sink, this only holds
+        # the lines that have not been written yet
+        self.log = glog()
+
+        # opening the sink to stream lines of GCODE to
+        if isinstance(sink, str):
+            self.sink = open_text(_file_name(sink), 'w')
+            self._own_sink = True
+        else:
+            self.sink = sink
+            self._own_sink = False
+
+        # number of lines held in memory before writing to the sink
+        self.flush_size = flush_size
+
+        # the words last written to the sink
+        self._sink_state = {}
+
+        # true once close is called. Nothing more can be written after that
+        self._closed = False
 
         # number of lines written
         self.count = 0
 
-        # creating motion history list
-        self.history = []
+        # creating motion history memory. Each row is an x,y,z position
+        self._history = gbuffer((3,))
 
         # records the current and previous position
         self.current_pos = zeros(3) # numpy
@@ -58,28 +126,52 @@ class gcode():
         # sets default for
         self.unit_sys = 'mm'
 
+        # sets the default extrusion type (absolute extrusion)
+        self.extrude_mode = 'abs'
+
+        # the position of the extruder. This is the last E written in absolute mode
+        self.extrude_pos = 0
+
+        # filament fed by each motion, in the same order as the motion history, and
+        # the filament fed by lines that do not move, like retractions
+        self._e = gbuffer()
+        self._e_idle = 0
+
+        # the extrusion is counted as lines are written. When false, it is counted
+        # from the log all at once by _count_extrusion
+        self._track_e = True
+
         # internal recording of the total print time
         self.print_time = 0 # units of minutes
 
         # internal recording of time at each motion
-        self.t = []
+        self._t = gbuffer()
+
+        # the limits of the printer used to plan the time of each motion and the
+        # last planned times. The plan is made again when the motion changes
+        self.machine = machine
+        self._plan = None
 
         # recording the print speed
         self.print_speed = 0
 
-        # Contains names of all the method in GCODE
-        self.gcode_methods = {'G0':self.rapid_move,'G1':self.move,'G4':self.dwell,
-                              'G10':self.retract,'G11':self.unretract,
-                              'G20':self.use_in,'G21':self.use_mm,'G28':self.go_home,
-                              'G90':self.abs_move,'G91':self.rel_move,'G92':self.set_pos,
-                              'M30':self.manual_mask_off,
-                              'M82':self.rel_extrude,'M83':self.abs_extrude,'M84':self.stop_idle,
-                              'M103':self.stop_extrude,'M104':self.extruders_off,
-                              'M106':self.fan,
-                              'M107':self.fan_off,'M190':self.wait_for_temp,'M721':self.unprime,
-                              'M734':self.err_report,
-                              'M756':self.first_layer_thick,'M790':self.new_layer,
-                              ';':self.comment,'\n':self.blank}
+        # the layer index. Each row is the first line and the first move of a layer.
+        # Layers are found from the lines written since the last search when the
+        # index is used or lines are flushed. See _index_layers
+        self._layers = gbuffer((2,), dtype=int64)
+        self._reset_layers()
+
+        # the statistics of the program. They are added to from the lines written
+        # since they were last used. See stats
+        self._reset_stats()
+
+        # the last spatial index of the motion history and the number of motions and
+        # cell size it was made with. See spatial_index
+        self._index = None
+
+        # records the calls made while a program is generated. None when profiling
+        # is off. See profile
+        self._profile = None
 
         # end of init
         return
@@ -94,7 +186,7 @@ class gcode():
 
 
     # writes line of code with command Gl stright line motion
-    def move(self, x=None,y=None,z=None,speed=None,extrude=None,check_end=None,com=None):
+    def move(self, x=None,y=None,z=None,speed=None,extrude=None,check_end=None,com=None,simplify=None):
         '''
         Parameters:
 
@@ -107,19 +199,33 @@ class gcode():
             that only arrays of shape (n,) can be passed.
         > Z: the z coordinate to move the print head to. Behaves the same as X except for
             that only arrays of shape (n,) can be passed.
+            X can also be a structured array with fields 'x','y','z' and optionally
+            'f' and 'e' which are used in place of SPEED and EXTRUDE.
         > SPEED: The speed to move the print head for this motion. This input should
-            be in the same units as the attribute UNIT_SYS
-        > EXTRUDE: The volume to extrude for this motion.... NEED MORE HERE
+            be in the same units as the attribute UNIT_SYS. When X is an array, SPEED
+            can be an array of shape (n,) giving the speed of each row. The F word is
+            then only written when the speed changes.
+        > EXTRUDE: The volume to extrude for this motion.... NEED MORE HERE. When X is
+            an array, EXTRUDE can be an array of shape (n,) giving the extrusion of each
+            row. Rows that are nan do not extrude.
         > CHECK_END: determines whether the printer checks if an endstop was hit. Default
             to '0'. Options are '0', '1','2'. '1' makes printer check. '2' is more
         > COM: The comment to be added at the end of the lines
+        > SIMPLIFY: a tolerance to simplify array motion with. Rows within this
+            distance of the simplified path are not written. See the method simplify.
+            When given, the number of segments removed and the largest distance of
+            a removed row from the path are returned
         '''
 
         # checking if x input is a a single value, or an array
 
+        # structured arrays are broken up into their x,y,z,f,e fields
+        if _is_structured(x):
+            x, y, z, speed, extrude = _fields(x, speed, extrude)
+
         # ensuring that x exists before splitting up x
         # parsing the x variable. y and z must be none
-        if any(x) or any(x == 0):
+        elif any(x) or any(x == 0):
 
             temp_shape = shape(x) # numpy
             if len(temp_shape) == 2:
@@ -175,20 +281,10 @@ class gcode():
             self._move_format(line, speed=speed, extrude=extrude)
 
         else:
-            # array case
-            if len(x) == len(y) and len(x) == len(z):
+            # array case. All rows are formatted and recorded at once
+            return self._move_array('G1', com, x, y, z, speed, extrude, simplify)
 
-                # Creating GCODE line for all row in x
-                for i in range(len(x)):
-
-                    # creating line of GCODE
-                    line = gline('G1', com)
-
-                    # calling hidden function to do the string formatting
-                    # This command writes the gcode line to memory
-                    self._move_format(line,pos,x[i],y[i],z[i],speed,extrude)
-
-                return
+        return
     # end of move
 
 
@@ -250,19 +346,10 @@ class gcode():
 
         else:
 
-            # array case
-            if len(x) == len(y) and len(x) == len(z):
-
-                # Creating GCODE line for all row in x
-                for i in range(len(x)):
-
-                    # creating line of GCODE
-                    line = gline()
-
-                    # calling hidden function to do the string formatting
-                    self._move_format(line,pos,x[i],y[i],z[i])
-
+            # array case. All rows are formatted and recorded at once
+            self._move_array(None, None, x, y, z)
 
+        return
     # end of simple_move
 
 
@@ -274,8 +361,12 @@ class gcode():
         See move
         '''
 
+        # structured arrays are broken up into their x,y,z,f,e fields
+        if _is_structured(x):
+            x, y, z, speed, extrude = _fields(x, speed, extrude)
+
         # ensuring that x exists before splitting up x
-        if any(x) or any(x == 0):
+        elif any(x) or any(x == 0):
 
             temp_shape = shape(x) # numpy
             if len(temp_shape) == 2:
@@ -314,7 +405,7 @@ class gcode():
         if isinstance(x,(int,float)) or isinstance(y,(int,float)) or isinstance(z,(int,float)):
 
             # creating line of GCODE
-            line = gline('G1', com)
+            line = gline('G0', com)
 
             # calling hidden function to do the string formatting
             # which also writes to memory
@@ -323,25 +414,85 @@ class gcode():
             # end of move
 
         else:
-            # array case,
-            if len(x) == len(y) and len(x) == len(z):
+            # array case. All rows are formatted and recorded at once
+            self._move_array('G0', com, x, y, z, speed, extrude)
 
-                # Creating GCODE line for all row in x
-                for i in range(len(x)):
+        return
+    # end of move
 
-                    # creating line of GCODE
-                    line = gline('G1', com)
 
-                    # calling hidden function to do the string formatting
-                    self._move_format(line,pos,
-                                      x[i],y[i],z[i],
-                                      speed,extrude)
-            else:
-                raise ValueError('Input arrays must be of same length')
+    # writes line of code with command G2 or G3 circular arc motion in the xy plane
+    def arc(self, x=None,y=None,z=None,i=None,j=None,cw=True,speed=None,extrude=None,check_end=None,com=None):
+        '''
+        Parameters:
+
+        > X,Y,Z: the position at the end of the arc. Coordinates that are not given
+            do not change. A change in z makes a helix
+        > I,J: the x and y distance from the start of the arc to its center. These
+            are always relative to the start
+        > CW: if true, the arc is clockwise (G2). If false, it is counterclockwise (G3)
+        > SPEED: see move
+        > EXTRUDE: see move
+        > CHECK_END: see move
+        > COM: The comment to be added at the end of the line
+
+        * Notes: the time to print is found from the length of the arc. The motion
+            history only records the end of the arc
+        '''
 
-                return
+        if i is None and j is None:
+            raise ValueError('The center of the arc must be given with I and J')
 
-    # end of move
+        # create a temperary variable to store position to eventually pass to
+        # hidden methods to internally record motion
+        if self.coords == 'abs':
+            pos = self.current_pos.copy()
+        else:
+            pos = zeros(3) # numpy
+
+        # creating line of GCODE
+        line = gline('G2' if cw else 'G3', com)
+
+        # calling hidden function to do the string formatting without writing
+        line, pos = self._move_format(line,pos,x,y,z,speed,extrude,check_end,write=False)
+
+        # adding the center of the arc
+        if i is not None:
+            line.set('i', i)
+        if j is not None:
+            line.set('j', j)
+
+        # the end of the arc in absolute coordinates
+        if self.coords == 'abs':
+            end = pos
+        else:
+            end = self.current_pos + pos
+
+        # time to move along the arc in minutes
+        center = self.current_pos[:2] + array([i or 0, j or 0]) # numpy
+        length = arc_length(self.current_pos[None], end[None], center[None], [cw])[0]
+        if self.print_speed != 0:
+            time = length/self.print_speed
+        else:
+            time = None
+
+        # writing to memory
+        self.write(line, pos, time)
+
+        return
+    # end of arc
+
+
+    # writes a clockwise arc, G2. See arc
+    def cw_arc(self, x=None,y=None,z=None,i=None,j=None,speed=None,extrude=None,check_end=None,com=None):
+        self.arc(x,y,z,i,j,True,speed,extrude,check_end,com)
+        return
+
+
+    # writes a counterclockwise arc, G3. See arc
+    def ccw_arc(self, x=None,y=None,z=None,i=None,j=None,speed=None,extrude=None,check_end=None,com=None):
+        self.arc(x,y,z,i,j,False,speed,extrude,check_end,com)
+        return
 
 
     # method that tells printer to dwell for a specified amount of time
@@ -367,7 +518,7 @@ class gcode():
             line.append('S{}'.format(sec))
 
             # writing to memory with time in units of minutes
-            self.write(line, self.current_pos, time/60)
+            self.write(line, self.current_pos, sec/60)
             return
 
         elif milisec:
@@ -375,7 +526,7 @@ class gcode():
             line.append('P{}'.format(milisec))
 
             # writing to memory with time in units of minutes
-            self.write(line, self.current_pos, time/(60*1000))
+            self.write(line, self.current_pos, milisec/(60*1000))
 
             return
         else:
@@ -492,11 +643,11 @@ class gcode():
             line = gline('G28', com)
 
             if x or x == 0:
-                line.append('X' + self.settings['pos'].format(x))
+                line.set('x', x)
             if y or y == 0:
-                line.append('Y' + self.settings['pos'].format(y))
+                line.set('y', y)
             if z or z == 0:
-                line.append('Z' + self.settings['pos'].format(z))
+                line.set('z', z)
 
             # recording line to mem and indicating that this is a move to write
             # the position of zeros forces the printer to return to the zero
@@ -548,17 +699,17 @@ class gcode():
 
         # appending parameters to line of GCODE
         if x or x == 0:
-            line.append('X' + self.settings['pos'].format(x) )
+            line.set('x', x)
 
         if y or y == 0:
-            line.append('Y' + self.settings['pos'].format(y))
+            line.set('y', y)
 
         if z or z == 0:
-            line.append('Z' + self.settings['pos'].format(z))
+            line.set('z', z)
 
         # writes the extrusion command to this line
         if extrude or extrude == 0:
-            line.append('E' + self.settings['extrude'].format(extrude))
+            line.set('e', extrude)
 
         # writing to memory
         self.write(line)
@@ -580,9 +731,10 @@ class gcode():
     def abs_extrude(self, com='Absolute Extrusion Mode'):
 
         # create gcode command
-        line = gline('M83', com)
+        line = gline('M82', com)
 
-        # should I record the volume used?
+        # recording the extrusion mode. The filament used is counted by write
+        self.extrude_mode = 'abs'
 
         # writing line gcode to memory
         self.write(line)
@@ -592,9 +744,10 @@ class gcode():
     def rel_extrude(self, com='Relative Extrusion Mode'):
 
         # create gcode command
-        line = gline('M82', com)
+        line = gline('M83', com)
 
-        # should I record the volume used?
+        # recording the extrusion mode. The filament used is counted by write
+        self.extrude_mode = 'rel'
 
         # writing line gcode to memory
         self.write(line)
@@ -828,28 +981,53 @@ class gcode():
 
 
     # writes the output to a file
-    def save(self, file):
+    def save(self, file=None, settings=None, format='text', compress=False, threaded=False):
         '''
         Parameters:
 
         > FILE: The file name to save to. If this has no extension, then
-            a .gcode file is writen to. If there is an extension, then
-            a file of that type is used
+            a .gcode file is writen to (.gcb for binary files). If there is an
+            extension, then a file of that type is used
+        > SETTINGS: a gsettings object used to format the numbers in place of
+            the settings of the gcode object
+        > FORMAT: 'text' writes lines of GCODE. 'binary' writes the numbers of
+            the lines to a file that is loaded with readbin without parsing. It can
+            be larger than the text unless it is compressed. See binary.py
+        > COMPRESS: only for binary files. If true, each block of the file is
+            compressed. An int from 1 to 9 gives the level of compression
+        > THREADED: only for text files. If true, the lines are compressed and
+            written in a background thread while the next lines are formatted
+
+        * Notes: text files ending in .gz, .bz2, or .xz are compressed as they are
+            written. See textio.py
+
+        * Notes: if the gcode object has a sink, FILE is not used. The remaining
+            lines are written to the sink and the sink is closed if gcode opened it.
+            Raises a ValueError if FILE, SETTINGS, or a binary FORMAT is given with a
+            sink, and a RuntimeError once the gcode object is closed
         '''
 
-        file_type = file.split('.')
+        self._check_open()
 
-        # first case, gcode file to save to
-        if len(file_type) ==  1:
+        # streaming case, finishing writing to the sink. The lines already written
+        # can not be moved to another file
+        if self.sink is not None:
+            if file is not None or settings is not None or format != 'text':
+                raise ValueError('The lines are written to the sink. Call save() without a file or close()')
+            self.close()
+            return
 
-            # save file name
-            file = file + '.gcode'
+        if format == 'binary':
+            save_binary(self, _file_name(file, '.gcb'), compress)
+            return
+        elif format != 'text':
+            raise ValueError('Unknown format {}. Options are text and binary'.format(format))
 
-        # opening and creating file
-        with open(file,'w') as f:
+        # opening and creating file. Compressed files are chosen by their extension
+        with open_text(_file_name(file), 'w', threaded) as f:
 
-            # writes all the GCODE lines at once
-            f.writelines(self.code)
+            # writes the GCODE lines a block at a time
+            f.writelines(self.lines(settings))
 
             # closing text file
             f.close()
@@ -858,6 +1036,109 @@ class gcode():
         return
 
 
+    # generator that gives each line of GCODE as text
+    def lines(self, settings=None):
+        '''
+        Parameters:
+
+        > SETTINGS: a gsettings object used to format the numbers in place of
+            the settings of the gcode object
+
+        * Notes: raises a RuntimeError if lines were written to the sink, as only
+            the lines after them are held in memory
+        '''
+
+        if self.count > len(self.log) and not self.debug:
+            raise RuntimeError('Lines have already been written to the sink. Only the lines held in memory can be given')
+
+        if settings is None:
+            settings = self.settings
+
+        return self.log.render(settings, state={})
+
+
+    # writes the lines held in memory to the sink
+    def flush(self):
+
+        # nothing to do without a sink
+        if self.sink is None:
+            return
+
+        # writing all lines and freeing the memory. The state of the printer is kept
+        # so the next lines continue from these ones
+        lines = self.log.render(self.settings, state=self._sink_state, empty=True)
+
+        # the bytes of each command are counted before the lines leave memory
+        if self._profile is not None:
+            lines = list(lines)
+            self._profile.emitted(self.count - len(self.log), lines)
+
+        self.sink.writelines(lines)
+        self._index_layers()
+        self._update_stats()
+        self.log.clear()
+
+        return
+
+
+    # writes the remaining lines to the sink and closes it if it was opened by gcode.
+    # Nothing more can be written or saved after that
+    def close(self):
+
+        # nothing to do without a sink
+        if self.sink is None:
+            return
+        self._closed = True
+
+        self.flush()
+
+        # closing the file or flushing a stream given by the user
+        if self._own_sink:
+            self.sink.close()
+        elif hasattr(self.sink, 'flush'):
+            self.sink.flush()
+
+        # the sink can no longer be written to
+        self.sink = None
+
+        return
+
+
+
+    # turns on or off the recording of the calls made to the object. Used to find
+    # where the time goes when a program is slow to generate
+    def profile(self, enable=True):
+        '''
+        Parameters:
+
+        > ENABLE: if true, the commands and the internal stages of writing a line
+            are timed from now on. If false, they are no longer timed
+
+        Returns:
+
+        > PROFILE: the gprofile object of the calls recorded. See gprofile.report.
+            None if profiling was off and is not turned on
+
+        * Notes: the timed methods are only replaced while profiling is on, so
+            there is no cost when it is off. Turning it on again starts a new record.
+            Copies and pickles of the object are not profiled
+        '''
+
+        profile = self._profile
+        names = set(self._commands.values()) | set(PROFILED) | set(STAGES)
+
+        # putting back the methods of the class
+        for i in names:
+            self.__dict__.pop(i, None)
+        self._profile = None
+
+        if enable:
+            profile = self._profile = gprofile(self)
+            for i in names:
+                setattr(self, i, profile.wrap(i, getattr(self, i)))
+
+        return profile
+
 
     ## IMPORTANT function here. write writes a line to memory as well as parses
     def write(self, line, move=None, time=None):
@@ -870,23 +1151,53 @@ class gcode():
         > TIME:
         '''
 
+        self._check_open()
+
         # increasing counter
         self.count +=1
 
         # checking debug mode
         # determining how to return values
         if self.debug:
-            print(line)
+            print(line.text(self.settings))
             return
         else:
+            # the filament fed by the line. G92 sets the position of the extruder
+            e = line.params.get('e')
+            if e is None or not self._track_e:
+                fed = 0
+            elif line.command == 'G92':
+                self.extrude_pos = e
+                fed = 0
+            elif self.extrude_mode == 'rel':
+                self.extrude_pos += e
+                fed = e
+            else:
+                fed = e - self.extrude_pos
+                self.extrude_pos = e
+
             # appending the line of GCODE to the vector of lines
             if any(move) or any(move == 0): # any is overriden by numpy import
+
+                # recording if the coordinates of the line are relative
+                flags = MOVE | (REL if self.coords == 'rel' else 0)
+
                 # records motion, time to print, and position
                 self._pos_update(move, time)
 
+                if self._track_e:
+                    self._e.append(fed)
+            else:
+                flags = 0
+                self._e_idle += fed
+
 
             # records GCODE
-            self.code.append(line.done())
+            self.log.append(line, flags)
+
+            # writing to the sink once enough lines are held in memory
+            if self.sink is not None and len(self.log) >= self.flush_size:
+                self.flush()
             return
 
         # end of write
@@ -908,247 +1219,1143 @@ class gcode():
             scientific notation is used
         '''
 
+        # the planned time when the limits of the printer are known
+        if self.machine is not None:
+            return min2time(self.plan().sum(), printit, sec_tol) # from helper.py
+
         # calling helper function
         return min2time(self.print_time, printit, sec_tol) # from helper.py
     # end of time
 
 
+    # method that gives the filament used by the whole program
+    def filament(self, diameter=1.75, density=1.24):
+        '''
+        Parameters:
 
+        > DIAMETER: the diameter of the filament in the units of the program
+        > DENSITY: the density of the filament in g/cm^3. The default is PLA
 
-    ######################################################################################
-    ######################################################################################
-    ## Visualisation tools -------------------------------------------------------------
-    ## ------------------------------------------------------------------------------------
-    ######################################################################################
-    ######################################################################################
+        Returns:
 
+        > LENGTH: the length of filament fed in the units of the program
+        > VOLUME: the volume of filament fed in the units of the program cubed
+        > MASS: the mass of filament fed in grams
 
+        * Notes: retractions are taken away from the length, so filament that is
+            retracted and fed again is only counted once
+        '''
 
+        length = float(self._e.view().sum() + self._e_idle)
+        volume = length * pi * diameter**2 / 4
 
-    # Method to visualize the printer path
-    '''
-    To Do:
+        # converting the volume to cm^3
+        cm3 = volume / 1000 if self.unit_sys == 'mm' else volume * 2.54**3
+        return length, volume, cm3 * density
+    # end of filament
 
-    > DOCUMENTATION!!!!
-    > Create more arguments for customizability
-    > new type of visualization! one color to specify when extrude
-        another color not with a legend
-    > break this into several methods
-    '''
-    def view(self, *args, fig_title='Print Path', labels=False, **kwargs):
 
+    # method that plans the speed of the print head along the whole path so the time
+    # of each motion accounts for speeding up, slowing down, and corners
+    def plan(self, machine=None):
         '''
         Parameters:
 
+        > MACHINE: a gmachine object with the limits of the printer. Default to the
+            machine of the gcode object
 
-        > *args,**kwargs : are passed to matplotlib's pyplot.plot function
+        Returns:
 
-        > FIG_TITLE: the title given to the figure. Only used is a figure is not given to plot on
+        > DT: array of shape (n,) of the time of each motion in minutes
 
-        > GIVE : this command makes the method return the figure after the path data is
-                plotted. This has no effect when mayavi is the backend.
+        * Notes: each move has a trapezoidal speed profile. The speed at each corner
+            is limited by the junction deviation and by the speed the print head can
+            reach or slow down from along the moves before and after it. The print
+            head stops at dwells and G28. The whole program must be held in memory
         '''
 
-        # generating labels for the axes
-        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
-                     'Z ({})'.format(self.unit_sys)]
+        if machine is None:
+            machine = self.machine
+        if machine is None:
+            raise ValueError('No gmachine given to plan the motion with')
 
-        # function call from module visual
-        if labels:
+        # the last plan is reused if neither the motion nor the machine changed
+        key = machine.key(), len(self._history), self.count
+        if self._plan is not None and self._plan[0] == key:
+            return self._plan[1]
 
-            fig = plot3(self.history, *args, title=fig_title,
-                axis_label=ax_labels, backend=self.settings.graphics,
-                **kwargs)
-        else:
-            fig = plot3(self.history, *args, title=fig_title,
-                        backend=self.settings.graphics, **kwargs)
+        self._check_memory()
 
+        moves, path, distance, v, dwell = self._segments()
+        stop = (dwell > 0) | (self.log.view()['op'][moves] == self.log._ops.get('G28', -1))
 
-        return fig
+        # dwells only add time once the print speed is set, like _time
+        dt = plan_path(path, distance, v, stop, machine) + dwell*(v != 0) # numpy
 
+        # the time at each motion is kept with the plan so t is not summed again
+        self._plan = key, dt, cumsum(dt) # numpy
+        return dt
 
-    # method that has a colorbar to parameterize the time of the print
-    def cbar_view(self, *args, labels=False, fig_title='Printer Path', **kwargs):
-        '''
-        Parameters:
 
-        see visual.py color_view for all arguments. Some are defined here. Still working on it
 
-        '''
+    ######################################################################################
+    ######################################################################################
+    ## Path tools -------------------------------------------------------------------------
+    ## ------------------------------------------------------------------------------------
+    ######################################################################################
+    ######################################################################################
 
-        # generating labels
 
-        # generating labels for the axes
-        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
-                     'Z ({})'.format(self.unit_sys)]
 
-        # four color bar ticks
-        colorbar_ticks = [0, self.t[-1]/3, 2*self.t[-1]/3, self.t[-1]]
+    # method to remove the moves of the whole program that are within a tolerance of a
+    # simplified path. Uses the Ramer-Douglas-Peucker algorithm on each run of moves
+    def simplify(self, tol=0.0):
+        '''
+        Parameters:
 
-        # generating the colorbar tick labels
-        colorbar_tick_labels = ['0']
+        > TOL: the largest distance a removed point can be from the simplified path.
+            A tolerance of zero only removes points that are on a straight line
 
-        # generating the labels by iterative over the ticks and converting them to strings
-        for i in colorbar_ticks[1:]:
-            colorbar_tick_labels.append('{:0.2f}'.format(i))
+        Returns:
 
-        # colorbar label
-        colorbar_label = 'Time (min)'
+        > REMOVED: the number of segments removed
+        > DEVIATION: the largest distance of a removed point from the simplified path
 
+        * Notes: only runs of absolute G0 or G1 moves without comments or other
+            words are simplified. Points where the speed changes or where the motion
+            starts or stops extruding are kept. With relative extrusion (M83), the
+            extrusion of removed lines is added to the next line that is kept.
+            The motion history and time are recalculated
+        '''
 
-        # function call from module visual
-        if labels:
+        self._check_memory()
 
-            fig = color_view(self.history, self.t, *args, fig_title=fig_title,
-                    colorbar_ticks=colorbar_ticks, colorbar_tick_labels=colorbar_tick_labels,
-                    colorbar_label=colorbar_label, axis_label=ax_labels,
-                    backend=self.settings.graphics, **kwargs)
-        else:
-            fig = color_view(self.history, self.t, *args, fig_title=fig_title,
-                   colorbar_ticks=colorbar_ticks, colorbar_tick_labels=colorbar_tick_labels,
-                   colorbar_label=colorbar_label,
-                   backend=self.settings.graphics, **kwargs)
-        
+        moves, plain, joined = self._runs()
+        m = len(moves)
 
+        if m < 3:
+            return 0, 0.0
 
+        # simplifying the path of all runs at once
+        keep, deviation = simplify_path(self.history, tol, ~(plain & joined))
+        removed = m - int(keep.sum())
 
-        return fig
+        if removed == 0:
+            return 0, deviation
 
-    # a function to wrap the stuff needed for a live graph takes a function that returns a
-    # X and Y array to be plotted, a single input i to that function is required
-    def animated(self, *args, fig_title='Print Path',**kwargs):
+        self._remove_moves(moves, keep)
 
-        '''
-        Parameters:
+        return removed, deviation
 
-        See visual.py Some arguments are defined here though. Working on it still
 
-        Defined here: ax_label, ax_lim, fig_title, loop
+    # method to replace runs of moves that lie on circular arcs with G2 and G3 arcs
+    def fit_arcs(self, tol=0.01, max_radius=1000.0):
         '''
+        Parameters:
 
-        # make a numpy array for indexing, vectorized operations, and method access
-        # getting motion history
-        # list comprehension to get the coordingates from self.history
-        X = array([i[0] for i in self.history]) # numpy
-        Y = array([i[1] for i in self.history]) # numpy
-        Z = array([i[2] for i in self.history]) # numpy
+        > TOL: the largest distance of a point or the middle of a line from the arc
+            that replaces it
+        > MAX_RADIUS: arcs with a larger radius are left as lines
 
-        # defining the update function to needed by the plotting function
-        def update(i):
-            return X[0:i], Y[0:i], Z[0:i]
+        Returns:
 
+        > ARCS: the number of arcs written
+        > REMOVED: the number of lines removed
+        > DEVIATION: the largest distance of the original path from the arcs
 
-        # setting additional arguments
-        # generating labels for the axes
-        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
-                     'Z ({})'.format(self.unit_sys)]
+        * Notes: only runs of absolute G1 moves in the xy plane are fit. The same
+            lines as in simplify are kept. Each arc replaces at least 3 lines
+        '''
 
+        self._check_memory()
 
-        # Keeps aspect ratio square but can be computationally expensive for large GCODE
-        # http://stackoverflow.com/questions/13685386
-        # numpy array
-        max_range = array([X.max()-X.min(),
-                              Y.max()-Y.min(),
-                              Z.max()-Z.min()]).max() / 2.0
+        moves, plain, joined = self._runs()
+        m = len(moves)
 
-        mean_x = X.mean()
-        mean_y = Y.mean()
-        mean_z = Z.mean()
+        if m < 4:
+            return 0, 0, 0.0
 
-        # generating the axis limits
-        ax_lim = [mean_x - max_range, mean_x + max_range,
-                  mean_y - max_range, mean_y + max_range,
-                  mean_z - max_range, mean_z + max_range]
+        # arcs are made from G1 lines and end on a plain G1 line
+        rec = self.log.view()
+        g1 = (rec['op'][moves] == self.log._ops.get('G1', -1)) & plain
+        free = g1 & joined
+        free[:-1] &= g1[1:]
 
+        start, end, center, cw, deviation = find_arcs(self.history, tol, free, max_radius)
 
+        if len(start) == 0:
+            return 0, 0, 0.0
 
+        # the last line of each arc becomes the arc
+        last = moves[end]
+        rec['op'][last] = where(cw, self.log.op('G2'), self.log.op('G3')) # numpy
+        rec['i'][last] = center[:, 0]
+        rec['j'][last] = center[:, 1]
 
-        # calling function from visual.py
-        live_view(update, *args, ax_label=ax_labels, ax_lim=ax_lim,
-                  fig_title=fig_title, loop=len(self.t)+1, **kwargs)
+        # removing the lines between the start and end of each arc
+        cover = zeros(m + 1, dtype=int) # numpy
+        add.at(cover, start + 1, 1) # numpy
+        add.at(cover, end, -1) # numpy
+        keep = cumsum(cover)[:m] == 0 # numpy
 
+        self._remove_moves(moves, keep)
 
-        return
+        return len(start), m - int(keep.sum()), deviation
 
 
-    # method that has a slider on the bottom of the figure to animate the print path
-    def slide_view(self, *args, fig_title='Printer Path', **kwargs):
+    # method to reorder the islands of each layer, like strips of infill, so the
+    # print head travels as little as possible between them
+    def optimize_travel(self, reverse=True, time_budget=1.0):
         '''
         Parameters:
 
-        See visual.py, slider_view
+        > REVERSE: if true, islands can be printed from their end to their start.
+            Islands with arcs are never reversed
+        > TIME_BUDGET: the most seconds spent improving the order of the islands
+            after they are ordered nearest neighbour first
+
+        Returns:
+
+        > BEFORE: the length of the moves that do not extrude before reordering
+        > AFTER: the length of the moves that do not extrude after reordering.
+            Moves are measured in straight lines
+
+        * Notes: islands are runs of extruding moves between moves that do not
+            extrude. Only runs of absolute moves at the same height with nothing
+            but moves between them are reordered, so the order of layers and of
+            lines like retractions and fan changes is kept. The moves between
+            islands are replaced by a single move to the next island at the
+            fastest speed of the moves it replaces. The lines of reordered islands
+            are written with all of X, Y, Z. The motion history and time are
+            recalculated
         '''
 
+        self._check_memory()
+
+        rec = self.log.view()
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        m = len(moves)
+
+        # the position before and after every move. The print head starts at the origin
+        path = vstack((zeros(3), self.history)) # numpy
+        length = sqrt(((path[1:] - path[:-1])**2).sum(axis=1)) # numpy
+
+        op = rec['op'][moves]
+        ops = self.log._ops
+        lines_only = isin(op, [0, ops.get('G0', -1), ops.get('G1', -1)]) # numpy
+        arcs = isin(op, [ops.get('G2', -1), ops.get('G3', -1)]) # numpy
+        absolute = (rec['flags'][moves] & REL) == 0
+
+        # the speed after every line
+        f = rec['f']
+        speed = fill_forward(f, f == f, 0)
+
+        # the filament fed by every move and the last E written before every move.
+        # Absolute extrusion is counted again from it once the moves are reordered
+        rel_e = self._rel_extrusion()[moves]
+        e = rec['e']
+        e_before = where(moves > 0, fill_forward(e, e == e, 0)[moves - 1], 0) # numpy
+        delta = self._e.view().copy()
+        extruding = delta > 0
+
+        before = float(length[~extruding].sum())
+
+        # moves that can be reordered. Moves that do not extrude are dropped so they
+        # cannot retract or carry anything but a speed
+        travel = lines_only & (delta == 0) & (rec['com'][moves] < 0) & (rec['words'][moves] < 0)
+        ok = absolute & (path[1:, 2] == path[:-1, 2]) & (travel | (extruding & (lines_only | arcs)))
+
+        # runs of moves that can be reordered with no other lines between them
+        linked = ok[1:] & ok[:-1] & (diff(moves) == 1) # numpy
+        first = flatnonzero(ok & concatenate(([True], ~linked))) # numpy
+        last = flatnonzero(ok & concatenate((~linked, [True]))) # numpy
+
+        # the islands of every run
+        blocks = []
+        deadline = perf_counter() + time_budget
+        islands = extruding & ok
+        total = int((islands & ~concatenate(([False], islands[:-1]))).sum()) # numpy
+
+        for a, b in zip(first.tolist(), last.tolist()):
+
+            # the run ends with its last island. Moves after it are kept
+            ext = extruding[a:b + 1]
+            if not ext.any():
+                continue
+            b = a + int(flatnonzero(ext)[-1]) # numpy
+            ext = ext[:b - a + 1]
+
+            starts = a + flatnonzero(ext & ~concatenate(([False], ext[:-1]))) # numpy
+            ends = a + flatnonzero(ext & ~concatenate((ext[1:], [False]))) # numpy
+            k = len(starts)
+            if k < 2:
+                continue
+
+            # the move after the run goes to the same place from wherever the run ends.
+            # It must not extrude or depend on where it starts
+            end = None
+            if b + 1 < m:
+                if not (absolute[b + 1] and delta[b + 1] <= 0 and
+                        (lines_only[b + 1] or op[b + 1] == ops.get('G28', -1))):
+                    total -= k
+                    continue
+                end = path[b + 2]
+
+            # sharing the time left between the runs by their number of islands
+            budget = max(deadline - perf_counter(), 0)*k/max(total, 1)
+            total -= k
+
+            rev = reverse & ~add.reduceat(arcs[a:b + 1], starts - a).astype(bool) # numpy
+            order, flip, old, new = order_groups(path[starts], path[ends + 1], rev, path[a], end, budget)
+            if new >= old:
+                continue
+
+            # the travel replaced is measured along the moves that are removed
+            old = float(length[a:b + 1][~ext].sum() + (length[b + 1] if end is not None else 0))
+            blocks.append((a, b, starts, ends, order, flip, old, new))
+
+        if len(blocks) == 0:
+            return before, before
+
+        # rebuilding the records and motion history with the islands in their new order
+        pieces = []
+        history = []
+        line = 0
+        move = 0
+        after = before
+        g1 = ops.get('G1') or self.log.op('G1')
+        speeds = flatnonzero(f == f) # numpy
+
+        for a, b, starts, ends, order, flip, old, new in blocks:
+
+            block = []
+            points = []
+
+            # the moves to the islands have the command and the fastest speed of the
+            # moves that do not extrude in the run
+            hops = a + flatnonzero(~extruding[a:b + 1]) # numpy
+            hop_op = next((i for i in op[hops].tolist() if i != 0), g1)
+            hop_v = speed[moves[hops]].max()
+
+            here = path[a]
+            for g, r in zip(order.tolist(), flip.tolist()):
+
+                s, t = starts[g], ends[g]
+
+                # moving to the island if it is not already there
+                begin = path[t + 1] if r else path[s]
+                if (begin != here).any():
+                    hop = self.log.block(1, None, None, MOVE)
+                    hop['op'] = hop_op
+                    hop['x'], hop['y'], hop['z'] = begin
+                    hop['f'] = hop_v
+                    block.append(hop)
+                    points.append(begin[None])
+
+                # the lines of the island with their speed and extrusion. Reversed
+                # lines move back to where they started
+                island = rec[moves[s]:moves[t] + 1].copy()
+                island['f'] = speed[moves[s]:moves[t] + 1]
+                if not rel_e[s]:
+                    island['e'] = delta[s:t + 1]
+
+                if r:
+                    island = island[::-1]
+                    end_at = path[s:t + 1][::-1]
+                else:
+                    end_at = path[s + 1:t + 2]
+                island['x'], island['y'], island['z'] = end_at[:, 0], end_at[:, 1], end_at[:, 2]
 
+                block.append(island)
+                points.append(end_at)
+                here = end_at[-1]
 
-        # getting motion history
-        # list comprehension to get the coordingates from self.history
-        X = array([i[0] for i in self.history]) # numpy
-        Y = array([i[1] for i in self.history]) # numpy
-        Z = array([i[2] for i in self.history]) # numpy
+            block = concatenate(block) # numpy
 
-        # defining the update function to needed by the plotting function
-        def update(i):
-            # when i == self.t[-1], argument == len(self.t)
-            return X[0:int(i*len(self.t)/self.t[-1])], Y[0:int(i*len(self.t)/self.t[-1])], Z[0:int(i*len(self.t)/self.t[-1])]
+            # absolute extrusion counts up from the E before the run
+            if not rel_e[a]:
+                given = block['e'] == block['e']
+                block['e'][given] = e_before[a] + cumsum(block['e'][given]) # numpy
 
-        # defining labels:
+            # speeds are only written when they change. The first line always has one
+            v = block['f'].copy()
+            block['f'] = where(concatenate(([True], v[1:] != v[:-1])), v, nan) # numpy
 
-        # setting additional arguments
-        # generating labels for the axes
-        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
-                     'Z ({})'.format(self.unit_sys)]
+            # the next move is written with all its axes and the speed it had before
+            la, lb = moves[a], moves[b]
+            if b + 1 < m:
+                after_line = moves[b + 1]
+                if lines_only[b + 1]:
+                    for i, name in enumerate('xyz'):
+                        rec[name][after_line] = path[b + 2, i]
 
+                set_at = searchsorted(speeds, lb + 1) # numpy
+                if (set_at == len(speeds) or speeds[set_at] > after_line) and speed[after_line] != v[-1]:
+                    rec['f'][after_line] = speed[after_line]
 
-        # Keeps aspect ratio square but can be computationally expensive for large GCODE
-        # http://stackoverflow.com/questions/13685386
-        # numpy array
-        max_range = array([X.max()-X.min(),
-                              Y.max()-Y.min(),
-                              Z.max()-Z.min()]).max() / 2.0
+            pieces += [rec[line:la], block]
+            history += [path[1 + move:1 + a], vstack(points)] # numpy
+            line, move = lb + 1, b + 1
+            after += new - old
 
-        mean_x = X.mean()
-        mean_y = Y.mean()
-        mean_z = Z.mean()
+        pieces.append(rec[line:])
+        history.append(path[1 + move:])
+        pieces = concatenate(pieces) # numpy
+        history = concatenate(history) # numpy
 
-        # generating the axis limits
-        ax_lim = [mean_x - max_range, mean_x + max_range,
-                  mean_y - max_range, mean_y + max_range,
-                  mean_z - max_range, mean_z + max_range]
+        # replacing the records and motion history
+        self.count += len(pieces) - len(rec)
+        self.log.clear()
+        self.log.extend(pieces)
+        self._history.clear()
+        self._history.extend(history)
 
+        self._retime()
 
-        # generating the slider labels
-        slider_label = 'Time (min)'
-        slider_range = [0, self.t[-1]]
-        slider_dx = self.t[-1]/len(self.t)
+        return before, after
 
-        # calling function from visual.py
-        slider_view(update, *args ,slide_label=slider_label, slide_range=slider_range,
-                    ax_lim=ax_lim, ax_label=ax_labels, fig_title=fig_title, slide_dx=slider_dx,
-                    **kwargs)
 
-        return
+    # method that moves, turns, scales, or mirrors the whole program
+    def transform(self, matrix):
+        '''
+        Parameters:
 
+        > MATRIX: a 4x4 affine transform of shape (4,4) applied to the positions as
+            column vectors [x,y,z,1]
 
-    ######################################################################################
-    ######################################################################################
-    ## Hidden methods to handle internal processes---------------------------------------
-    ## ------------------------------------------------------------------------------------
-    ######################################################################################
-    ######################################################################################
+        * Notes: absolute moves are written with every axis the transform changes so
+            each one moves to its new position. Relative moves and the I,J of arcs
+            only use the linear part of the transform. Moves after the start or a G28
+            and before the next absolute move are relative to the home position,
+            which does not move. Positions given to G92 are moved too. Extrusion is
+            not changed. Arcs can only be turned, mirrored, moved, and scaled the
+            same in x and y
+        '''
 
-    # hidden method to format the GCODE move command
-    def _move_format(self, line,pos=None,x=None,y=None,z=None,speed=None,extrude=None,check_end=None,write=True):
+        m = asarray(matrix, dtype=float64) # numpy
+        if m.shape != (4, 4) or (m[3] != [0, 0, 0, 1]).any():
+            raise ValueError('The transform must be an affine matrix of shape (4,4)')
+
+        self._check_memory()
+
+        self._transform(self.log.view(), self._history.view(), m, self._anchored())
+        self._retime()
+
+        return
+
+
+    # method that moves the whole program
+    def translate(self, x=0, y=0, z=0):
         '''
         Parameters:
 
-        > LINE: the gline that already contains the GCODE command
+        > X,Y,Z: the distance to move the program along each axis
+        '''
 
-        > X: The x coordinate to move the print head to. X can be an int,float, or array
-            of shape (n,) or (n,3). If shape is (n,), then each element is used
-            sequentially as the x coordinate for each motion (each element in the array).
-            If X has shape (n,3), then each column is defined as x,y,z and each row is a
-            subsequent movement.
+        m = eye(4) # numpy
+        m[:3, 3] = x, y, z
+        self.transform(m)
+
+        return
+
+
+    # method that turns the whole program about the z axis
+    def rotate_z(self, angle, center=(0, 0)):
+        '''
+        Parameters:
+
+        > ANGLE: the angle in degrees to turn counter clockwise
+        > CENTER: the x,y point to turn about
+        '''
+
+        c, s = cos(radians(angle)), sin(radians(angle)) # numpy
+        turn = array([[c, -s], [s, c]]) # numpy
+
+        m = eye(4) # numpy
+        m[:2, :2] = turn
+        m[:2, 3] = asarray(center, dtype=float64) - turn @ asarray(center, dtype=float64) # numpy
+        self.transform(m)
+
+        return
+
+
+    # method that scales the whole program
+    def scale(self, x, y=None, z=None, center=(0, 0, 0)):
+        '''
+        Parameters:
+
+        > X: the scale along x. If Y and Z are not given, they are the same as X
+        > Y,Z: the scale along y and z
+        > CENTER: the x,y,z point that does not move
+        '''
+
+        factor = array([x, x if y is None else y, x if z is None else z], dtype=float64) # numpy
+
+        m = eye(4) # numpy
+        m[:3, :3] = diag(factor) # numpy
+        m[:3, 3] = asarray(center, dtype=float64) * (1 - factor) # numpy
+        self.transform(m)
+
+        return
+
+
+    # method that mirrors the whole program across a plane
+    def mirror(self, axis='x', about=0):
+        '''
+        Parameters:
+
+        > AXIS: 'x', 'y', or 'z'. The coordinate along this axis is flipped
+        > ABOUT: the coordinate of the plane to mirror across
+        '''
+
+        if axis not in ('x', 'y', 'z'):
+            raise ValueError('Unknown axis {}. Options are x, y, and z'.format(axis))
+
+        k = 'xyz'.index(axis)
+        m = eye(4) # numpy
+        m[k, k] = -1
+        m[k, 3] = 2*about
+        self.transform(m)
+
+        return
+
+
+
+
+    ######################################################################################
+    ######################################################################################
+    ## Combining programs ------------------------------------------------------------------
+    ## ------------------------------------------------------------------------------------
+    ######################################################################################
+    ######################################################################################
+
+    # method that adds the lines of another gcode object after the lines of this one
+    def extend(self, other, start=None):
+        '''
+        Parameters:
+
+        > OTHER: a gcode object. Its lines, motion history, times, and extrusion are
+            added as if its commands were written to this object. The whole program
+            of OTHER must be held in memory
+        > START: a dictionary of the state OTHER was made from. The keys can be
+            'pos', 'coords', 'unit_sys', 'extrude_mode', 'extrude_pos', and
+            'speed' (units per minute) as in the attributes of gcode. Keys that are
+            not given are the state of a new gcode object
+
+        * Notes: lines are added to go to the start state where this object ends in
+            a different one. If 'pos' is given, the print head moves there with G0.
+            Otherwise, positions of OTHER before an axis is moved to an absolute
+            position are moved by the current position, as the printer would move
+            them. The lines are copied as whole arrays, so the time taken does not
+            depend on the number of lines of this object
+        '''
+
+        if not isinstance(other, gcode):
+            raise TypeError('Only gcode objects can be added to a gcode object, not {}'.format(type(other)))
+        other._check_memory()
+        self._check_open()
+
+        # nothing is recorded in debug mode
+        if self.debug:
+            print(''.join(other.lines(self.settings)), end='')
+            return
+
+        # copied first so an object can be added to itself, along with the state it
+        # ends in
+        rec = other.log.view().copy()
+        hist = other.history.copy()
+        fed = other.extrusion.copy()
+        end = {i: getattr(other, i) for i in ['coords', 'unit_sys', 'extrude_mode', 'extrude_pos', '_e_idle']}
+
+        # going to the state OTHER starts from. The units are set first since they
+        # change the meaning of the position
+        start = {} if start is None else start
+        if self.unit_sys != start.get('unit_sys', 'mm'):
+            if start.get('unit_sys', 'mm') == 'mm':
+                self.use_mm()
+            else:
+                self.use_in()
+
+        # moving to the start position
+        origin = zeros(3) # numpy
+        if start.get('pos') is not None:
+            origin = asarray(start['pos'], dtype=float64) # numpy
+            if (origin != self.current_pos).any():
+                step = origin - self.current_pos if self.coords == 'rel' else origin
+                self.rapid_move(*step.tolist())
+
+        if self.coords != start.get('coords', 'abs'):
+            if start.get('coords', 'abs') == 'abs':
+                self.abs_move()
+            else:
+                self.rel_move()
+        if self.extrude_mode != start.get('extrude_mode', 'abs'):
+            if start.get('extrude_mode', 'abs') == 'abs':
+                self.abs_extrude()
+            else:
+                self.rel_extrude()
+
+        # only absolute extrusion needs the extruder at the start position. With
+        # relative extrusion, the position of OTHER is counted from this one
+        base = start.get('extrude_pos', 0)
+        if start.get('extrude_mode', 'abs') == 'abs' and self.extrude_pos != base:
+            self.set_pos(extrude=base)
+        extruded = self.extrude_pos - base
+
+        # lines of OTHER without a speed use the start speed
+        if start.get('speed') and start['speed'] != self.print_speed:
+            line = gline('G1')
+            line.set('f', start['speed'])
+            self.print_speed = start['speed']
+            self.write(line)
+
+        first = len(self.log)
+        offset = self.current_pos - origin
+
+        # the commands and strings of OTHER are numbered by the tables of this object
+        ops = array([self.log.op(i) for i in other.log.ops], dtype=uint16) # numpy
+        strings = array([self.log.intern(i) for i in other.log.strings] + [-1], dtype=int32) # numpy
+        rec['op'] = ops[rec['op']]
+        rec['words'] = strings[rec['words']]
+        rec['com'] = strings[rec['com']]
+
+        # positions before an axis is moved to an absolute position or home are
+        # relative to where the print head starts
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        absolute = (rec['flags'][moves] & REL) == 0
+        home = rec['op'][moves] == self.log._ops.get('G28', -1)
+        for axis, name in enumerate('xyz'):
+            col = rec[name][moves]
+            unset = cumsum((absolute & (col == col)) | home) == 0 # numpy
+            hist[unset, axis] += offset[axis]
+
+        # recording the lines, motion, and filament
+        self.log.extend(rec)
+        self._history.extend(hist)
+        self._e.extend(fed)
+        self._e_idle += end['_e_idle']
+        self.count += len(rec)
+
+        # the time of the moves of OTHER from the speed of this object
+        _, path, distance, v, dwell = self._segments(first, self.print_speed)
+        dt = (distance/where(v != 0, v, 1) + dwell) * (v != 0) # numpy
+        self._t.extend(self.print_time + cumsum(dt)) # numpy
+        self._plan = None
+
+        # the state at the end of OTHER
+        f = rec['f'][rec['f'] == rec['f']]
+        self.print_time += dt.sum()
+        self.print_speed = f[-1] if len(f) else self.print_speed
+        self.current_pos = path[-1].copy()
+        self.previous_pos = path[-2].copy() if len(path) > 1 else self.previous_pos
+        self.coords = end['coords']
+        self.unit_sys = end['unit_sys']
+        self.extrude_mode = end['extrude_mode']
+        self.extrude_pos = end['extrude_pos'] + extruded
+
+        # writing to the sink when enough lines are held
+        if self.sink is not None and len(self.log) >= self.flush_size:
+            self.flush()
+
+        return
+    # end of extend
+
+
+    # method that makes a program with copies of this program placed across the bed
+    def tile(self, offsets=None, grid=None, spacing=None, order='sequential', clearance=1.0):
+        '''
+        Parameters:
+
+        > OFFSETS: array of shape (k,2) or (k,3) of the distance each copy is moved
+            along x,y or x,y,z
+        > GRID: in place of OFFSETS, the number of copies (nx, ny) in a grid
+        > SPACING: the distance (dx, dy) between the copies of the grid
+        > ORDER: 'sequential' prints each copy whole before the next one. 'layers'
+            prints a layer of every copy before the next layer
+        > CLEARANCE: with the sequential order, the height above everything printed
+            so far that the print head travels to the next copy at
+
+        Returns:
+
+        > TILES: a gtile object. Its lines, save, and gcode methods give the
+            program with the copies. See gtile.py
+
+        * Notes: this program is kept once with the offsets. The lines of each copy
+            are moved by its offset only as they are written, so saving the copies
+            holds about one piece in memory. gtile.gcode makes a gcode object of
+            every copy when the motion history of all of them is needed
+
+        * Notes: the lines before the first move that extrudes and after the last
+            one, like going home and heating, start and end the print and are written
+            once. Between two pieces, the print head goes up, then across, and then
+            down to where the next piece starts. A piece that does not start after an
+            absolute move is gone to at its first absolute move. With the layers
+            order it goes up to the higher of its height and that of the next piece.
+            With the sequential order it goes CLEARANCE above all that is printed
+        '''
+
+        # the offsets of a grid of copies
+        if grid is not None:
+            if spacing is None:
+                raise ValueError('The spacing of the grid must be given')
+            i, j = meshgrid(arange(grid[0]), arange(grid[1])) # numpy
+            offsets = column_stack((i.ravel()*spacing[0], j.ravel()*spacing[1])) # numpy
+
+        offsets = asarray(offsets, dtype=float64) # numpy
+        if offsets.ndim != 2 or offsets.shape[1] not in (2, 3):
+            raise ValueError('The offsets must have shape (k,2) or (k,3) but have shape {}'.format(offsets.shape))
+        if offsets.shape[1] == 2:
+            offsets = column_stack((offsets, zeros(len(offsets)))) # numpy
+
+        return gtile(self, offsets, order, clearance)
+
+
+    ######################################################################################
+    ######################################################################################
+    ## Visualisation tools -------------------------------------------------------------
+    ## ------------------------------------------------------------------------------------
+    ######################################################################################
+    ######################################################################################
+
+
+
+
+    # Method to visualize the printer path
+    '''
+    To Do:
+
+    > DOCUMENTATION!!!!
+    > Create more arguments for customizability
+    > new type of visualization! one color to specify when extrude
+        another color not with a legend
+    > break this into several methods
+    '''
+    def view(self, *args, fig_title='Print Path', labels=False, pick=None, **kwargs):
+
+        '''
+        Parameters:
+
+
+        > *args,**kwargs : are passed to matplotlib's pyplot.plot function
+
+        > FIG_TITLE: the title given to the figure. Only used is a figure is not given to plot on
+
+        > GIVE : this command makes the method return the figure after the path data is
+                plotted. This has no effect when mayavi is the backend.
+
+        > PICK: if true, double clicking the path prints the motion nearest to the line
+                of sight under the mouse, its position, and its time. A function is
+                called with the index of the motion instead. Only with matplotlib
+        '''
+
+        # generating labels for the axes
+        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
+                     'Z ({})'.format(self.unit_sys)]
+
+        # the motion under a double click is found with the spatial index
+        if pick:
+            index = self.spatial_index()
+
+            def picked(a, b):
+                move, dist = index.along(a, b)
+                if move < 0:
+                    return
+                if callable(pick):
+                    pick(move)
+                else:
+                    print('motion {} at {} at {:.3f} min'.format(move, self.history[move].tolist(), float(self.t[move])))
+
+            kwargs['pick'] = picked
+
+        # function call from module visual
+        if labels:
+
+            fig = plot3(self.history, *args, title=fig_title,
+                axis_label=ax_labels, backend=self.settings.graphics,
+                **kwargs)
+        else:
+            fig = plot3(self.history, *args, title=fig_title,
+                        backend=self.settings.graphics, **kwargs)
+
+
+        return fig
+
+
+    # method that has a colorbar to parameterize the time of the print
+    def cbar_view(self, *args, labels=False, fig_title='Printer Path', **kwargs):
+        '''
+        Parameters:
+
+        see visual.py color_view for all arguments. Some are defined here. Still working on it
+
+        * Notes: the colors are the time of each motion, t. With a machine, this is
+            the planned time
+        '''
+
+        # the time of each motion. Planned once if there is a machine
+        t = self.t
+
+        # generating labels
+
+        # generating labels for the axes
+        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
+                     'Z ({})'.format(self.unit_sys)]
+
+        # four color bar ticks
+        colorbar_ticks = [0, t[-1]/3, 2*t[-1]/3, t[-1]]
+
+        # generating the colorbar tick labels
+        colorbar_tick_labels = ['0']
+
+        # generating the labels by iterative over the ticks and converting them to strings
+        for i in colorbar_ticks[1:]:
+            colorbar_tick_labels.append('{:0.2f}'.format(i))
+
+        # colorbar label
+        colorbar_label = 'Time (min)'
+
+
+        # function call from module visual
+        if labels:
+
+            fig = color_view(self.history, t, *args, fig_title=fig_title,
+                    colorbar_ticks=colorbar_ticks, colorbar_tick_labels=colorbar_tick_labels,
+                    colorbar_label=colorbar_label, axis_label=ax_labels,
+                    backend=self.settings.graphics, **kwargs)
+        else:
+            fig = color_view(self.history, t, *args, fig_title=fig_title,
+                   colorbar_ticks=colorbar_ticks, colorbar_tick_labels=colorbar_tick_labels,
+                   colorbar_label=colorbar_label,
+                   backend=self.settings.graphics, **kwargs)
+        
+
+
+
+        return fig
+
+    # a function to wrap the stuff needed for a live graph takes a function that returns a
+    # X and Y array to be plotted, a single input i to that function is required
+    def animated(self, *args, fig_title='Print Path',**kwargs):
+
+        '''
+        Parameters:
+
+        See visual.py Some arguments are defined here though. Working on it still
+
+        Defined here: ax_label, ax_lim, fig_title, loop
+        '''
+
+        # getting motion history. These are views so nothing is copied
+        X = self.history[:, 0]
+        Y = self.history[:, 1]
+        Z = self.history[:, 2]
+
+        # defining the update function to needed by the plotting function
+        def update(i):
+            return X[0:i], Y[0:i], Z[0:i]
+
+
+        # setting additional arguments
+        # generating labels for the axes
+        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
+                     'Z ({})'.format(self.unit_sys)]
+
+
+        # Keeps aspect ratio square. The limits are found from the statistics
+        # http://stackoverflow.com/questions/13685386
+        ax_lim = self._axis_limits()
+
+
+
+
+        # calling function from visual.py
+        live_view(update, *args, ax_label=ax_labels, ax_lim=ax_lim,
+                  fig_title=fig_title, loop=len(self.t)+1, **kwargs)
+
+
+        return
+
+
+    # method that has a slider on the bottom of the figure to animate the print path
+    def slide_view(self, *args, fig_title='Printer Path', **kwargs):
+        '''
+        Parameters:
+
+        See visual.py, slider_view
+        '''
+
+
+
+        # getting motion history. These are views so nothing is copied
+        X = self.history[:, 0]
+        Y = self.history[:, 1]
+        Z = self.history[:, 2]
+
+        # the time of each motion. Planned once if there is a machine
+        t = self.t
+
+        # defining the update function to needed by the plotting function. The path
+        # is drawn up to the position of the print head at time i
+        def update(i):
+            k, pos = _at_time(t, self.history, i)
+            return append(X[:k], pos[0]), append(Y[:k], pos[1]), append(Z[:k], pos[2]) # numpy
+
+        # defining labels:
+
+        # setting additional arguments
+        # generating labels for the axes
+        ax_labels = ['X ({})'.format(self.unit_sys),'Y ({})'.format(self.unit_sys),
+                     'Z ({})'.format(self.unit_sys)]
+
+
+        # Keeps aspect ratio square. The limits are found from the statistics
+        # http://stackoverflow.com/questions/13685386
+        ax_lim = self._axis_limits()
+
+
+        # generating the slider labels
+        slider_label = 'Time (min)'
+        slider_range = [0, t[-1]]
+        slider_dx = t[-1]/len(t)
+
+        # calling function from visual.py
+        slider_view(update, *args ,slide_label=slider_label, slide_range=slider_range,
+                    ax_lim=ax_lim, ax_label=ax_labels, fig_title=fig_title, slide_dx=slider_dx,
+                    **kwargs)
+
+        return
+
+
+    ######################################################################################
+    ######################################################################################
+    ## Motion history access -------------------------------------------------------------
+    ## ------------------------------------------------------------------------------------
+    ######################################################################################
+    ######################################################################################
+
+    # the lines of GCODE as a list of strings. The lines are made from the log on
+    # every access so changing the list does not change the GCODE. Use lines to go
+    # through them without making the list. Raises a RuntimeError if lines were
+    # written to the sink
+    @property
+    def code(self):
+        return list(self.lines())
+
+    # the methods of the GCODE commands by command, like 'G1'. Commands read from
+    # files use these methods
+    @property
+    def gcode_methods(self):
+        return {k: getattr(self, v) for k, v in self._commands.items()}
+
+    # the motion history as an array of shape (n,3). This is a view of the
+    # preallocated memory so nothing is copied
+    @property
+    def history(self):
+        return self._history.view()
+
+    # the time at each motion as an array of shape (n,) in minutes. With a machine,
+    # this is the planned time. It is kept with the last plan until the program
+    # changes
+    @property
+    def t(self):
+        if self.machine is not None:
+            self.plan()
+            return self._plan[2]
+        return self._t.view()
+
+    # the filament fed by each motion as an array of shape (n,) in the units of the
+    # program. Retractions are negative
+    @property
+    def extrusion(self):
+        return self._e.view()
+
+    # boolean array of shape (n,) that is true for the motions that extrude and
+    # false for travel
+    @property
+    def extruding(self):
+        return self._e.view() > 0
+
+    # a dictionary of the statistics of the program: the number of LINES and MOVES,
+    # the MIN, MAX, and MEAN of the motion history, the length of the path that
+    # extrudes, EXTRUDE_LENGTH, and of the travel, TRAVEL_LENGTH, the number of lines
+    # of each of the COMMANDS, the fastest speed written, MAX_FEED, and the
+    # PRINT_TIME. Only the lines written since the statistics were last used are
+    # looked at
+    @property
+    def stats(self):
+
+        self._update_stats()
+        s = self._stat_state
+        ops = self.log.ops
+
+        return {'lines': self.count, 'moves': len(self._history),
+                'min': s['min'].copy(), 'max': s['max'].copy(),
+                'mean': s['sum'] / max(len(self._history), 1),
+                'extrude_length': s['extrude'], 'travel_length': s['travel'],
+                'commands': {ops[i]: int(n) for i, n in enumerate(s['ops']) if n and ops[i]},
+                'max_feed': s['max_feed'], 'print_time': self.print_time}
+
+    # the number of layers in the program. See layer_starts
+    @property
+    def layer_count(self):
+        self._index_layers()
+        return len(self._layers)
+
+
+    # gives the first line and the first move of every layer
+    def layer_starts(self):
+        '''
+        Returns:
+
+        > STARTS: an int array of shape (n,2). Each row is the index of the first
+            line and the first motion of a layer
+
+        * Notes: a layer starts at M790 or at a slicer comment like ;LAYER: if
+            filament was fed since the marker before it. Without markers, a layer
+            starts after the last extruding move below the height of its first
+            extruding move. The first layer starts at the first line
+        '''
+
+        self._index_layers()
+        return self._layers.view()
+
+
+    # gives the motion in progress at a time
+    def index_at(self, t):
+        '''
+        Parameters:
+
+        > T: the time in minutes from the start of the program, or an array of times
+
+        Returns:
+
+        > I: the index of the motion in progress at each time. Times before the
+            start give the first motion and times after the end give the last one
+        '''
+
+        i, pos = _at_time(self.t, self.history, t)
+        return i if i.ndim else int(i)
+
+
+    # gives the position of the print head at a time
+    def position_at(self, t):
+        '''
+        Parameters:
+
+        > T: the time in minutes from the start of the program, or an array of times
+
+        Returns:
+
+        > POS: array of shape (3,) of the position, or (q,3) for an array of times
+
+        * Notes: the print head moves in a straight line at a steady speed during
+            each motion, so arcs are followed along their chord
+        '''
+
+        i, pos = _at_time(self.t, self.history, t)
+        return pos
+
+
+    # gives a spatial index of the motion history. Used to find the motions near a
+    # point, in a box, or near each other
+    def spatial_index(self, cell=None):
+        '''
+        Parameters:
+
+        > CELL: the size of the cells of the index. See gindex
+
+        Returns:
+
+        > INDEX: a gindex object. Segment i of the index is the motion to row i of
+            the motion history
+
+        * Notes: the index is kept and only made again when motions are added or
+            changed
+        '''
+
+        key = len(self._history), None if cell is None else tuple(asarray(cell, dtype=float64) * ones(3)) # numpy
+        if self._index is None or self._index[0] != key:
+            self._index = key, path_index(self.history, cell=cell)
+
+        return self._index[1]
+
+
+    # finds the nearest motion to each point, like a point clicked in a view
+    def pick(self, points):
+        '''
+        Parameters:
+
+        > POINTS: array of shape (q,3) of points, or a single point
+
+        Returns:
+
+        > MOVES: array of shape (q,) of the index of the nearest motion in the
+            motion history. -1 if there are no motions
+        > DIST: array of shape (q,) of the distance to the motion
+        '''
+
+        return self.spatial_index().nearest(points)
+
+
+    # gives a view of one layer
+    def layer(self, i):
+        '''
+        Parameters:
+
+        > I: the index of the layer. Negative numbers count from the last layer
+
+        Returns:
+
+        > LAYER: a glayer object with the lines, motion history, and times of the
+            layer
+        '''
+
+        n = self.layer_count
+        if not -n <= i < n:
+            raise ValueError('Layer {} does not exist. The program has {} layers'.format(i, n))
+
+        i = i % n
+        return glayer(self, i, i + 1)
+
+
+    # gives a view of a range of layers
+    def layers(self, a=None, b=None):
+        '''
+        Parameters:
+
+        > A: the first layer. Default to the first layer of the program
+        > B: the layer after the last one. Default to the end of the program.
+            Negative numbers count from the last layer like a slice
+
+        Returns:
+
+        > LAYERS: a glayer object with the lines, motion history, and times of the
+            layers
+        '''
+
+        a, b, step = slice(a, b).indices(self.layer_count)
+        return glayer(self, a, max(a, b))
+
+
+    ######################################################################################
+    ######################################################################################
+    ## Hidden methods to handle internal processes---------------------------------------
+    ## ------------------------------------------------------------------------------------
+    ######################################################################################
+    ######################################################################################
+
+    # hidden method to format the GCODE move command
+    def _move_format(self, line,pos=None,x=None,y=None,z=None,speed=None,extrude=None,check_end=None,write=True):
+        '''
+        Parameters:
+
+        > LINE: the gline that already contains the GCODE command
+
+        > X: The x coordinate to move the print head to. X can be an int,float, or array
+            of shape (n,) or (n,3). If shape is (n,), then each element is used
+            sequentially as the x coordinate for each motion (each element in the array).
+            If X has shape (n,3), then each column is defined as x,y,z and each row is a
+            subsequent movement.
         > Y: the y coordinate to move the print head to. Behaves the same as X except for
             that only arrays of shape (n,) can be passed.
         > Z: the z coordinate to move the print head to. Behaves the same as X except for
@@ -1165,29 +2372,30 @@ class gcode():
 
         # appending parameters to line of GCODE
         if x or x == 0:
-            line.append('X' + self.settings['pos'].format(x) )
+            line.set('x', x)
             # updating position
             pos[0] = x
 
         if y or y == 0:
-            line.append('Y' + self.settings['pos'].format(y))
+            line.set('y', y)
             # updating position
             pos[1] = y
 
         if z or z == 0:
-            line.append('Z' + self.settings['pos'].format(z))
+            line.set('z', z)
             # updating position
             pos[2] = z
 
         # writes the speed command
         if speed:
-            # calls a hidden function to format the speed string
+            # calls a hidden function to convert the speed units
             # and two adjust attributes
-            line.append('F' + self._speed(speed))
+            self._speed(speed)
+            line.set('f', self.print_speed)
 
         # writes the extrusion command to this line
         if extrude or extrude == 0:
-            line.append('E' + self.settings['extrude'].format(extrude))
+            line.set('e', extrude)
 
         # writes command to check if an end point was hit. this defaults to not checking
         if check_end:
@@ -1203,7 +2411,837 @@ class gcode():
 
 
 
-    # method to format the speed command for the move functions and recording the
+    # hidden method to record many moves given as arrays at once. The lines are
+    # recorded as a block and the position, motion history, and time are updated
+    # with vectorized operations
+    def _move_array(self, command, com, x, y, z, speed=None, extrude=None, simplify=None):
+        '''
+        Parameters:
+
+        > COMMAND: the GCODE command at the start of every line. None for no command
+        > COM: the comment added to every line
+        > X,Y,Z: arrays of shape (n,) with the coordinates of each motion
+        > SPEED: see move. If an array of shape (n,), each row has its own speed and
+            the F word is only written when the speed changes. Values of zero or nan
+            keep the previous speed
+        > EXTRUDE: see move. If an array of shape (n,), each row has its own extrusion.
+            Values of nan do not write an E word
+        > SIMPLIFY: see move. If given, the number of rows removed and the largest
+            distance of a removed row from the path are returned
+        '''
+
+        self._check_open()
+
+        # checking that every row has all 3 coordinates
+        if x is None or y is None or z is None or not len(x) == len(y) == len(z):
+            raise ValueError('Input arrays must be of same length')
+
+        # checking the per row speed and extrusion
+        speed_arr = ndim(speed) > 0 # numpy
+        extrude_arr = ndim(extrude) > 0 # numpy
+        for i in [a for a, b in [(speed, speed_arr), (extrude, extrude_arr)] if b]:
+            if len(i) != len(x):
+                raise ValueError('Speed and extrude arrays must have the same length as the coordinates')
+
+        # removing the rows that are within the tolerance of the simplified path
+        report = None
+        if simplify is not None:
+            x, y, z, speed, extrude, report = self._simplify_rows(x, y, z, speed, extrude, simplify)
+            extrude_arr = ndim(extrude) > 0 # numpy
+
+        # debug mode only prints lines so each line is made individually
+        if self.debug:
+
+            # starting position for the motion
+            if self.coords == 'abs':
+                pos = self.current_pos.copy()
+            else:
+                pos = zeros(3) # numpy
+
+            for i in range(len(x)):
+                self._move_format(gline(command, com), pos, x[i], y[i], z[i],
+                                  speed[i] if speed_arr else speed,
+                                  extrude[i] if extrude_arr else extrude)
+            return report
+
+        # making an (n,3) array of the given coordinates
+        points = column_stack((x, y, z)).astype(float64) # numpy
+        n = len(points)
+
+        # nothing to write
+        if n == 0:
+            return report
+
+        # creating the records of every line
+        block = self.log.block(n, command, com, MOVE | (REL if self.coords == 'rel' else 0))
+        block['x'] = points[:, 0]
+        block['y'] = points[:, 1]
+        block['z'] = points[:, 2]
+
+        # the print speed of every row in units per minute
+        if speed_arr:
+            v = self._speed_array(speed)
+
+            # the F word is only written when the speed changes
+            changed = v != concatenate(([self.print_speed], v[:-1])) # numpy
+            block['f'] = where(changed, v, nan) # numpy
+
+        else:
+            # the speed is the same for every line
+            if speed:
+                self._speed(speed)
+                block['f'] = self.print_speed
+            v = full(n, self.print_speed) # numpy
+
+        # the extrusion of every row
+        if extrude_arr:
+            block['e'] = extrude
+        elif extrude or extrude == 0:
+            block['e'] = extrude
+
+        # the filament fed by every row. Rows without E feed nothing
+        e = block['e']
+        given = e == e
+        if self.extrude_mode == 'rel':
+            fed = where(given, e, 0) # numpy
+            self.extrude_pos += fed.sum()
+        else:
+            filled = fill_forward(e, given, self.extrude_pos)
+            fed = diff(concatenate(([self.extrude_pos], filled))) # numpy
+            self.extrude_pos = filled[-1]
+
+        # recording all the lines
+        self.log.extend(block)
+        self.count += n
+
+        # converting motion to absolute coordinates
+        if self.coords == 'rel':
+            # accumulating the relative motion starting from the current position
+            points = cumsum(vstack((self.current_pos, points)), axis=0)[1:] # numpy
+
+        # all positions including the starting position
+        path = vstack((self.current_pos, points)) # numpy
+
+        # updating time. The accumulation adds to print_time in the same order
+        # as _time does for a single motion
+        moving = v != 0
+        if not moving[0] and self.count == n:
+            # only printing warning once
+            print('Print speed not set. Print Times are Inf')
+
+        if any(moving):
+            distance = sqrt(((path[1:] - path[:-1])**2).sum(axis=1)) # numpy
+            dt = distance/where(moving, v, 1) * moving # numpy
+            t = cumsum(concatenate(([self.print_time], dt)))[1:] # numpy
+        else:
+            t = full(n, self.print_time) # numpy
+
+        # recording motion history, time, and filament
+        self._history.extend(points)
+        self._t.extend(t)
+        self._e.extend(fed)
+        self._plan = None
+
+        # updating the current and previous position, time, and speed
+        self.previous_pos = path[-2].copy()
+        self.current_pos = path[-1].copy()
+        self.print_time = t[-1]
+        self.print_speed = v[-1]
+
+        # writing to the sink once enough lines are held in memory. The motion is
+        # recorded first so the lines flushed match the motion history
+        if self.sink is not None and len(self.log) >= self.flush_size:
+            self.flush()
+
+        return report
+
+
+    # hidden method that removes the rows of array motion that are within TOL of the
+    # simplified path. Rows where the speed changes or where the motion starts or
+    # stops extruding are kept. Gives the new rows and the number removed and the
+    # largest distance of a removed row from the path
+    def _simplify_rows(self, x, y, z, speed, extrude, tol):
+
+        # making an (n,3) array of the given coordinates
+        points = column_stack((x, y, z)).astype(float64) # numpy
+        n = len(points)
+
+        # rows that must be kept
+        keep = zeros(n, dtype=bool) # numpy
+
+        # the rows where the speed changes and the rows before them
+        if ndim(speed) > 0: # numpy
+            v = self._speed_array(speed)
+            changed = v != concatenate(([self.print_speed], v[:-1])) # numpy
+            keep |= changed
+            keep[:-1] |= changed[1:]
+
+        # the rows before the motion starts or stops extruding
+        if extrude is not None:
+            e = asarray(extrude, dtype=float64) * ones(n) # numpy
+            given = e == e
+
+            if self.extrude_mode == 'rel':
+                extruding = given & (e > 0)
+            else:
+                # absolute extrusion only extrudes when E changes
+                before = concatenate(([nan], fill_forward(e, given, nan)[:-1])) # numpy
+                extruding = given & (e != before)
+
+            keep[:-1] |= extruding[1:] != extruding[:-1]
+
+        # the path in absolute coordinates
+        if self.coords == 'rel':
+            points = cumsum(vstack((self.current_pos, points)), axis=0)[1:] # numpy
+
+        keep, deviation = simplify_path(points, tol, keep)
+
+        # removing rows. Relative extrusion of removed rows is added to the next row
+        if ndim(speed) > 0: # numpy
+            speed = asarray(speed)[keep] # numpy
+
+        if extrude is not None:
+            if self.extrude_mode == 'rel':
+                e = merge_forward(e, keep)
+            extrude = e[keep]
+
+        points = points[keep]
+
+        # converting back to relative motion
+        if self.coords == 'rel':
+            points = diff(vstack((self.current_pos, points)), axis=0) # numpy
+
+        return points[:, 0], points[:, 1], points[:, 2], speed, extrude, (n - int(keep.sum()), deviation)
+
+
+    # hidden method that finds the moves that simplify and fit_arcs can change.
+    # Gives the index of the line of each move, the plain moves, and the moves that
+    # continue the path the same way as the move before and after them
+    def _runs(self):
+
+        rec = self.log.view()
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        m = len(moves)
+
+        op = rec['op']
+        flags = rec['flags']
+        ops = self.log._ops
+
+        # the extrusion mode of every line. Printers start with absolute extrusion
+        rel_e = self._rel_extrusion()[moves]
+
+        # the speed and last extrusion value after every line
+        f = rec['f']
+        e = rec['e']
+        speed = fill_forward(f, f == f, 0)
+        e_last = fill_forward(e, e == e, 0)
+
+        # the moves that change the speed
+        before = moves > 0
+        v = speed[moves]
+        changes_speed = v != where(before, speed[moves - 1], 0) # numpy
+
+        # the moves that extrude. Absolute extrusion only extrudes when E changes
+        em = e[moves]
+        given = em == em
+        extruding = given & where(rel_e, em > 0, em != where(before, e_last[moves - 1], 0)) # numpy
+
+        # plain moves that can be removed
+        plain = isin(op[moves], [0, ops.get('G0', -1), ops.get('G1', -1)]) # numpy
+        plain &= (flags[moves] & REL) == 0
+        plain &= (rec['com'][moves] < 0) & (rec['words'][moves] < 0) & ~changes_speed
+
+        # a move can be removed if the lines before and after it are moves and the
+        # next move continues the path the same way
+        joined = zeros(m, dtype=bool) # numpy
+        joined[1:-1] = (diff(moves[:-1]) == 1) & (diff(moves[1:]) == 1) # numpy
+        joined[:-1] &= op[moves[1:]] == op[moves[:-1]]
+        joined[:-1] &= (flags[moves[1:]] & REL) == 0
+        joined[:-1] &= ~changes_speed[1:]
+        joined[:-1] &= extruding[1:] == extruding[:-1]
+
+        return moves, plain, joined
+
+
+    # hidden method that applies an affine transform to records and their motion
+    # history in place. See transform
+    def _transform(self, rec, history, m, anchored, origin=zeros(3)):
+        '''
+        Parameters:
+
+        > REC: the records of the log to change
+        > HISTORY: the motion history of the moves of REC
+        > M: the affine matrix of shape (4,4)
+        > ANCHORED: boolean array of the moves that are after an absolute move since
+            the start or going home. Only these are shifted
+        > ORIGIN: the position before the first move of REC
+        '''
+
+        linear, shift = m[:3, :3], m[:3, 3]
+        changed = (linear != eye(3)).any(axis=1) | (shift != 0) # numpy
+        depends = linear != 0
+
+        op = rec['op']
+        ops = self.log._ops
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        rel = (rec['flags'] & REL) > 0
+
+        g2, g3 = ops.get('G2', -1), ops.get('G3', -1)
+        arcs = flatnonzero((op == g2) | (op == g3)) # numpy
+        plane = linear[:2, :2]
+        if len(arcs) and (linear[:2, 2].any() or linear[2, :2].any() or
+                          not allclose(plane @ plane.T, abs(det(plane)) * eye(2))): # numpy
+            raise ValueError('Arcs can only be turned, mirrored, moved, and scaled the same in x and y')
+
+        # the motion history. Moves are only shifted after an absolute move since the
+        # last time the print head went home
+        positional = isin(op, [0, ops.get('G0', -1), ops.get('G1', -1), g2, g3]) # numpy
+        absolute = (positional & ~rel)[moves]
+        moved = history @ linear.T + anchored[:, None] * shift # numpy
+
+        xyz = column_stack((rec['x'], rec['y'], rec['z'])) # numpy
+        given = xyz == xyz
+
+        # absolute moves are written where they now end
+        rows = moves[absolute]
+        write = given[rows] | changed
+        xyz[rows] = where(write, moved[absolute], nan) # numpy
+
+        # relative moves are turned and scaled
+        rows = flatnonzero(positional & rel) # numpy
+        step = where(given[rows], xyz[rows], 0) @ linear.T # numpy
+        write = given[rows] | (given[rows].astype(float64) @ depends.T > 0) # numpy
+        xyz[rows] = where(write, step, nan) # numpy
+
+        # positions given to G92. Axes that are not given are where the print head is
+        rows = flatnonzero((op == ops.get('G92', -1)) & given.any(axis=1)) # numpy
+        before = searchsorted(moves, rows) - 1 # numpy
+        at = where(before[:, None] >= 0, history[maximum(before, 0)], origin) # numpy
+        point = where(given[rows], xyz[rows], at) @ linear.T + shift # numpy
+        xyz[rows] = where(given[rows] | changed, point, nan) # numpy
+
+        rec['x'], rec['y'], rec['z'] = xyz.T
+
+        # the centers of arcs are relative to the start of the arc. Mirrored arcs turn
+        # the other way
+        if len(arcs):
+            ij = column_stack((rec['i'][arcs], rec['j'][arcs])) # numpy
+            ij = where(ij == ij, ij, 0) @ plane.T # numpy
+            rec['i'][arcs], rec['j'][arcs] = ij.T
+            if det(plane) < 0:
+                rec['op'][arcs] = where(op[arcs] == g2, self.log.op('G3'), self.log.op('G2')) # numpy
+
+        history[:] = moved
+
+        return
+
+
+    # hidden method that gives a boolean array of the moves that are after an
+    # absolute move since the start or the last time the print head went home. Like
+    # _pos_update, going home with relative coordinates does not move the print head
+    def _anchored(self):
+
+        rec = self.log.view()
+        op = rec['op']
+        ops = self.log._ops
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        rel = (rec['flags'] & REL) > 0
+
+        positional = isin(op, [0, ops.get('G0', -1), ops.get('G1', -1), ops.get('G2', -1), ops.get('G3', -1)]) # numpy
+        absolute = (positional & ~rel)[moves]
+        home = ((op == ops.get('G28', -1)) & ~rel)[moves]
+
+        return fill_forward(absolute, absolute | home, False)
+
+
+    # hidden method that gives a boolean array that is true for the lines written
+    # with relative extrusion (M83). Printers start with absolute extrusion
+    def _rel_extrusion(self):
+
+        op = self.log.view()['op']
+        ops = self.log._ops
+
+        mode = isin(op, [ops.get('M82', -1), ops.get('M83', -1)]) # numpy
+        return fill_forward(op == ops.get('M83', -1), mode, False)
+
+
+    # hidden method that counts the filament fed by every line from the log all at
+    # once. Used after the program is read or its lines are changed
+    def _count_extrusion(self):
+
+        fed, pos = self._line_extrusion()
+
+        moving = (self.log.view()['flags'] & MOVE) > 0
+        self._e.clear()
+        self._e.extend(fed[moving])
+        self._e_idle = float(fed[~moving].sum())
+        self.extrude_pos = pos[-1] if len(pos) else 0
+
+        return
+
+
+    # hidden method that gives the filament fed by every line and the position of
+    # the extruder after every line
+    def _line_extrusion(self):
+
+        rec = self.log.view()
+        e = rec['e']
+        given = e == e
+        reset = rec['op'] == self.log._ops.get('G92', -1)
+
+        # relative extrusion adds to the position of the extruder. Absolute extrusion
+        # and G92 set it
+        rel_e = self._rel_extrusion() & ~reset
+        steps = cumsum(where(rel_e & given, e, 0)) # numpy
+        sets = given & ~rel_e
+        last = fill_forward(arange(len(rec)), sets, -1) # numpy
+        base = where(last >= 0, e[last] - steps[last], 0) # numpy
+        pos = base + steps
+
+        # the filament fed by a line is the change in position. G92 feeds nothing
+        fed = diff(concatenate(([0], pos))) # numpy
+        fed[reset] = 0
+
+        return fed, pos
+
+
+    # hidden method that gives the state of the printer before each of the given
+    # lines as a list of dictionaries with the keys used by extend
+    def _states(self, lines):
+
+        rec = self.log.view()
+        op = rec['op']
+        ops = self.log._ops
+        before = asarray(lines, dtype=int) - 1 # numpy
+        at = maximum(before, 0) # numpy
+        known = before >= 0
+
+        # the last mode set by one of two commands before each line
+        def mode(a, b):
+            a, b = op == ops.get(a, -1), op == ops.get(b, -1)
+            return known & fill_forward(b, a | b, False)[at]
+
+        rel = mode('G90', 'G91')
+        inch = mode('G21', 'G20')
+        rel_e = known & self._rel_extrusion()[at]
+        e = where(known, self._line_extrusion()[1][at], 0) # numpy
+        f = rec['f']
+        speed = where(known, fill_forward(f, f == f, 0)[at], 0) # numpy
+
+        # the position after the last move before each line
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        last = searchsorted(moves, lines) - 1 # numpy
+        pos = where(last[:, None] >= 0, self.history[maximum(last, 0)], 0) # numpy
+
+        return [{'pos': pos[i], 'coords': 'rel' if rel[i] else 'abs',
+                 'unit_sys': 'in' if inch[i] else 'mm',
+                 'extrude_mode': 'rel' if rel_e[i] else 'abs',
+                 'extrude_pos': float(e[i]), 'speed': float(speed[i])} for i in range(len(before))]
+
+
+    # hidden method that copies lines FIRST to STOP of the log into a new gcode
+    # object. The arrays that are the same for every piece are given so many pieces
+    # can be made in time that only depends on their length
+    def _piece(self, first, stop, a, b, fed, start, end):
+        '''
+        Parameters:
+
+        > FIRST, STOP: the first line of the piece and the line after the last
+        > A, B: the first move of the piece and the move after the last
+        > FED: the filament fed by every line of the log. See _line_extrusion
+        > START, END: the state of the printer before line FIRST and before line
+            STOP. See _states
+        '''
+
+        piece = gcode(settings=self.settings, machine=self.machine)
+
+        # the same tables of commands and strings so the records do not change
+        piece.log.ops = list(self.log.ops)
+        piece.log._ops = dict(self.log._ops)
+        piece.log.strings = list(self.log.strings)
+        piece.log._strings = dict(self.log._strings)
+
+        rec = self.log.view()[first:stop]
+        moving = (rec['flags'] & MOVE) > 0
+        fed = fed[first:stop]
+
+        piece.log.extend(rec)
+        piece._history.extend(self._history[a:b])
+        piece._e.extend(fed[moving])
+        piece._e_idle = float(fed[~moving].sum())
+        piece.count = stop - first
+
+        # times are from the start of the piece
+        t = self._t.view()
+        piece._t.extend(t[a:b] - (t[a - 1] if a else 0))
+        piece.print_time = piece._t[-1] if b > a else 0
+
+        piece.current_pos = asarray(end['pos'], dtype=float64).copy() # numpy
+        piece.previous_pos = self._history[b - 2].copy() if b - a > 1 else asarray(start['pos'], dtype=float64) # numpy
+        piece.coords = end['coords']
+        piece.unit_sys = end['unit_sys']
+        piece.extrude_mode = end['extrude_mode']
+        piece.extrude_pos = end['extrude_pos']
+        piece.print_speed = end['speed']
+
+        return piece
+
+
+    # hidden method that moves the print head to TARGET with rapid moves that do not
+    # go below HEIGHT on the way: up, across, and then down
+    def _travel(self, target, height):
+
+        x, y, z = self.current_pos.tolist()
+        tx, ty, tz = asarray(target, dtype=float64).tolist() # numpy
+
+        for point in [(x, y, max(z, height)), (tx, ty, max(z, height)), (tx, ty, tz)]:
+            step = asarray(point) - self.current_pos # numpy
+            if (step != 0).any():
+                self.rapid_move(*(step if self.coords == 'rel' else asarray(point)).tolist())
+
+        return
+
+
+    # hidden method that gives a copy of the program held in memory. The buffers are
+    # copied as whole arrays and the state of the printer is the same
+    def _copy(self):
+
+        self._check_memory()
+        code = gcode(settings=self.settings, machine=self.machine)
+
+        # the same tables of commands and strings so the records do not change
+        code.log.ops = list(self.log.ops)
+        code.log._ops = dict(self.log._ops)
+        code.log.strings = list(self.log.strings)
+        code.log._strings = dict(self.log._strings)
+
+        code.log.extend(self.log.view())
+        code._history.extend(self._history.view())
+        code._t.extend(self._t.view())
+        code._e.extend(self._e.view())
+
+        # the state of the printer after the last line
+        for i in STATE:
+            setattr(code, i, getattr(self, i))
+        code.current_pos = self.current_pos.copy()
+        code.previous_pos = self.previous_pos.copy()
+        code._e_idle = self._e_idle
+
+        return code
+
+
+    # hidden method that sets the statistics of the program to those of a program
+    # with no lines
+    def _reset_stats(self):
+
+        self._stat_line = 0
+        self._stat_state = {'min': full(3, inf), 'max': full(3, -inf), 'sum': zeros(3), # numpy
+                            'travel': 0.0, 'extrude': 0.0, 'ops': zeros(0, dtype=int64), 'max_feed': 0.0} # numpy
+
+        return
+
+
+    # hidden method that adds the lines written since it was last called to the
+    # statistics of the program
+    def _update_stats(self):
+
+        rec = self.log.view()
+        first = self._stat_line - (self.count - len(rec))
+
+        # the extrusion is not known until a program that is read is finished
+        if first >= len(rec) or len(self._e) != len(self._history):
+            return
+
+        s = self._stat_state
+        moves, path, distance, v, dwell = self._segments(first)
+        k = len(self._history) - len(moves)
+
+        # the extents and the sum of the positions of the new motions
+        if len(moves):
+            s['min'] = minimum(s['min'], path[1:].min(axis=0)) # numpy
+            s['max'] = maximum(s['max'], path[1:].max(axis=0)) # numpy
+            s['sum'] = s['sum'] + path[1:].sum(axis=0)
+
+        # the length of the path that extrudes and of the travel
+        fed = self._e[k:] > 0
+        s['extrude'] += float(distance[fed].sum())
+        s['travel'] += float(distance[~fed].sum())
+
+        # the number of lines of each command and the fastest speed written
+        ops = bincount(rec['op'][first:], minlength=len(self.log.ops)) # numpy
+        ops[:len(s['ops'])] += s['ops']
+        s['ops'] = ops
+
+        f = rec['f'][first:]
+        f = f[f == f]
+        if len(f):
+            s['max_feed'] = max(s['max_feed'], float(f.max()))
+
+        self._stat_line = self.count
+
+        return
+
+
+    # hidden method that gives the limits of the axes of a cube around the motion
+    # history so views keep a square aspect ratio. Found from the statistics so the
+    # motion history is not scanned
+    def _axis_limits(self):
+
+        stats = self.stats
+        half = (stats['max'] - stats['min']).max() / 2.0
+        mean = stats['mean']
+
+        return [mean[0] - half, mean[0] + half,
+                mean[1] - half, mean[1] + half,
+                mean[2] - half, mean[2] + half]
+
+
+    # hidden method that empties the layer index. The first layer starts at the first
+    # line and the first move
+    def _reset_layers(self):
+
+        self._layers.clear()
+        self._layers.append([0, 0])
+        self._layer_line = 0
+
+        # what is carried from the lines already indexed to the next ones: whether
+        # filament was fed since the last layer marker, whether a marker was written
+        # since the last extruding move, the highest extruding move, and the line and
+        # move after the last extruding move
+        self._layer_state = {'fed': False, 'marked': False, 'top': -inf, 'after': None}
+
+        return
+
+
+    # hidden method that adds the layers of the lines written since it was last
+    # called to the layer index. A layer starts at a marker, M790 or a slicer comment
+    # like ;LAYER:, if filament was fed since the marker before it. Without markers, a
+    # layer starts after the last extruding move below the height of its first
+    # extruding move, so the travel and comments before a layer are part of it
+    def _index_layers(self):
+
+        rec = self.log.view()
+        first = self._layer_line - (self.count - len(rec))
+        rec = rec[first:]
+
+        # the extrusion is not known until a program that is read is finished
+        if len(rec) == 0 or len(self._e) != len(self._history):
+            return
+
+        s = self._layer_state
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        k = len(self._history) - len(moves)
+
+        # the line and the move of each extruding move
+        fed = flatnonzero(self._e[k:] > 0) # numpy
+        e_lines = moves[fed]
+        z = self._history[k + fed, 2]
+
+        # the lines that mark a new layer. Each comment is only checked once
+        ops = self.log._ops
+        com = rec['com']
+        comment = (rec['op'] == ops['']) & ((rec['flags'] & MOVE) == 0) & (com >= 0)
+        lines = flatnonzero(comment) # numpy
+        names, index = unique(com[lines], return_inverse=True) # numpy
+        text = [self.log.strings[i].lstrip().startswith(LAYER_MARKS) for i in names]
+        comment[lines] = array(text, dtype=bool)[index] # numpy
+        marks = flatnonzero(comment | (rec['op'] == ops.get('M790', -1))) # numpy
+
+        # markers start a layer if filament was fed since the marker before them
+        before = searchsorted(e_lines, marks) # numpy
+        fired = before > concatenate(([0], before[:-1])) # numpy
+        if len(marks):
+            fired[0] |= s['fed']
+        starts = [column_stack((marks[fired], k + searchsorted(moves, marks[fired])))] # numpy
+
+        # extruding moves above all the ones before them start a layer after the
+        # extruding move before them, unless a marker is written between the two. The
+        # first extruding move of the program does not start a layer
+        top = maximum.accumulate(concatenate(([s['top']], z))) # numpy
+        between = searchsorted(marks, e_lines) # numpy
+        marked = between > concatenate(([0], between[:-1])) # numpy
+        if len(z):
+            marked[0] |= s['marked'] or s['after'] is None
+        rises = (z > top[:-1] + 1e-9) & ~marked
+
+        # the line and the move after each extruding move, after the one carried from
+        # the lines before
+        last = array([s['after'] or (self._layer_line, 0)]) - [self._layer_line, 0] # numpy
+        after = vstack((last, column_stack((e_lines + 1, k + fed + 1)))) # numpy
+        starts.append(after[flatnonzero(rises)])
+
+        # adding the layers in order with lines counted from the first line written
+        starts = vstack(starts) # numpy
+        starts = starts[starts[:, 0].argsort(kind='stable')]
+        starts[:, 0] += self._layer_line
+        self._layers.extend(starts)
+
+        # the state carried to the next lines
+        if len(z):
+            s['top'] = float(top[-1])
+            s['after'] = (int(after[-1, 0]) + self._layer_line, int(after[-1, 1]))
+            s['marked'] = bool(len(marks) > between[-1])
+        else:
+            s['marked'] |= bool(len(marks))
+        if len(marks):
+            s['fed'] = bool(len(e_lines) > before[-1])
+        else:
+            s['fed'] |= bool(len(e_lines))
+
+        self._layer_line = self.count
+
+        return
+
+
+    # hidden method that removes the moves that are not kept along with their motion
+    # history. The relative extrusion of removed lines is added to the next line
+    def _remove_moves(self, moves, keep):
+        '''
+        Parameters:
+
+        > MOVES: the index of the line of each move
+        > KEEP: boolean array of the moves to keep. The last move must be kept
+        '''
+
+        rec = self.log.view()
+
+        # relative extrusion of removed lines is added to the next line that is kept
+        rel_e = self._rel_extrusion()[moves]
+        if rel_e.any():
+            em = rec['e'][moves]
+            merged = merge_forward(where(rel_e, em, nan), keep) # numpy
+            rec['e'][moves] = where(rel_e, merged, em) # numpy
+
+        # removing the lines and their motion history
+        lines = ones(len(rec), dtype=bool) # numpy
+        lines[moves[~keep]] = False
+        self.log.select(lines)
+        self._history.select(keep)
+        self.count -= len(keep) - int(keep.sum())
+
+        # the time of each motion changes with the new path
+        self._retime()
+
+        return
+
+
+    # hidden method that recalculates the time at each motion from the motion history
+    # and the speed of each line. Used after lines are removed or changed
+    def _retime(self):
+
+        moves, path, distance, v, dwell = self._segments()
+
+        # dwells add their time instead
+        dt = (distance/where(v != 0, v, 1) + dwell) * (v != 0) # numpy
+
+        t = cumsum(dt) # numpy
+        self._t.clear()
+        self._t.extend(t)
+        self._plan = None
+
+        # the filament fed by the lines that are left and their layers. The motion
+        # history may have changed so it is indexed again when it is used
+        self._count_extrusion()
+        self._reset_layers()
+        self._reset_stats()
+        self._index = None
+
+        # updating the time and positions
+        f = self.log.view()['f']
+        given = flatnonzero(f == f) # numpy
+        self.print_time = t[-1] if len(t) else 0
+        self.print_speed = f[given[-1]] if len(given) else 0
+        if len(path) > 1:
+            self.current_pos = path[-1].copy()
+            self.previous_pos = path[-2].copy()
+
+        return
+
+
+    # hidden method that gives the index of the line of every move, the position
+    # before the first move and after every move, and the length, speed in units per
+    # minute, and dwell time in minutes of every move. Found from the log and the
+    # motion history
+    def _segments(self, first=0, speed=0):
+        '''
+        Parameters:
+
+        > FIRST: only the lines from this line of the log on are used. The index of
+            each move is counted from FIRST
+        > SPEED: the print speed before line FIRST
+        '''
+
+        rec = self.log.view()[first:]
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+
+        # the print speed after each line is the last speed written
+        f = rec['f']
+        v = fill_forward(f, f == f, speed)[moves]
+
+        # distance of each motion. The print head starts at the origin or where the
+        # move before line FIRST ended
+        k = len(self._history) - len(moves)
+        path = vstack((self._history[k - 1] if k else zeros(3), self._history[k:])) # numpy
+        distance = sqrt(((path[1:] - path[:-1])**2).sum(axis=1)) # numpy
+
+        # arcs move along the length of the arc
+        op = rec['op'][moves]
+        g2, g3 = self.log._ops.get('G2', -1), self.log._ops.get('G3', -1)
+        arcs = flatnonzero((op == g2) | (op == g3)) # numpy
+        if len(arcs):
+            center = path[arcs, :2] + column_stack((rec['i'][moves[arcs]], rec['j'][moves[arcs]])) # numpy
+            distance[arcs] = arc_length(path[arcs], path[arcs + 1], center, op[arcs] == g2)
+
+        # the time of each dwell
+        dwell = zeros(len(moves)) # numpy
+        for i in flatnonzero(op == self.log._ops.get('G4', -1)): # numpy
+            dwell[i] = _dwell_time(self.log.strings[rec['words'][moves[i]]])
+
+        return moves, path, distance, v, dwell
+
+
+    # hidden method that raises an error if the lines of the whole program are not
+    # held in memory
+    def _check_memory(self):
+
+        moves = (self.log.view()['flags'] & MOVE) > 0
+        if self.debug or moves.sum() != len(self._history):
+            raise RuntimeError('The whole program must be held in memory. Lines have already been written to the sink')
+
+        return
+
+
+    # hidden method that raises an error if the sink was closed
+    def _check_open(self):
+
+        if self._closed:
+            raise RuntimeError('The gcode object was closed. Nothing more can be written to its sink')
+
+        return
+
+
+    # hidden method that converts an array of speeds to the print speed of each row
+    # in units per minute. Speeds of zero or nan keep the previous speed
+    def _speed_array(self, speed):
+
+        # converting units of the speed
+        if self.unit_sys == 'mm':
+            v = mmps2mmpm(asarray(speed, float64)) # numpy
+        else:
+            v = inps2inpm(asarray(speed, float64)) # numpy
+
+        # the speed before the first row
+        v = concatenate(([self.print_speed], v)) # numpy
+
+        # filling unset speeds with the last set speed
+        valid = (v != 0) & (v == v)
+        valid[0] = True
+        v = v[maximum.accumulate(where(valid, arange(len(v)), 0))] # numpy
+
+        return v[1:]
+
+
+    # method to convert the speed given to the move functions and recording the
     # speed as an internal attribute unit_sys.
     def _speed(self, v):
 
@@ -1215,8 +3253,8 @@ class gcode():
             # convert units of inches per sec to inches per meter
             self.print_speed = inps2inpm(v)
 
-        # returning the formated string of the speed
-        return self.settings['speed'].format(self.print_speed)
+        # returning the print speed in units per minute
+        return self.print_speed
 
 
 
@@ -1252,7 +3290,7 @@ class gcode():
                 print('Print speed not set. Print Times are Inf')
 
         # adds an element to a vector of time
-        self.t.append(self.print_time)
+        self._t.append(self.print_time)
 
         return
 
@@ -1281,10 +3319,9 @@ class gcode():
             # records position for relative coordinates. Position is in abs coordinates
             self.current_pos += pos
 
-        # recording motion
-        # need to pass a copy because a pointer is passed by default.
-        # this would mean that self.history would just be a list of the same pointer
-        self.history.append(self.current_pos.copy())
+        # recording motion. The buffer copies the values into its own memory
+        self._history.append(self.current_pos)
+        self._plan = None
 
 
         # updates the time taken to move the print head
@@ -1341,20 +3378,137 @@ class gcode():
 
 
 
-    # functions that give the printing options of the GCODE
+    # allows a gcode object with a sink to be used in a with statement. The sink is
+    # closed when the statement ends
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+        return False
+
+    # adding gcode objects gives a new object with the lines of both. See extend.
+    # Both objects are copied, so this takes time in proportion to the lines of
+    # both. Only += is cheap: it copies just the lines added. Join many parts with
+    # += or extend, as a = a + part copies a every time
+    def __add__(self, other):
+        code = self._copy()
+        code.extend(other)
+        return code
+    def __iadd__(self, other):
+        self.extend(other)
+        return self
+
+    # functions that give the printing options of the GCODE. Once lines were
+    # written to the sink, only their number is given
     def __repr__(self):
+        if self.count > len(self.log) and not self.debug:
+            return 'gcode({} lines written to the sink, {} held in memory)'.format(
+                self.count - len(self.log), len(self.log))
+
         # creates a print object and returns that
-        return ''.join(self.code)
+        return ''.join(self.lines())
 
     def __str__(self):
         # creates a print object and returns that
-        return ''.join(self.code)
+        return ''.join(self.lines())
+
+    # iterating over a gcode object gives each line of text
+    def __iter__(self):
+        return self.lines()
 
     # gives [] indexing gives access to the gcode methods as identified by the
     # actual GCODE commands. This makes reading GCODE easier
     def __getitem__(self, index):
-        return self.gcode_methods[index]
-
-    # gives built in len function access to self.code
+        return getattr(self, self._commands[index])
+
+    # gives pickle and copy the object without the timed methods of profile, which
+    # can not be pickled
+    def __getstate__(self):
+        state = self.__dict__.copy()
+        if self._profile is not None:
+            for i in set(self._commands.values()) | set(PROFILED) | set(STAGES):
+                state.pop(i, None)
+            state['_profile'] = None
+        return state
+
+    # gives built in len function the number of lines written, including the ones
+    # written to the sink
     def __len__(self):
         return self.count
+
+
+
+# hidden function that adds the .gcode extension to file names without one
+def _file_name(file, ext='.gcode'):
+
+    # first case, gcode file to save to
+    if len(file.split('.')) == 1:
+        file = file + ext
+
+    return file
+
+
+# hidden function that gives the time in minutes of the words of a dwell like 'S2'
+def _dwell_time(text):
+
+    for i in text.split(' '):
+        if i[:1] == 'S':
+            return float(i[1:])/60
+        elif i[:1] == 'P':
+            return float(i[1:])/(60*1000)
+
+    return 0
+
+
+# hidden function that gives the motion in progress and the position of the print
+# head at times T. Motions are found by binary search of their end times and the
+# position moves in a straight line during each motion
+def _at_time(times, history, t):
+    '''
+    Parameters:
+
+    > TIMES: array of shape (n,) of the time at the end of each motion
+    > HISTORY: array of shape (n,3) of the motion history
+    > T: a time or an array of times
+    '''
+
+    if len(times) == 0:
+        raise ValueError('The program has no motions')
+
+    t = asarray(t, dtype=float64) # numpy
+    i = clip(searchsorted(times, t), 0, len(times) - 1) # numpy
+
+    # the time and the position at the start of each motion. The print head starts
+    # at the origin
+    first = i > 0
+    start_t = where(first, times[i - 1], 0) # numpy
+    start = where(first[..., None], history[i - 1], 0) # numpy
+
+    # the part of the motion done. Motions that take no time are done
+    span = times[i] - start_t
+    done = clip(where(span > 0, (t - start_t)/where(span > 0, span, 1), 1), 0, 1) # numpy
+
+    return i, start + done[..., None]*(history[i] - start)
+
+
+# hidden function that checks if x is a numpy array with named fields
+def _is_structured(x):
+    return getattr(getattr(x, 'dtype', None), 'names', None) is not None
+
+
+# hidden function that breaks a structured array into its x,y,z columns and the
+# speed and extrusion columns if the fields f and e are given
+def _fields(a, speed=None, extrude=None):
+
+    # the coordinates are required
+    for i in ['x', 'y', 'z']:
+        if i not in a.dtype.names:
+            raise ValueError('Structured array is missing the field {}'.format(i))
+
+    # fields override the given speed and extrusion
+    if 'f' in a.dtype.names:
+        speed = a['f']
+    if 'e' in a.dtype.names:
+        extrude = a['e']
+
+    return a['x'], a['y'], a['z'], speed, extrude
@@ -0,0 +1,243 @@
+# Class that formats numbers for gcode quickly. Used by gsettings
+
+from re import match, compile
+from numpy import asarray, array, abs, floor, signbit, where, divmod, flatnonzero, \
+    float64, int64, object_
+
+
+# size of the digit tables. Each table holds every number with up to 4 digits
+_group = 4
+_size = 10**_group
+
+# tables of digit strings shared by all formatters. These are made when first needed
+_tables = {}
+
+
+# hidden function that returns a table of strings for 0 to 10**digits-1 with a prefix.
+# If PAD is true, the numbers are padded with zeros to the same number of digits
+def _table(digits, prefix='', pad=True):
+
+    key = (digits, prefix, pad)
+    if key not in _tables:
+        form = prefix + ('{:0' + str(digits) + 'd}' if pad else '{:d}')
+        _tables[key] = array([form.format(i) for i in range(10**digits)], dtype=object_) # numpy
+
+    return _tables[key]
+
+
+# regular expression of a plain decimal number
+_decimal = compile(r'^-?(\d+\.?\d*|\.\d+)$')
+
+
+# function that writes a decimal number with as few characters as possible. Trailing
+# zeros, a trailing decimal point, and a leading zero are removed. -0 is written as 0.
+# Text that is not a plain decimal number is returned unchanged
+def compact(text):
+    '''
+    Parameters:
+
+    > TEXT: a formatted number like '-0.5000'
+    '''
+
+    if not _decimal.match(text):
+        return text
+
+    # removing the sign to add back at the end
+    neg = text[0] == '-'
+    if neg:
+        text = text[1:]
+
+    # removing zeros after the decimal point
+    if '.' in text:
+        text = text.rstrip('0').rstrip('.')
+
+    # removing the zero before the decimal point
+    if text[:2] == '0.':
+        text = text[1:]
+
+    # zero has no sign
+    if text == '' or text == '0':
+        return '0'
+
+    if neg:
+        return '-' + text
+    return text
+
+
+# function that compacts the numbers of words of gcode like 'S255.00 P1'
+def compact_words(text):
+    '''
+    Parameters:
+
+    > TEXT: words seperated by spaces. Each word is a letter followed by a number
+    '''
+
+    return ' '.join([i[0] + compact(i[1:]) if len(i) > 1 else i for i in text.split(' ')])
+
+
+# hidden function that returns a table of the digits after the decimal point for
+# 0 to 10**digits-1 without trailing zeros. Zero is an empty string
+def _compact_table(digits):
+
+    key = (digits, 'compact')
+    if key not in _tables:
+        form = '.{:0' + str(digits) + 'd}'
+        _tables[key] = array([form.format(i).rstrip('0').rstrip('.') for i in range(10**digits)],
+                             dtype=object_) # numpy
+
+    return _tables[key]
+
+
+# class that compiles a number format string, like '{:0.4f}', into a formatter
+# with a fast method to format whole arrays at once
+class gformat():
+
+    def __init__(self, spec, compact=False):
+        '''
+        Parameters:
+
+        > SPEC: the format string used with str.format to write a single number
+        > COMPACT: if true, numbers are written with as few characters as possible.
+            See the function compact
+
+        * Notes: fixed point formats like '{:0.4f}' or '{:.2f}' are formatted with
+            integer arithmetic and digit tables. Other formats use str.format.
+            Both give identical strings.
+        '''
+
+        # the format string
+        self.spec = spec
+        self.compact = compact
+
+        # formatting a single number is fastest with str.format
+        if compact:
+            self.format = self._format_compact
+        else:
+            self.format = spec.format
+
+        # number of digits after the decimal point. None if the format is not fixed point
+        m = match(r'^\{:0?(?:\.(\d+))?f\}$', spec)
+        if m:
+            self.digits = int(m.group(1)) if m.group(1) else 6
+        else:
+            self.digits = None
+
+        # too many digits for 64 bit integers
+        if self.digits is not None and self.digits > 15:
+            self.digits = None
+
+        # end of init
+        return
+
+
+    # method to format an array of numbers into a list of strings
+    def format_array(self, x):
+        '''
+        Parameters:
+
+        > X: an array of numbers
+        '''
+
+        x = asarray(x) # numpy
+
+        # formats that can not be done with integers
+        if self.digits is None or x.dtype.kind not in 'fiub' or len(x) == 0:
+            return list(map(self.format, x.tolist()))
+
+        x = x.astype(float64).ravel()
+        p = self.digits
+
+        # values that are not finite or too large are done by str.format
+        exact = abs(x) < 2.0**52/10.0**p # numpy
+
+        # scaling the numbers so that the digits to write are an integer
+        s = where(exact, abs(x), 0.0) * 10.0**p # numpy
+        whole = floor(s) # numpy
+        part = s - whole
+
+        # rounding to the nearest integer. str.format rounds the exact binary value,
+        # which can differ from the scaled value by half a unit in the last place, so
+        # values close to a tie are also done by str.format
+        exact &= abs(part - 0.5) > s*2.0**-50 # numpy
+        k = (whole + (part >= 0.5)).astype(int64) # numpy
+        k[~exact] = 0
+
+        # the whole number part and the digits after the decimal point
+        whole, part = divmod(k, 10**p) # numpy
+
+        # the whole number part in groups of 4 digits
+        text = self._whole(whole)
+
+        # compact numbers with up to 4 digits after the decimal point use tables
+        # without trailing zeros. Otherwise the strings are compacted one by one
+        if self.compact and p <= _group:
+            if p > 0:
+                frac = _compact_table(p)[part]
+
+                # numbers less than one do not have the leading zero
+                text = text + frac
+                small = (whole == 0) & (part > 0)
+                text[small] = frac[small]
+
+            # zero has no sign
+            neg = flatnonzero(signbit(x) & (k > 0)) # numpy
+
+        else:
+            # the digits after the decimal point in groups of 4 digits
+            if p > 0:
+                lead = p - _group*((p - 1)//_group)
+                groups = []
+                for _ in range((p - 1)//_group):
+                    part, g = divmod(part, _size) # numpy
+                    groups.append(g)
+
+                text = text + _table(lead, '.')[part]
+                for g in reversed(groups):
+                    text = text + _table(_group)[g]
+
+            # adding the sign to negative numbers, including -0.0
+            neg = flatnonzero(signbit(x)) # numpy
+
+        text[neg] = '-' + text[neg]
+
+        # formatting the remaining values exactly
+        for i in flatnonzero(~exact): # numpy
+            text[i] = self.format(float(x[i]))
+
+        # compacting numbers that the tables could not
+        if self.compact and p > _group:
+            return list(map(compact, text.tolist()))
+
+        return text.tolist()
+
+
+    # hidden method to format a single number in compact form
+    def _format_compact(self, x):
+        return compact(self.spec.format(x))
+
+
+    # hidden method that writes non-negative integers using the digit tables
+    def _whole(self, k):
+
+        # most numbers are small and only need one table
+        if not (k >= _size).any():
+            return _table(_group, pad=False)[k]
+
+        # splitting the number into the lowest 4 digits and the rest
+        high, low = divmod(k, _size) # numpy
+        text = _table(_group, pad=False)[low]
+
+        # numbers with more digits are the rest followed by 4 padded digits
+        big = high > 0
+        text[big] = self._whole(high[big]) + _table(_group)[low[big]]
+
+        return text
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __repr__(self):
+        return self.spec
+    def __str__(self):
+        return self.spec
@@ -0,0 +1,462 @@
+'''
+Module with a class that is a spatial index of the segments of a toolpath. The
+segments are sorted into the cells of a uniform grid so the segments near a point
+or in a box are found without looking at every motion
+'''
+from .simplify import distance
+from numpy import asarray, ascontiguousarray, zeros, ones, arange, repeat, cumsum, concatenate, flatnonzero, \
+    floor, ceil, clip, where, minimum, maximum, median, sqrt, lexsort, searchsorted, full, inf, errstate, \
+    abs, prod, column_stack, sort, int64, float64
+
+
+# class that sorts the segments of a path into the cells of a uniform grid. Each
+# segment is in every cell it passes through. Only the cells with segments are
+# stored so the size of the index does not depend on the size of the grid
+class gindex():
+
+    def __init__(self, starts, ends, cell=None, offset=0):
+        '''
+        Parameters:
+
+        > STARTS, ENDS: arrays of shape (n,3) of the start and end of each segment
+        > CELL: the size of the cells. Either a number or a list of the x,y,z size.
+            Default to the median length of the segments in x and y and the median
+            change in height between segments in z, so the segments of each layer
+            are in their own cells
+        > OFFSET: added to the index of each segment given by the queries. Used
+            when the segments are a part of a longer path
+
+        * Notes: arcs are indexed as the straight segment between their ends
+        '''
+
+        self.starts = ascontiguousarray(starts, dtype=float64) # numpy
+        self.ends = ascontiguousarray(ends, dtype=float64) # numpy
+        self.offset = offset
+
+        if self.starts.shape != self.ends.shape or self.starts.shape[1:] != (3,):
+            raise ValueError('The starts and ends must be arrays of the same shape (n,3)')
+
+        self.cell = _cell_size(self.starts, self.ends) if cell is None else \
+            asarray(cell, dtype=float64) * ones(3) # numpy
+        if (self.cell <= 0).any():
+            raise ValueError('The size of the cells must be positive')
+
+        # the corner of the grid and the number of cells along each axis
+        if len(self.starts):
+            self.lo = minimum(self.starts, self.ends).min(axis=0) # numpy
+            hi = maximum(self.starts, self.ends).max(axis=0) # numpy
+        else:
+            self.lo = hi = zeros(3) # numpy
+        self.shape = floor((hi - self.lo)/self.cell).astype(int64) + 1 # numpy
+
+        # the cell of every segment sorted by cell. FIRST gives where the segments of
+        # each cell start in SEGMENTS
+        keys, self.segments = self._entries(self.starts, self.ends, 0.0)
+        start = flatnonzero(concatenate(([True], keys[1:] != keys[:-1]))[:len(keys)]) # numpy
+        self.keys = keys[start]
+        self.first = concatenate((start, [len(keys)])) # numpy
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # finds the segments within a distance of each point
+    def near(self, points, r):
+        '''
+        Parameters:
+
+        > POINTS: array of shape (q,3) of points, or a single point
+        > R: the distance. Either a number or an array of shape (q,) of the
+            distance of each point
+
+        Returns:
+
+        > WHICH: array of the index of the point of each segment found
+        > SEGMENTS: array of the index of each segment found, sorted by point
+        > DIST: array of the distance from each point to its segment
+        '''
+
+        points = _points(points)
+        r = asarray(r, dtype=float64) * ones(len(points)) # numpy
+
+        which, seg = self._candidates(points - r[:, None], points + r[:, None])
+        d = distance(points[which].T, self.starts[seg].T, self.ends[seg].T)
+        keep = d <= r[which]
+
+        return which[keep], seg[keep] + self.offset, d[keep]
+
+
+    # finds the nearest segment to each point
+    def nearest(self, points):
+        '''
+        Parameters:
+
+        > POINTS: array of shape (q,3) of points, or a single point
+
+        Returns:
+
+        > SEGMENTS: array of shape (q,) of the index of the nearest segment to each
+            point. -1 if there are no segments
+        > DIST: array of shape (q,) of the distance to the nearest segment
+
+        * Notes: the search around each point grows until a segment is found. Any
+            segment closer than the ones found is then within the same distance
+        '''
+
+        points = _points(points)
+        best = full(len(points), -1, dtype=int64) # numpy
+        dist = full(len(points), inf) # numpy
+
+        if len(self.segments) == 0:
+            return best, dist
+
+        # the distance from each point to the grid. The search starts one cell past
+        # it and can not need to go past the far corner of the grid
+        gap = maximum(maximum(self.lo - points, points - self.lo - self.shape*self.cell), 0) # numpy
+        outside = sqrt((gap**2).sum(axis=1)) # numpy
+        limit = outside + sqrt((((self.shape + 1)*self.cell)**2).sum()) # numpy
+
+        left = arange(len(points)) # numpy
+        step = self.cell.max()
+        while len(left):
+            which, seg, d = self.near(points[left], minimum(outside[left] + step, limit[left]))
+
+            # the closest segment to each point. Segments are sorted by point so the
+            # closest one is first after sorting by point then distance
+            order = lexsort((d, which)) # numpy
+            which, seg, d = which[order], seg[order], d[order]
+            found = concatenate(([True], which[1:] != which[:-1]))[:len(which)] # numpy
+            best[left[which[found]]] = seg[found]
+            dist[left[which[found]]] = d[found]
+
+            # searching farther around the points that found nothing
+            left = left[best[left] < 0]
+            step *= 4
+
+        return best, dist
+
+
+    # finds the segment nearest to a line, like the line of sight under a point
+    # clicked in a 3d plot
+    def along(self, a, b):
+        '''
+        Parameters:
+
+        > A, B: two points of shape (3,) on the line
+
+        Returns:
+
+        > SEGMENT: the index of the nearest segment to the line. -1 if there are no
+            segments
+        > DIST: the distance to the segment
+
+        * Notes: the line is searched at points spaced by the largest size of the
+            cells across the grid, so DIST is from the nearest of these points and
+            is within half a cell of the distance from the line
+        '''
+
+        if len(self.segments) == 0:
+            return -1, inf
+
+        a = asarray(a, dtype=float64) # numpy
+        d = asarray(b, dtype=float64) - a # numpy
+        hi = self.lo + self.shape*self.cell
+        step = self.cell.max()
+
+        # the part of the line in the grid
+        flat = d == 0
+        with errstate(divide='ignore', invalid='ignore'): # numpy
+            t1 = (self.lo - a)/d
+            t2 = (hi - a)/d
+        inside = (a >= self.lo) & (a <= hi)
+        t_in = where(flat, where(inside, -inf, inf), minimum(t1, t2)).max() # numpy
+        t_out = where(flat, where(inside, inf, -inf), maximum(t1, t2)).min() # numpy
+
+        # a line that misses the grid is searched from its point nearest the middle
+        length = sqrt((d**2).sum()) # numpy
+        if length == 0 or t_in > t_out:
+            t = ((self.lo + hi)/2 - a) @ d/length**2 if length else 0.0
+            points = (a + t*d)[None]
+        else:
+            count = int(ceil((t_out - t_in)*length/step)) + 1 # numpy
+            points = a + (t_in + (t_out - t_in)*arange(count)/max(count - 1, 1))[:, None]*d # numpy
+
+        # searching farther from the line until a segment is found
+        r = step
+        while True:
+            which, seg, dist = self.near(points, r)
+            if len(seg):
+                k = int(dist.argmin())
+                return int(seg[k]), float(dist[k])
+            r *= 4
+
+
+    # finds the segments that pass through boxes
+    def box(self, lo, hi):
+        '''
+        Parameters:
+
+        > LO, HI: arrays of shape (q,3) of the lowest and highest corner of each box,
+            or a single box
+
+        Returns:
+
+        > WHICH: array of the index of the box of each segment found
+        > SEGMENTS: array of the index of each segment found, sorted by box
+        '''
+
+        lo, hi = _points(lo), _points(hi)
+        which, seg = self._candidates(lo, hi)
+
+        # the part of each segment in the box along every axis. The segment passes
+        # through the box if the parts overlap
+        a = self.starts[seg]
+        d = self.ends[seg] - a
+        with errstate(divide='ignore', invalid='ignore'): # numpy
+            t1 = (lo[which] - a)/d
+            t2 = (hi[which] - a)/d
+        flat = d == 0
+        inside = (a >= lo[which]) & (a <= hi[which])
+        t_in = where(flat, where(inside, -inf, inf), minimum(t1, t2)).max(axis=1) # numpy
+        t_out = where(flat, where(inside, inf, -inf), maximum(t1, t2)).min(axis=1) # numpy
+        keep = (t_in <= t_out) & (t_out >= 0) & (t_in <= 1)
+
+        return which[keep], seg[keep] + self.offset
+
+
+    # finds the pairs of segments that pass within a distance of each other. Used to
+    # check a path for collisions and overlaps
+    def pairs(self, r=0.0, skip=1):
+        '''
+        Parameters:
+
+        > R: the distance between the segments
+        > SKIP: segments this close in the path are not paired. With the default of
+            1, segments are not paired with the ones they share an end with
+
+        Returns:
+
+        > FIRST, SECOND: arrays of the index of the segments of each pair. FIRST is
+            less than SECOND
+        > DIST: array of the distance between the segments of each pair
+        '''
+
+        # two segments within R pass through a cell together when each is grown by
+        # half of R
+        keys, seg = self._entries(self.starts, self.ends, r/2)
+        if len(keys) == 0:
+            return seg, seg, zeros(0) # numpy
+
+        # every pair of segments in the same cell
+        end = flatnonzero(concatenate((keys[1:] != keys[:-1], [True]))) + 1 # numpy
+        ends = repeat(end, end - concatenate(([0], end[:-1]))) # numpy
+        count = ends - arange(len(keys)) - 1 # numpy
+        a = repeat(arange(len(keys)), count) # numpy
+        b = arange(len(a)) - repeat(cumsum(count) - count, count) + a + 1 # numpy
+        first, second = minimum(seg[a], seg[b]), maximum(seg[a], seg[b]) # numpy
+
+        # pairs in more than one cell are only kept once
+        n = len(self.starts)
+        pair = _unique(first*n + second)
+        first, second = pair // n, pair % n
+        keep = second - first > skip
+        first, second = first[keep], second[keep]
+
+        d = _segment_distance(self.starts[first], self.ends[first], self.starts[second], self.ends[second])
+        keep = d <= r
+
+        return first[keep] + self.offset, second[keep] + self.offset, d[keep]
+
+
+    # hidden method that gives the cell of every piece of every segment. Segments are
+    # cut into pieces no longer than a cell so each piece is in at most two cells
+    # along each axis. Each cell of a segment is given once, sorted by cell
+    def _entries(self, starts, ends, pad):
+
+        length = sqrt(((ends - starts)**2).sum(axis=1)) # numpy
+        pieces = maximum(ceil(length/self.cell.min()), 1).astype(int64) # numpy
+        seg = repeat(arange(len(starts)), pieces) # numpy
+        k = arange(len(seg)) - repeat(cumsum(pieces) - pieces, pieces) # numpy
+
+        d = (ends - starts)[seg]/pieces[seg, None]
+        a = starts[seg] + k[:, None]*d
+        b = a + d
+
+        which, keys = self._cells(minimum(a, b) - pad, maximum(a, b) + pad)
+        seg = seg[which]
+
+        # sorting by cell and removing the cells given by more than one piece
+        order = lexsort((seg, keys)) # numpy
+        keys, seg = keys[order], seg[order]
+        new = concatenate(([True], (keys[1:] != keys[:-1]) | (seg[1:] != seg[:-1])))[:len(keys)] # numpy
+
+        return keys[new], seg[new]
+
+
+    # hidden method that gives every cell of the grid inside each box. Gives the
+    # index of the box and the key of each cell
+    def _cells(self, lo, hi):
+
+        a, b, count = self._ranges(lo, hi)
+        which = repeat(arange(len(lo)), count) # numpy
+        k = arange(len(which)) - repeat(cumsum(count) - count, count) # numpy
+
+        # the position of each cell in the range of its box
+        size = (b - a + 1)[which]
+        i = k // (size[:, 1]*size[:, 2])
+        j = k // size[:, 2] % size[:, 1]
+        cell = a[which] + column_stack((i, j, k % size[:, 2])) # numpy
+
+        return which, self._key(cell)
+
+
+    # hidden method that gives the first and last cell of each box along each axis,
+    # limited to the grid, and the number of cells in each box
+    def _ranges(self, lo, hi):
+
+        a = floor((lo - self.lo)/self.cell) # numpy
+        b = floor((hi - self.lo)/self.cell) # numpy
+        empty = ((b < 0) | (a >= self.shape)).any(axis=1)
+        a = clip(a, 0, self.shape - 1).astype(int64) # numpy
+        b = clip(b, 0, self.shape - 1).astype(int64) # numpy
+
+        return a, b, where(empty, 0, prod(b - a + 1, axis=1)) # numpy
+
+
+    # hidden method that gives the key of each cell from its position in the grid
+    def _key(self, cell):
+        return (cell[:, 0]*self.shape[1] + cell[:, 1])*self.shape[2] + cell[:, 2]
+
+
+    # hidden method that gives the pairs of box and segment that share a cell. Each
+    # pair is given once, sorted by box
+    def _candidates(self, lo, hi):
+
+        a, b, count = self._ranges(lo, hi)
+
+        # boxes with fewer cells than the index look up each of their cells
+        small = flatnonzero(count <= len(self.keys)) # numpy
+        which, keys = self._cells(lo[small], hi[small])
+        which = small[which]
+        at = clip(searchsorted(self.keys, keys), 0, max(len(self.keys) - 1, 0)) # numpy
+        found = self.keys[at] == keys if len(self.keys) else keys < 0
+        which, at = [which[found]], [at[found]]
+
+        # larger boxes check every cell of the index instead, a few boxes at a time
+        large = flatnonzero(count > len(self.keys)) # numpy
+        if len(large):
+            cells = column_stack((self.keys // (self.shape[1]*self.shape[2]),
+                                  self.keys // self.shape[2] % self.shape[1], self.keys % self.shape[2])) # numpy
+            size = max(2**22 // len(cells), 1)
+            for i in range(0, len(large), size):
+                box = large[i:i + size]
+                inside = ((cells >= a[box, None]) & (cells <= b[box, None])).all(axis=2)
+                j, k = inside.nonzero()
+                which.append(box[j])
+                at.append(k)
+
+        which, at = concatenate(which), concatenate(at) # numpy
+
+        # every segment of those cells
+        count = self.first[at + 1] - self.first[at]
+        k = arange(count.sum()) - repeat(cumsum(count) - count, count) # numpy
+        which = repeat(which, count) # numpy
+        seg = self.segments[repeat(self.first[at], count) + k]
+
+        # each pair is one number so they are sorted and found once quickly
+        n = max(len(self.starts), 1)
+        pair = _unique(which*n + seg)
+
+        return pair // n, pair % n
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __len__(self):
+        return len(self.starts)
+    def __repr__(self):
+        return 'gindex({} segments, {} cells of size {})'.format(len(self), len(self.keys), self.cell.tolist())
+    def __str__(self):
+        return self.__repr__()
+
+
+# hidden function that gives the default size of the cells from the segments
+def _cell_size(starts, ends):
+
+    step = abs(ends - starts) # numpy
+    length = sqrt((step[:, :2]**2).sum(axis=1)) # numpy
+    length = length[length > 0]
+    dz = step[:, 2][step[:, 2] > 0]
+
+    xy = float(median(length)) if len(length) else 1.0 # numpy
+    z = float(median(dz)) if len(dz) else xy # numpy
+
+    return asarray([xy, xy, z]) # numpy
+
+
+# hidden function that gives the sorted numbers of an array once each. Sorting is
+# much faster than numpy's unique for large arrays of ints
+def _unique(x):
+    x = sort(x) # numpy
+    return x[concatenate(([True], x[1:] != x[:-1]))[:len(x)]] # numpy
+
+
+# hidden function that makes one point into an array of shape (1,3)
+def _points(points):
+    return asarray(points, dtype=float64).reshape(-1, 3) # numpy
+
+
+# hidden function that gives the distance between pairs of segments. Segments of
+# zero length are points
+def _segment_distance(p1, q1, p2, q2):
+
+    d1, d2, r = q1 - p1, q2 - p2, p1 - p2
+    a = (d1*d1).sum(axis=1)
+    e = (d2*d2).sum(axis=1)
+    f = (d2*r).sum(axis=1)
+    c = (d1*r).sum(axis=1)
+    b = (d1*d2).sum(axis=1)
+
+    # the closest point of the first segment to the line of the second one. Parallel
+    # segments use the start of the first one
+    denom = a*e - b*b
+    with errstate(divide='ignore', invalid='ignore'): # numpy
+        s = where(denom > 1e-12*a*e, clip((b*f - c*e)/denom, 0, 1), 0) # numpy
+        s = where(e > 0, s, clip(-c/a, 0, 1)) # numpy
+        s = where(a > 0, s, 0) # numpy
+
+        # the closest point of the second segment to that point. If it is past an
+        # end, the closest point of the first segment to that end is used
+        t = where(e > 0, (b*s + f)/e, 0) # numpy
+        s = where(t < 0, clip(-c/a, 0, 1), where(t > 1, clip((b - c)/a, 0, 1), s)) # numpy
+        s = where(a > 0, s, 0) # numpy
+        t = clip(t, 0, 1) # numpy
+
+    gap = p1 + s[:, None]*d1 - p2 - t[:, None]*d2
+    return sqrt((gap*gap).sum(axis=1)) # numpy
+
+
+# function that makes a spatial index of the motions of a motion history. The
+# segment of each motion goes from the position before it to its position
+def path_index(history, first=0, stop=None, cell=None):
+    '''
+    Parameters:
+
+    > HISTORY: array of shape (n,3) of the motion history
+    > FIRST, STOP: the first motion to index and the motion after the last. The
+        segments are numbered by their motion in HISTORY
+    > CELL: the size of the cells. See gindex
+
+    Returns:
+
+    > INDEX: a gindex object of the segments. The print head starts at the origin
+    '''
+
+    stop = len(history) if stop is None else stop
+    before = history[first - 1:first] if first else zeros((1, 3)) # numpy
+    path = concatenate((before, history[first:stop])) # numpy
+
+    return gindex(path[:-1], path[1:], cell, offset=first)
@@ -0,0 +1,170 @@
+'''
+Module with a class that is a view of a range of layers of a gcode object. The
+lines, motion history, and times of the layers are found from the layer index of
+the gcode object so nothing is searched or copied
+'''
+from .gindex import path_index
+from .visual import plot3
+
+
+# class that gives the lines, motion history, and times of a range of layers of a
+# gcode object. Made by gcode.layer and gcode.layers
+class glayer():
+
+    def __init__(self, code, first, stop):
+        '''
+        Parameters:
+
+        > CODE: the gcode object the layers are from
+        > FIRST: the first layer
+        > STOP: the layer after the last one
+
+        * Notes: the layers are the ones in the program when the view is made. Lines
+            written after that are not part of the last layer of the view
+        '''
+
+        self.code = code
+        self.first = first
+        self.stop = stop
+
+        # the first line and move of the layers and the ones after the last layer
+        starts = code._layers.view()
+        if stop < len(starts):
+            end = int(starts[stop, 0]), int(starts[stop, 1])
+        else:
+            end = code.count, len(code._history)
+
+        self.line_range = int(starts[first, 0]), end[0]
+        self.move_range = int(starts[first, 1]), end[1]
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # generator that gives each line of the layers as text
+    def lines(self, settings=None):
+        '''
+        Parameters:
+
+        > SETTINGS: a gsettings object used to format the numbers in place of
+            the settings of the gcode object
+
+        * Notes: raises a RuntimeError if the lines were written to the sink
+        '''
+
+        if settings is None:
+            settings = self.code.settings
+
+        a, b = self._log_range()
+        return self.code.log.render(settings, a, b, state={})
+
+
+    # copies the layers into a new gcode object
+    def gcode(self):
+        '''
+        Returns:
+
+        > CODE: a gcode object with the lines, motion history, and times of the
+            layers. Times are from the start of the first layer
+
+        * Notes: the whole program must be held in memory
+        '''
+
+        code = self.code
+        code._check_memory()
+
+        a, b = self.line_range
+        fed = code._line_extrusion()[0]
+
+        return code._piece(a, b, *self.move_range, fed, *code._states([a, b]))
+
+
+    # gives a spatial index of the motions of the layers
+    def spatial_index(self, cell=None):
+        '''
+        Parameters:
+
+        > CELL: the size of the cells of the index. See gindex
+
+        Returns:
+
+        > INDEX: a gindex object. The segments are numbered by their motion in the
+            motion history of the whole program
+        '''
+
+        return path_index(self.code.history, *self.move_range, cell)
+
+
+    # plots the motion history of the layers
+    def view(self, *args, fig_title='Layers', **kwargs):
+        '''
+        Parameters:
+
+        > *args,**kwargs : are passed to matplotlib's pyplot.plot function
+
+        > FIG_TITLE: the title given to the figure. Only used is a figure is not given to plot on
+        '''
+
+        return plot3(self.history, *args, title=fig_title,
+                     backend=self.code.settings.graphics, **kwargs)
+
+
+    # the motion history of the layers as an array of shape (n,3). This is a view
+    # of the motion history of the gcode object
+    @property
+    def history(self):
+        return self.code.history[slice(*self.move_range)]
+
+    # the time at each motion of the layers as an array of shape (n,) in minutes
+    # from the start of the program
+    @property
+    def t(self):
+        return self.code.t[slice(*self.move_range)]
+
+    # the filament fed by each motion of the layers as an array of shape (n,)
+    @property
+    def extrusion(self):
+        return self.code.extrusion[slice(*self.move_range)]
+
+    # boolean array of shape (n,) that is true for the motions that extrude
+    @property
+    def extruding(self):
+        return self.code.extruding[slice(*self.move_range)]
+
+    # the times in minutes from the start of the program when the layers start
+    # and end
+    @property
+    def time_range(self):
+
+        t = self.code.t
+        a, b = self.move_range
+        start = t[a - 1] if a else 0
+
+        return float(start), float(t[b - 1]) if b > a else float(start)
+
+
+    # hidden method that gives the range of the lines of the layers in the log
+    def _log_range(self):
+
+        flushed = self.code.count - len(self.code.log)
+        a, b = self.line_range
+        if a < flushed:
+            raise RuntimeError('The lines of these layers have already been written to the sink')
+
+        return a - flushed, b - flushed
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __len__(self):
+        return self.line_range[1] - self.line_range[0]
+    def __iter__(self):
+        return self.lines()
+    def __repr__(self):
+        return 'glayer(layers {} to {}, lines {} to {}, moves {} to {})'.format(
+            self.first, self.stop, *self.line_range, *self.move_range)
+    def __str__(self):
+        return self.__repr__()
@@ -1,6 +1,13 @@
 # Class of a basic line of gcode
+from .gsettings import gsettings
 
 
+# the numerical words of a line in the order they are written.
+# (letter, parameter name, gsettings format)
+words = [('X', 'x', 'pos'), ('Y', 'y', 'pos'), ('Z', 'z', 'pos'),
+         ('I', 'i', 'pos'), ('J', 'j', 'pos'),
+         ('F', 'f', 'speed'), ('E', 'e', 'extrude')]
+
 
 # base class that represents a single line of gcode
 class gline():
@@ -9,11 +16,17 @@ class gline():
 
         # creates the gcode command
         if command:
-            self.line = command
+            self.command = command
         else:
             # if no command is given then an empty line
-            self.line = ''
+            self.command = ''
+
+        # numbers of the line. These are formatted when the line is written
+        # so that the format can be changed after the line is made
+        self.params = {}
 
+        # words that are already text
+        self.words = []
 
         # stores the comment
         self.comment = comment
@@ -30,44 +43,80 @@ class gline():
 
         > TEXT: the text to add to the end of the line.
 
-        * Notes: each command is added with a space if the line is not empty
+        * Notes: each command is added with a space if the line is not empty.
+            Numbers set with set are written before any appended text
         '''
 
-        # checking to see if line is empty before adding space to append
-        if self.line == '':
-            self.line += str(text)
+        self.words.append(str(text))
 
-        # else a space is added to seperate words
-        else:
-            self.line += ' ' + str(text)
-        
+
+    # method to set a number of the line
+    def set(self, name, value):
+        '''
+        Parameters:
+
+        > NAME: one of 'x','y','z','i','j','f','e'. 'f' is the print speed in units
+            per minute. 'i' and 'j' are the center of an arc from the start position
+        > VALUE: the number
+        '''
+
+        self.params[name] = value
+
+
+    # method that gives the text of the line without the comment
+    def text(self, settings=None):
+        '''
+        Parameters:
+
+        > SETTINGS: the gsettings used to format the numbers. Default settings if None
+        '''
+
+        if settings is None:
+            settings = gsettings()
+
+        # the command, the numbers in order, then the other words
+        text = [self.command]
+        for letter, name, lib in words:
+            if name in self.params:
+                text.append(letter + settings.format(lib, self.params[name]))
+        text += [settings.words(i) for i in self.words]
+
+        # each word is seperated by a space
+        return ' '.join([i for i in text if i])
 
 
     # method that adds the comment to the line once all text has been added
-    def done(self):
+    def done(self, settings=None):
+
+        line = self.text(settings)
 
         # adds comment to line
         if self.comment:
             # adds the comment with the gcode comment command
-            if self.line == '':
+            if line == '':
                 # if no command is given, comment format is different
-                self.line += '; ' + self.comment + ' \n'
+                line += '; ' + self.comment + ' \n'
             else:
                 # standard comment added to line of gcode
-                self.line += ' ; ' + self.comment + ' \n'
+                line += ' ; ' + self.comment + ' \n'
         else:
-            if self.line == '':
-                self.line = '\n'
+            if line == '':
+                line = '\n'
             else:
                 # if no comment is given then a new line is created
-                self.line += ' \n'
-        
+                line += ' \n'
+
         # just returns line
-        return self.line   
-        
+        return line
+
+    # the text of the line without the comment
+    @property
+    def line(self):
+        return self.text()
+
     # ---------------------------------------------------------------------------------
     # methods for builtin function access
-    
+
     # creates functions that determing printing behavior
     def __repr__(self):
         return self.line
@@ -0,0 +1,375 @@
+# Class that stores lines of gcode as numbers until they are written as text
+
+from .gbuffer import gbuffer
+from .gline import words
+from numpy import dtype, array, zeros, ones, empty, full, nan, isin, flatnonzero, concatenate, \
+    uint8, uint16, int32, float64, object_
+
+
+# data type of a single record. Numbers that are not in the line are nan and
+# text that is not in the line has an index of -1
+record = dtype([('op', uint16), ('flags', uint8),
+                ('x', float64), ('y', float64), ('z', float64),
+                ('i', float64), ('j', float64),
+                ('f', float64), ('e', float64),
+                ('words', int32), ('com', int32)]) # numpy
+
+# flags of a record
+MOVE = 1 # the line moved the print head and has a row in the motion history
+REL = 2 # the coordinates of the line are relative
+
+
+# class that stores the commands of a gcode object as a table of records
+class glog():
+
+    def __init__(self, capacity=1024):
+        '''
+        Parameters:
+
+        > CAPACITY: the number of records to allocate before the first resize
+        '''
+
+        # memory for all records
+        self.data = gbuffer(dtype=record, capacity=capacity)
+
+        # table of commands. A record stores the index of its command
+        self.ops = ['']
+        self._ops = {'': 0}
+
+        # table of comments and other text. Each string is only stored once
+        self.strings = []
+        self._strings = {}
+
+        # the string table as an object array for rendering. Rebuilt when it grows
+        self._table = array([''], dtype=object_) # numpy
+
+        # the string table with compact numbers
+        self._compact = array([''], dtype=object_) # numpy
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # returns the index of a command, adding it to the table if needed
+    def op(self, command):
+
+        # no command
+        if not command:
+            return 0
+
+        try:
+            return self._ops[command]
+        except KeyError:
+            self._ops[command] = len(self.ops)
+            self.ops.append(command)
+            return self._ops[command]
+
+
+    # returns the index of a string, adding it to the table if needed
+    def intern(self, text):
+
+        # empty strings are not stored
+        if not text:
+            return -1
+
+        try:
+            return self._strings[text]
+        except KeyError:
+            self._strings[text] = len(self.strings)
+            self.strings.append(text)
+            return self._strings[text]
+
+
+    # adds a gline to the end of the log
+    def append(self, line, flags=0):
+        '''
+        Parameters:
+
+        > LINE: a gline object
+        > FLAGS: MOVE and REL flags of the line
+        '''
+
+        p = line.params
+        self.data.append((self.op(line.command), flags,
+                          p.get('x', nan), p.get('y', nan), p.get('z', nan),
+                          p.get('i', nan), p.get('j', nan),
+                          p.get('f', nan), p.get('e', nan),
+                          self.intern(' '.join(line.words)), self.intern(line.comment)))
+        return
+
+
+    # adds an array of records to the end of the log
+    def extend(self, records):
+        self.data.extend(records)
+        return
+
+
+    # returns an empty array of N records to be filled and added with extend
+    def block(self, n, command=None, comment=None, flags=0):
+        '''
+        Parameters:
+
+        > N: the number of records
+        > COMMAND: the command of every record
+        > COMMENT: the comment of every record
+        > FLAGS: the flags of every record
+        '''
+
+        block = zeros(n, dtype=record) # numpy
+        block['op'] = self.op(command)
+        block['flags'] = flags
+        for _, name, _ in words:
+            block[name] = nan
+        block['words'] = -1
+        block['com'] = self.intern(comment)
+
+        return block
+
+
+    # returns the records as an array without copying
+    def view(self):
+        return self.data.view()
+
+
+    # keeps only the records where KEEP is true
+    def select(self, keep):
+        self.data.select(keep)
+        return
+
+
+    # removes all records. The string tables are kept
+    def clear(self):
+        self.data.clear()
+        return
+
+
+    # generator that makes the lines of text of the records from START to STOP
+    def render(self, settings, start=0, stop=None, size=2**16, state=None, empty=False):
+        '''
+        Parameters:
+
+        > SETTINGS: the gsettings object used to format the numbers
+        > START: the first record to render
+        > STOP: the record to stop before. Default to the end of the log
+        > SIZE: the number of records formatted at a time
+        > STATE: a dictionary with the words last written to the printer. It is
+            updated as lines are made so rendering can continue from where the last
+            render stopped. Default to a printer that has not been sent anything
+        > EMPTY: if true, lines that modal GCODE leaves empty are given as empty
+            strings so there is one line for each record
+        '''
+
+        if stop is None:
+            stop = len(self)
+        if state is None:
+            state = {}
+
+        # formatting blocks of records at a time
+        for i in range(start, stop, size):
+            for line in self._render(self.view()[i:min(i + size, stop)], settings, state, empty):
+                yield line
+
+        return
+
+
+    # hidden method that formats an array of records into a list of lines of text.
+    # This matches the format of gline.done
+    def _render(self, rec, settings, state, empty=False):
+
+        # updating the string table if new strings were added
+        if len(self._table) != len(self.strings) + 1:
+            # the extra empty string at the end is the value of index -1
+            self._table = array(self.strings + [''], dtype=object_) # numpy
+
+        # the lines start with their command
+        commands = array(self.ops, dtype=object_)[rec['op']] # numpy
+        lines = commands.copy()
+
+        # modal GCODE omits every word that is the same as the printer already has
+        modal = settings.modal
+        omit_axes = settings.omit_axes or modal
+
+        # absolute moves and the lines after which the position of the printer is
+        # not known from the last written words. Only needed to omit words
+        if omit_axes:
+            absolute, reset, relative = self._modal_groups(rec)
+
+        # removing G0 and G1 commands that repeat the last command
+        if modal:
+            omitted = ~self._changed_command(rec, state)
+            lines[omitted] = ''
+
+        # whether a line has any text yet. Used to decide when to add a space
+        started = lines != ''
+
+        # adding the numbers column by column
+        for letter, name, lib in words:
+
+            col = rec[name]
+            given = flatnonzero(col == col) # nan is not equal to itself
+            if len(given) == 0:
+                continue
+
+            # formatting all numbers in the column at once
+            text = array(settings.format_array(lib, col[given]), dtype=object_) # numpy
+
+            # removing axes that do not change the position
+            if omit_axes and name in 'xyz':
+                keep = self._changed(letter, given, text, absolute, reset, state)
+
+                # relative moves of zero
+                keep &= ~(relative[given] & (text.astype(float64) == 0))
+
+                given = given[keep]
+                text = text[keep]
+
+            # removing speeds that are the same as the last speed. Changing units
+            # changes the meaning of the speed
+            elif modal and name == 'f':
+                units = isin(rec['op'], [self._ops.get(i, -1) for i in ['G20', 'G21']]) # numpy
+                keep = self._changed(letter, given, text, ones(len(rec), dtype=bool), units, state)
+                given = given[keep]
+                text = text[keep]
+
+            sep = array([letter, ' ' + letter], dtype=object_)[started[given].astype(uint8)] # numpy
+
+            lines[given] = lines[given] + sep + text
+            started[given] = True
+
+        # adding the other words
+        given = rec['words'] >= 0
+        if given.any():
+            sep = array(['', ' '], dtype=object_)[started[given].astype(uint8)] # numpy
+            lines[given] = lines[given] + sep + self._words(settings)[rec['words'][given]]
+            started |= given
+
+        # adding the comments and the end of the line
+        has_com = rec['com'] >= 0
+
+        # a move left with only a comment keeps its command. Otherwise it is read
+        # back as a comment and the move is lost
+        if modal:
+            bare = omitted & ~started & has_com
+            lines[bare] = commands[bare]
+            started |= bare
+
+        prefix = array(['', '', ' ; ', '; '], dtype=object_)[2*has_com + ~started] # numpy
+        suffix = array(['\n', ' \n'], dtype=object_)[(has_com | started).astype(uint8)] # numpy
+
+        lines = lines + prefix + self._table[rec['com']] + suffix
+
+        # lines that had all of their words removed are not written
+        if modal:
+            removed = omitted & ~started & ~has_com
+            if empty:
+                lines[removed] = ''
+                return lines.tolist()
+            return lines[~removed].tolist()
+
+        return lines.tolist()
+
+
+    # hidden method that gives the table of strings of other words written with the
+    # settings. Compact words are only made once for each string
+    def _words(self, settings):
+
+        if not settings.compact:
+            return self._table
+
+        # compacting the strings added since the last time
+        if len(self._compact) != len(self._table):
+            new = [settings.words(i) for i in self.strings[len(self._compact) - 1:]]
+            self._compact = array(self._compact.tolist()[:-1] + new + [''], dtype=object_) # numpy
+
+        return self._compact
+
+
+    # hidden method that finds the absolute moves of the records and the records
+    # that change the position of the printer in other ways
+    def _modal_groups(self, rec):
+
+        # commands of moves that can be written without repeating axes
+        moves = isin(rec['op'], [self._ops.get(i, -1) for i in ['', 'G0', 'G1']]) # numpy
+
+        # commands that change position, units, or coordinates
+        changes = isin(rec['op'], [self._ops.get(i, -1) for i in
+                                   ['G20', 'G21', 'G28', 'G90', 'G91', 'G92']]) # numpy
+
+        moved = (rec['flags'] & MOVE) > 0
+        absolute = moves & moved & ((rec['flags'] & REL) == 0)
+        relative = moves & moved & ((rec['flags'] & REL) > 0)
+
+        return absolute, changes | (moved & ~absolute), relative
+
+
+    # hidden method that decides which G0 and G1 commands are different from the
+    # last command. Gives a boolean array of the commands to keep
+    def _changed_command(self, rec, state):
+
+        # the records with a command
+        events = flatnonzero(rec['op'] != 0) # numpy
+        keep = ones(len(rec), dtype=bool) # numpy
+        if len(events) == 0:
+            return keep
+
+        # the command before each command. The first is from the previous render
+        op = rec['op'][events]
+        before = concatenate(([state.get('G', -1)], op[:-1])) # numpy
+        state['G'] = op[-1]
+
+        # only motion commands stay active for the following lines
+        motion = isin(op, [self._ops.get(i, -1) for i in ['G0', 'G1']]) # numpy
+        keep[events[motion & (op == before)]] = False
+
+        return keep
+
+
+    # hidden method that decides which words of an axis or speed change the state of
+    # the printer. Gives a boolean array of the words to keep
+    def _changed(self, letter, given, text, absolute, reset, state):
+        '''
+        Parameters:
+
+        > LETTER: the letter of the word
+        > GIVEN: indices of the records with this word
+        > TEXT: the formatted words of the records in GIVEN
+        > ABSOLUTE: records where the word sets the state of the printer
+        > RESET: records after which the state of the printer is not known
+        > STATE: the last word written for each letter. None if it is not known
+        '''
+
+        # the records that write this axis or that make its position unknown. Only
+        # absolute moves leave the position known
+        has = zeros(len(absolute), dtype=bool) # numpy
+        has[given] = True
+        value = full(len(absolute), None, dtype=object_) # numpy
+        value[given] = text
+        value[~absolute] = None
+        events = flatnonzero(has | reset) # numpy
+        value = value[events]
+
+        # the value before each event. The first is from the previous render
+        before = empty(len(events), dtype=object_) # numpy
+        before[0] = state.get(letter)
+        before[1:] = value[:-1]
+
+        # absolute moves to the same position are not written
+        same = (value == before).astype(bool) & absolute[events] & (value != None)
+        state[letter] = value[-1]
+
+        # mapping the events back to the given words
+        keep = ones(len(absolute), dtype=bool) # numpy
+        keep[events[same]] = False
+
+        return keep[given]
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __len__(self):
+        return len(self.data)
+    def __getitem__(self, index):
+        return self.view()[index]
@@ -0,0 +1,48 @@
+# Class that describes the motion limits of a printer used to plan print times
+from numpy import asarray, float64
+
+
+# class that stores the acceleration and speed limits of a printer
+class gmachine():
+
+    # init method contains the default limits. These are the defaults of Marlin
+    def __init__(self, accel=3000, junction_deviation=0.013, max_feed=(300, 300, 5)):
+        '''
+        Parameters:
+
+        > ACCEL: the largest acceleration of the print head in units per second
+            squared. Either a number or a list of the x,y,z acceleration of each axis
+        > JUNCTION_DEVIATION: the distance in units the print head may cut a corner
+            by. The print head slows down at corners so that it would stay within this
+            distance of the corner at the largest acceleration
+        > MAX_FEED: the largest speed of each axis in units per second. Either a
+            number or a list of the x,y,z speed of each axis
+
+        * Notes: the units are the same as the units of the gcode object
+        '''
+
+        self.accel = accel
+        self.junction_deviation = junction_deviation
+        self.max_feed = max_feed
+
+        # end of init
+        return
+
+    # the acceleration of each axis as an array of shape (3,)
+    def accel_axes(self):
+        return asarray(self.accel, dtype=float64) * asarray([1.0, 1.0, 1.0]) # numpy
+
+    # the largest speed of each axis as an array of shape (3,)
+    def feed_axes(self):
+        return asarray(self.max_feed, dtype=float64) * asarray([1.0, 1.0, 1.0]) # numpy
+
+    # a tuple of all limits. Planned times are reused while this does not change
+    def key(self):
+        return tuple(self.accel_axes().tolist()), float(self.junction_deviation), tuple(self.feed_axes().tolist())
+
+    # methods to use builtin functions ----------------------------------------------
+    def __repr__(self):
+        return 'gmachine(accel={}, junction_deviation={}, max_feed={})'.format(
+            self.accel, self.junction_deviation, self.max_feed)
+    def __str__(self):
+        return self.__repr__()
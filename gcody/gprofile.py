@@ -0,0 +1,254 @@
+'''
+Module with a class that records the calls made to a gcode object while a program
+is generated: how many times each command and each internal stage is called, the
+time spent in it, and the bytes of GCODE made by each command
+'''
+from functools import wraps
+from time import perf_counter
+from json import dumps
+from numpy import searchsorted, bincount, arange
+
+
+# the internal stages of writing a line that are timed along with the commands
+STAGES = ['_move_format', '_move_array', '_pos_update', '_time', 'write', 'flush']
+
+
+# class that times the methods of a gcode object. Made by gcode.profile. The
+# methods are only replaced while profiling so there is no cost when it is off
+class gprofile():
+
+    def __init__(self, code):
+        '''
+        Parameters:
+
+        > CODE: the gcode object that is profiled
+        '''
+
+        self.code = code
+
+        # the number of calls, the total time, and the time not spent in other timed
+        # methods of each method, in seconds
+        self.calls = {}
+        self.time = {}
+        self.own_time = {}
+
+        # the bytes of GCODE made by each command. The lines of commands called by
+        # other commands are counted under the outermost one. Lines written outside
+        # of any timed command are counted under 'other'
+        self.bytes = {}
+
+        # the time spent in the timed methods called by each method that is running
+        self._stack = []
+
+        # the outermost command that is running, and the first line and command of
+        # each run of lines that are not counted yet. Lines are numbered from the
+        # first line of the program
+        self._command = None
+        self._runs = []
+        self._tagged = code.count
+
+        # the lines before this one are counted, and the words last written by them
+        self.counted = code.count
+        self._state = {}
+
+        # the start of profiling, to give the lines and moves made per second
+        self.start = perf_counter()
+        self.start_lines = code.count
+        self.start_moves = len(code._history)
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # gives a method that records its calls and then calls METHOD
+    def wrap(self, name, method):
+        '''
+        Parameters:
+
+        > NAME: the name the calls are recorded under
+        > METHOD: the bound method to time
+
+        Returns:
+
+        > TIMED: the method that records its calls
+        '''
+
+        calls, time, own_time, stack = self.calls, self.time, self.own_time, self._stack
+        command = name not in STAGES
+
+        @wraps(method)
+        def timed(*args, **kwargs):
+
+            # the lines written by the outermost command are tagged with its name
+            # once it returns. Only the line numbers are kept so this costs nothing
+            # per line
+            outer = command and self._command is None
+            if outer:
+                self._tag('other')
+                self._command = name
+
+            stack.append(0.0)
+            start = perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                total = perf_counter() - start
+                inner = stack.pop()
+
+                calls[name] = calls.get(name, 0) + 1
+                time[name] = time.get(name, 0.0) + total
+                own_time[name] = own_time.get(name, 0.0) + total - inner
+
+                # the time is not counted again as the own time of the caller
+                if stack:
+                    stack[-1] += total
+
+                if outer:
+                    self._tag(name)
+                    self._command = None
+
+        return timed
+
+
+    # counts the bytes of the lines held in memory that are not counted yet. Called
+    # by report, so it is only needed to count lines at other times
+    def count(self):
+
+        code = self.code
+        if code.debug:
+            return
+
+        self._tag(self._command or 'other')
+
+        flushed = code.count - len(code.log)
+        first = max(self.counted, flushed)
+        lines = code.log.render(code.settings, first - flushed, len(code.log), state=self._state, empty=True)
+        self._add(first, list(lines))
+
+        return
+
+
+    # counts the bytes of lines written to the sink. Called by gcode.flush before
+    # the lines leave memory
+    def emitted(self, first, lines):
+        '''
+        Parameters:
+
+        > FIRST: the number of the first line of LINES in the program
+        > LINES: the lines of text written to the sink, one for each record. See
+            glog.render
+        '''
+
+        self._tag(self._command or 'other')
+
+        # lines counted by an earlier report are not counted again
+        skip = max(self.counted - first, 0)
+        self._add(first + skip, lines[skip:])
+
+        # the next lines continue from the words written to the sink
+        self._state = dict(self.code._sink_state)
+
+        return
+
+
+    # gives all that was recorded as a dictionary
+    def report(self):
+        '''
+        Returns:
+
+        > REPORT: a dictionary with the ELAPSED time in seconds, the LINES and MOVES
+            made, the LINES_PER_SEC and MOVES_PER_SEC, the CALLS, TIME, and OWN_TIME
+            of each of the COMMANDS and STAGES, and the BYTES of GCODE made by
+            each command, whether or not the lines were saved yet
+
+        * Notes: TIME includes the time of the timed methods that are called inside
+            a method. OWN_TIME does not
+        '''
+
+        self.count()
+
+        elapsed = perf_counter() - self.start
+        lines = self.code.count - self.start_lines
+        moves = len(self.code._history) - self.start_moves
+
+        def table(names):
+            return {i: {'calls': self.calls[i], 'time': self.time[i], 'own_time': self.own_time[i]}
+                    for i in sorted(names, key=lambda i: -self.time[i])}
+
+        return {'elapsed': elapsed, 'lines': lines, 'moves': moves,
+                'lines_per_sec': lines/elapsed if elapsed > 0 else 0.0,
+                'moves_per_sec': moves/elapsed if elapsed > 0 else 0.0,
+                'commands': table([i for i in self.calls if i not in STAGES]),
+                'stages': table([i for i in self.calls if i in STAGES]),
+                'bytes': dict(self.bytes)}
+
+
+    # gives the report as JSON text and writes it to a file if one is given
+    def to_json(self, file=None):
+        '''
+        Parameters:
+
+        > FILE: the file name to write to
+
+        Returns:
+
+        > TEXT: the report as JSON text
+        '''
+
+        text = dumps(self.report(), indent=2)
+
+        if file is not None:
+            with open(file, 'w') as f:
+                f.write(text)
+
+        return text
+
+
+    # hidden method that gives the lines written since the last time to NAME
+    def _tag(self, name):
+
+        n = self.code.count
+
+        # lines removed from the program, by simplify for example, are forgotten
+        if n < self._tagged:
+            self._runs = [i for i in self._runs if i[0] < n]
+            self.counted = min(self.counted, n)
+        # lines of the same command as the run before them continue that run
+        elif n > self._tagged and not (self._runs and self._runs[-1][1] == name):
+            self._runs.append((self._tagged, name))
+
+        self._tagged = n
+        return
+
+
+    # hidden method that adds the bytes of LINES, which start at line FIRST of the
+    # program, to the commands that made them. All the lines up to the last line
+    # tagged must be given
+    def _add(self, first, lines):
+
+        if len(lines):
+            starts = [i for i, name in self._runs]
+            run = searchsorted(starts, arange(first, first + len(lines)), 'right') - 1 # numpy
+            size = bincount(run, weights=[len(i) for i in lines], minlength=len(starts)) # numpy
+
+            for (line, name), b in zip(self._runs, size.tolist()):
+                if b:
+                    self.bytes[name] = self.bytes.get(name, 0) + int(b)
+
+        self._runs = []
+        self.counted = first + len(lines)
+
+        return
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __repr__(self):
+        report = self.report()
+        return 'gprofile({} lines, {:.0f} lines/sec, {:.0f} moves/sec)'.format(
+            report['lines'], report['lines_per_sec'], report['moves_per_sec'])
+    def __str__(self):
+        return self.__repr__()
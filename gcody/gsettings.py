@@ -1,28 +1,85 @@
 # Class that controls the formatting of the number when gcode is written
+from .gformat import gformat, compact_words
 
 # class that stores settings for the gcode class
 class gsettings():
 
     # init method contains all the default options
     def __init__(self, pos_str='{:0.4f}',speed_str='{:0.0f}',
-                 extrude_str='{:0.4f}', graphics='matplotlib'):
+                 extrude_str='{:0.4f}', graphics='matplotlib', compact=False,
+                 omit_axes=False, modal=False):
+        '''
+        Parameters:
+
+        > POS_STR, SPEED_STR, EXTRUDE_STR: the str.format strings for positions,
+            speeds, and extrusion
+        > GRAPHICS: the graphics backend, 'matplotlib' or 'mayavi'
+        > COMPACT: if true, numbers are written with as few characters as possible.
+            Trailing zeros, trailing decimal points and leading zeros are removed
+            so 10.5000 is written as 10.5 and 0.5000 as .5
+        > OMIT_AXES: if true, X, Y, and Z words of absolute moves that are the same
+            as the position the printer is already at are not written, nor are
+            relative moves of zero
+        > MODAL: if true, the GCODE is written in modal form. This omits axes like
+            OMIT_AXES, G0 and G1 commands that repeat the last command, and F words
+            that repeat the last speed. Lines left empty are not written. Passing
+            these settings to gcode.save writes an existing program in modal form
+
+        * Notes: not all printers support modal GCODE
+        '''
 
         # assigning values to memory
         # these are the string formatters when writing numbers to gcode
         self.lib = {'pos':pos_str, 'extrude':extrude_str, 'speed':speed_str}
 
+        # the formatters compiled from the strings in lib
+        self._formatters = {}
+
         # this is the graphics backend choice to avoid specifying
         # it everytime for different types of figures
         self.graphics = graphics
 
+        # options that make the GCODE smaller
+        self.compact = compact
+        self.omit_axes = omit_axes
+        self.modal = modal
+
         # end of init
         return
 
     # method to format a string that provides checks on input arguments
     def format(self, lib_arg, x):
-        return self.lib[lib_arg].format(x)
+        return self.formatter(lib_arg).format(x)
+
+    # method to format an array of numbers into a list of strings
+    def format_array(self, lib_arg, x):
+        '''
+        Parameters:
+
+        > LIB_ARG: the name of the number format, 'pos', 'speed' or 'extrude'
+        > X: an array of numbers
+        '''
+        return self.formatter(lib_arg).format_array(x)
+
+    # method that gives the compiled formatter of a number format. The formatter
+    # is compiled again if the string in lib was changed
+    def formatter(self, lib_arg):
+
+        f = self._formatters.get(lib_arg)
+        if f is None or f.spec != self.lib[lib_arg] or f.compact != self.compact:
+            f = gformat(self.lib[lib_arg], self.compact)
+            self._formatters[lib_arg] = f
+
+        return f
 
     # methods to use builtin functions ----------------------------------------------
+    # method that writes words of gcode that are already text, like 'S255 P1', with
+    # the settings. Only compact changes these words
+    def words(self, text):
+        if self.compact:
+            return compact_words(text)
+        return text
+
     def __repr__(self):
         return str(self.lib)
     def __str__(self):
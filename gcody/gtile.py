@@ -0,0 +1,253 @@
+'''
+Module with a class that is a program of copies of a gcode object placed across
+the bed. Only the program and the offsets of the copies are kept. The lines of
+each copy are made from the program when they are written
+'''
+from .glog import MOVE
+from .textio import open_text
+from numpy import zeros, eye, concatenate, flatnonzero, searchsorted, asarray, float64, inf
+
+
+# class that gives the lines of copies of a gcode object, each moved by its offset.
+# Made by gcode.tile
+class gtile():
+
+    def __init__(self, code, offsets, order='sequential', clearance=1.0):
+        '''
+        Parameters:
+
+        > CODE: the gcode object that is copied. The whole program must be held in
+            memory
+        > OFFSETS: array of shape (k,3) of the distance each copy is moved
+        > ORDER: 'sequential' prints each copy whole before the next one. 'layers'
+            prints a layer of every copy before the next layer
+        > CLEARANCE: with the sequential order, the height above everything printed
+            so far that the print head travels to the next copy at
+
+        * Notes: CODE is kept, not copied. Lines written to CODE after the tiling is
+            made are not copied, and lines of CODE that are changed change the copies
+        '''
+
+        if order not in ('sequential', 'layers'):
+            raise ValueError('Unknown order {}. Options are sequential and layers'.format(order))
+
+        code._check_memory()
+
+        self.code = code
+        self.offsets = asarray(offsets, dtype=float64) # numpy
+        self.order = order
+        self.clearance = clearance
+
+        # the lines before the first move that extrudes and after the last one start
+        # and end the print. They are written once. A program that does not extrude
+        # is copied whole
+        rec = code.log.view()
+        self._fed = code._line_extrusion()[0]
+        printed = flatnonzero(((rec['flags'] & MOVE) > 0) & (self._fed > 0)) # numpy
+        if len(printed):
+            head, tail = printed[0], printed[-1] + 1
+        else:
+            head, tail = 0, len(rec)
+
+        # the pieces of the program that are printed together
+        inner = zeros(0, dtype=int) # numpy
+        if order == 'layers':
+            starts = code.layer_starts()[:, 0]
+            inner = starts[(starts > head) & (starts < tail)]
+        self._bounds = concatenate(([0, head], inner, [tail, len(rec)])).astype(int) # numpy
+
+        # found once for every piece
+        self._states = code._states(self._bounds)
+        moves = flatnonzero(rec['flags'] & MOVE) # numpy
+        self._counts = searchsorted(moves, self._bounds) # numpy
+        self._anchored = code._anchored()
+
+        # end of init
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # generator that gives each line of the copies as text. Only the lines of one
+    # piece are held in memory at a time
+    def lines(self, settings=None):
+        '''
+        Parameters:
+
+        > SETTINGS: a gsettings object used to format the numbers in place of
+            the settings of the gcode object
+        '''
+
+        from .gcode import gcode
+
+        if settings is None:
+            settings = self.code.settings
+
+        last = None
+        top = -inf
+
+        for n, (p, k) in enumerate(self._pairs()):
+
+            # each piece continues from the state the last one ended in
+            piece = gcode(settings=self.code.settings, machine=self.code.machine)
+            if last is not None:
+                _carry(last, piece)
+
+            top = self._add(piece, n, p, k, top)
+            for line in piece.lines(settings):
+                yield line
+
+            last = piece
+
+        return
+
+
+    # writes the lines of the copies to a file one piece at a time
+    def save(self, file, settings=None, threaded=False):
+        '''
+        Parameters:
+
+        > FILE: the file name to save to or a writable text stream. If the name
+            has no extension, then a .gcode file is written to
+        > SETTINGS: a gsettings object used to format the numbers in place of
+            the settings of the gcode object
+        > THREADED: if true, the lines are compressed and written in a background
+            thread while the next lines are formatted
+
+        * Notes: files ending in .gz, .bz2, or .xz are compressed as they are written
+        '''
+
+        from .gcode import _file_name
+
+        if not isinstance(file, str):
+            file.writelines(self.lines(settings))
+            return
+
+        with open_text(_file_name(file), 'w', threaded) as f:
+            f.writelines(self.lines(settings))
+
+        return
+
+
+    # makes the copies into a new gcode object
+    def gcode(self, sink=None):
+        '''
+        Parameters:
+
+        > SINK: a file name or writable text stream the lines are written to as they
+            are made. See gcode
+
+        Returns:
+
+        > CODE: a gcode object with the lines, motion history, times, and filament
+            of every copy
+
+        * Notes: CODE is as large as the program times the number of copies. With
+            a SINK, only the lines of about one piece are held but the motion
+            history, times, and filament of every copy are kept
+        '''
+
+        from .gcode import gcode
+
+        code = gcode(settings=self.code.settings, sink=sink, machine=self.code.machine)
+
+        top = -inf
+        for n, (p, k) in enumerate(self._pairs()):
+            top = self._add(code, n, p, k, top)
+
+        return code
+
+
+    # hidden method that gives the pieces in the order they are printed as pairs of
+    # the piece and the copy. The lines that start and end the print have no copy
+    def _pairs(self):
+
+        head, tail = 0, len(self._bounds) - 2
+        pieces = range(head + 1, tail)
+        copies = range(len(self.offsets))
+        if self.order == 'sequential':
+            pairs = [(p, k) for k in copies for p in pieces]
+        else:
+            pairs = [(p, k) for p in pieces for k in copies]
+
+        # the lines that start and end the print are written once
+        if self._bounds[head] < self._bounds[head + 1]:
+            pairs = [(head, None)] + pairs
+        if self._bounds[tail] < self._bounds[tail + 1]:
+            pairs = pairs + [(tail, None)]
+
+        return pairs
+
+
+    # hidden method that adds piece P of copy K to CODE. TOP is the highest point
+    # printed so far. Gives the new highest point
+    def _add(self, code, n, p, k, top):
+
+        base = self.code
+        a, b = self._counts[p], self._counts[p + 1]
+        piece = base._piece(self._bounds[p], self._bounds[p + 1], a, b, self._fed,
+                            self._states[p], self._states[p + 1])
+
+        # a piece that starts after an absolute move starts from its moved
+        # position. Otherwise it starts where the print head is
+        offset = zeros(3) if k is None else self.offsets[k] # numpy
+        start = dict(self._states[p])
+        if a and self._anchored[a - 1]:
+            start['pos'] = start['pos'] + offset
+        else:
+            start['pos'] = None
+
+        if k is not None:
+            m = eye(4) # numpy
+            m[:3, 3] = offset
+            piece._transform(piece.log.view(), piece._history.view(), m, self._anchored[a:b],
+                             zeros(3) if start['pos'] is None else start['pos']) # numpy
+
+        # going to the piece over what is printed. Moves before the first absolute
+        # move of a piece are made from wherever the print head is
+        first = flatnonzero(self._anchored[a:b]) # numpy
+        if start['pos'] is not None:
+            target = start['pos']
+        elif len(first):
+            target = piece.history[first[0]]
+        else:
+            target = None
+
+        if n and target is not None and (code.current_pos != target).any():
+            height = max(code.current_pos[2], target[2])
+            if self.order == 'sequential':
+                height = max(height, top) + self.clearance
+            code._travel(target, height)
+
+        # only the copies are printed. The lines that start and end the print do not
+        # raise what the print head travels over
+        before = len(code._history)
+        code.extend(piece, start)
+        if k is not None and len(code._history) > before:
+            top = max(top, float(code._history[before:, 2].max()))
+
+        return top
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __iter__(self):
+        return self.lines()
+    def __repr__(self):
+        return 'gtile({} copies, {} order, {} pieces of {} lines)'.format(
+            len(self.offsets), self.order, len(self._bounds) - 3, len(self.code.log))
+    def __str__(self):
+        return self.__repr__()
+
+
+# hidden function that gives gcode object NEW the state of the printer that gcode
+# object OLD ends in, so the lines of NEW continue from those of OLD
+def _carry(old, new):
+
+    for i in ['coords', 'unit_sys', 'extrude_mode', 'extrude_pos', 'print_time', 'print_speed']:
+        setattr(new, i, getattr(old, i))
+    new.current_pos = old.current_pos.copy()
+    new.previous_pos = old.previous_pos.copy()
+
+    return
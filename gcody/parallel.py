@@ -0,0 +1,70 @@
+'''
+Module with a function to make the parts of a program in several processes and
+join them in order. The parts are sent back as arrays, not lines of text
+'''
+from .gcode import gcode
+from .binary import to_blocks, from_blocks
+from concurrent.futures import ProcessPoolExecutor
+from numpy import array, float64
+
+
+# function that makes the parts of a program in a pool of processes and joins them
+def generate(parts, starts=None, processes=None, settings=None, machine=None):
+    '''
+    Parameters:
+
+    > PARTS: a list of functions that each take a gcode object and write one part of
+        the program to it, like one layer. The functions are sent to other processes
+        so they must be defined at the top of a module or be a functools.partial
+        of such a function
+    > STARTS: a list of dictionaries of the state each part starts from, with the
+        keys given in gcode.extend. None is the state of a new gcode object
+    > PROCESSES: the number of processes. Default to the number of cpus. If 1, the
+        parts are made in this process
+    > SETTINGS: the gsettings object of the gcode object made
+    > MACHINE: the gmachine object of the gcode object made
+
+    Returns:
+
+    > CODE: a gcode object with the parts joined in order. Lines are added between
+        parts to go to the state each part starts from, see gcode.extend
+    '''
+
+    if starts is None:
+        starts = [None] * len(parts)
+    elif len(starts) != len(parts):
+        raise ValueError('There must be a start for every part, {} != {}'.format(len(starts), len(parts)))
+
+    code = gcode(settings=settings, machine=machine)
+
+    # the parts are joined in order while the later ones are still being made
+    if processes == 1:
+        for part, start in zip(parts, starts):
+            code.extend(from_blocks(*_make(part, start)), start)
+    else:
+        with ProcessPoolExecutor(processes) as pool:
+            for blocks, start in zip(pool.map(_make, parts, starts), starts):
+                code.extend(from_blocks(*blocks), start)
+
+    return code
+
+
+# hidden function run by each process. Makes one part from its start state and
+# gives it back as arrays
+def _make(part, start):
+
+    code = gcode()
+
+    if start:
+        if start.get('pos') is not None:
+            code.current_pos = array(start['pos'], dtype=float64) # numpy
+            code.previous_pos = code.current_pos.copy()
+        code.coords = start.get('coords', 'abs')
+        code.unit_sys = start.get('unit_sys', 'mm')
+        code.extrude_mode = start.get('extrude_mode', 'abs')
+        code.extrude_pos = start.get('extrude_pos', 0)
+        code.print_speed = start.get('speed', 0)
+
+    part(code)
+
+    return to_blocks(code)
@@ -0,0 +1,107 @@
+'''
+Module with functions to plan the speed of the print head along a path so the
+time to print accounts for acceleration and for slowing down at corners
+'''
+from numpy import asarray, zeros, concatenate, flatnonzero, sqrt, abs, where, minimum, maximum, \
+    cumsum, inf, float64
+
+
+# function that gives the time of each move when the print head speeds up and slows
+# down with a trapezoidal speed profile. The largest speed at every corner is found
+# with a backward and then a forward pass over the whole path at once
+def plan_path(path, distance, speed, stop, machine):
+    '''
+    Parameters:
+
+    > PATH: array of shape (n+1,3) of the position before the first move and after
+        every move
+    > DISTANCE: array of shape (n,) of the length of each move along its path
+    > SPEED: array of shape (n,) of the speed of each move in units per minute.
+        Moves with a speed of zero take no time
+    > STOP: boolean array of shape (n,) of the moves before and after which the
+        print head stops, like dwells
+    > MACHINE: the gmachine with the limits of the printer
+
+    Returns:
+
+    > DT: array of shape (n,) of the time of each move in minutes
+
+    * Notes: the print head starts and ends at rest. Arcs are planned as if they
+        were straight from their start to their end
+    '''
+
+    path = asarray(path, dtype=float64) # numpy
+    distance = asarray(distance, dtype=float64) # numpy
+    n = len(distance)
+    dt = zeros(n) # numpy
+
+    # direction of each move
+    chord = path[1:] - path[:-1]
+    size = sqrt((chord**2).sum(axis=1)) # numpy
+    u = abs(chord / where(size > 0, size, 1)[:, None]) # numpy
+
+    # the speed and acceleration of each move are limited by every axis that moves
+    v = minimum(asarray(speed, dtype=float64)/60, _axis_limit(u, machine.feed_axes())) # numpy
+    a = _axis_limit(u, machine.accel_axes())
+
+    # moves that take time
+    moving = flatnonzero((distance > 0) & (v > 0)) # numpy
+    k = len(moving)
+    if k == 0:
+        return dt
+
+    length, v, a = distance[moving], v[moving], a[moving]
+    d = chord[moving] / where(size[moving] > 0, size[moving], 1)[:, None] # numpy
+
+    # largest squared speed at each corner from the junction deviation. The corner
+    # before the first move and after the last one are at rest
+    corner = zeros(k + 1) # numpy
+    cos = -(d[1:]*d[:-1]).sum(axis=1)
+    sin_half = sqrt(maximum((1 - cos)/2, 0)) # numpy
+    accel = minimum(a[1:], a[:-1]) # numpy
+    straight = sin_half >= 1 - 1e-9
+    corner[1:-1] = where(straight, inf, accel*machine.junction_deviation*sin_half /
+                         where(straight, 1, 1 - sin_half)) # numpy
+    corner[1:-1] = minimum(corner[1:-1], minimum(v[1:], v[:-1])**2) # numpy
+
+    # the print head also stops at moves like dwells between two moves
+    stops = concatenate(([0], cumsum(asarray(stop, dtype=int)))) # numpy
+    corner[1:-1][stops[moving[1:] + 1] - stops[moving[:-1]] > 0] = 0
+
+    # squared speed gained over each move at full acceleration
+    gain = 2*a*length
+    total = concatenate(([0], cumsum(gain))) # numpy
+
+    # backward pass. The speed at a corner is low enough to slow down for every corner
+    # after it: w[i] = min(corner[i], w[i+1] + gain[i])
+    w = minimum.accumulate((corner + total)[::-1])[::-1] - total # numpy
+
+    # forward pass. The speed at a corner is reachable from every corner before it:
+    # s[i+1] = min(w[i+1], s[i] + gain[i])
+    s = maximum(minimum.accumulate(w - total) + total, 0) # numpy
+    s[0] = 0
+
+    # time of the trapezoid of each move. Moves too short to reach their speed
+    # only speed up to the peak where they must start slowing down
+    v0, v1 = sqrt(s[:-1]), sqrt(s[1:]) # numpy
+    speed_up = (v*v - s[:-1])/(2*a)
+    slow_down = (v*v - s[1:])/(2*a)
+    cruise = length - speed_up - slow_down
+
+    peak = sqrt(maximum(a*length + (s[:-1] + s[1:])/2, 0)) # numpy
+    peak = where(cruise >= 0, v, minimum(peak, v)) # numpy
+    t = (peak - v0)/a + (peak - v1)/a + maximum(cruise, 0)/v # numpy
+
+    dt[moving] = t/60
+    return dt
+
+
+# hidden function that gives the largest value along each direction when each axis
+# has its own limit. Directions are the absolute value of unit vectors. Moves that
+# do not change position, like full circles, have the smallest x,y limit
+def _axis_limit(u, limit):
+
+    out = where(u > 0, limit[None, :] / where(u > 0, u, 1), inf).min(axis=1) # numpy
+    out[out == inf] = limit[:2].min()
+
+    return out
@@ -5,23 +5,44 @@ code does!
 Written by Ryan Zambrotta
 '''
 from .gcode import gcode
+from .textio import open_text
+from .binary import save_binary, readbin, binary_header
+from hashlib import blake2b
+from os import path, replace, remove, makedirs, stat
 
 
 # Contains a function to read GCODE from a file and create a gcode object that contains
 # the same information
-def read(file=None, **kwargs):
+def read(file=None, cache=None, **kwargs):
     '''
     Parameters:
 
     > FILE: if a file is given, then it is read from or a list
-        where each element is each line of GCODE
+        where each element is each line of GCODE. Files ending in .gz, .bz2,
+        or .xz are decompressed as they are read
+    > CACHE: if true, the program is saved next to FILE as a binary file with
+        the extension .gcb added. The next time the same file is read, it is
+        loaded from the cache without parsing. A directory can be given to keep
+        the cache files there instead. See binary.py
     > KWARGS: these are passed to an empty gcode object when it is constructed
+
+    * Notes: the cache is used while the size and time modified of FILE are the
+        same as when it was made. If only the time changed, the contents of FILE
+        are hashed and compared instead. Otherwise the cache is made again.
+        Loading the cache skips parsing but the lines are still copied into memory.
+        Lines of only coordinates, speed, and extrusion, as in modal GCODE, repeat
+        the last G0 or G1 command
     '''
 
+    # loading the program from the cache. Lines written to a sink are not kept so
+    # they can not be cached
+    if cache and isinstance(file, str) and kwargs.get('sink') is None:
+        return _cached(file, cache, kwargs)
+
 
-    # open give file as read only
+    # open give file as read only. Compressed files are streamed a block at a time
     if isinstance(file, str):
-        f = open(file, 'r')
+        f = open_text(file, 'r')
 
     # This should just pass a pointer so should be quick and saves a lot of typing
     elif isinstance(file, list):
@@ -34,6 +55,14 @@ def read(file=None, **kwargs):
     # creating an empty GCODE object to then populate
     code = gcode(**kwargs)
 
+    # the filament used is counted all at once after the lines are read. Lines
+    # written to a sink leave memory so they are counted as they are read
+    code._track_e = code.sink is not None
+
+    # the last G0 or G1 command. Modal GCODE leaves it out of the lines that follow
+    # so lines of only axes, speed, and extrusion repeat it
+    motion = None
+
     
     # iterating over all lines in file f
     for line in f:
@@ -41,6 +70,10 @@ def read(file=None, **kwargs):
         # removes whitespace from the beginning and end of the string
         line = line.lstrip().rstrip('\n ')
 
+        # a line of only words continues the last motion command
+        if line and line[0] in 'XYZFE' and motion is not None:
+            line = motion + ' ' + line
+
         # if the line is a blank line
         if line == '':
             
@@ -72,6 +105,12 @@ def read(file=None, **kwargs):
 
             # strinping extra spaces from commands and breaking it into seperate commands
             commands = commands.split(' ')
+
+            # arcs end the last motion command as they need their centers
+            if commands[0] in ('G0', 'G1'):
+                motion = commands[0]
+            elif commands[0] in ('G2', 'G3'):
+                motion = None
             
             # iterating over all elements in a single line of GCODE
             for i in commands[1:]:
@@ -89,6 +128,13 @@ def read(file=None, **kwargs):
                 elif i[0] == 'Z':
                     k['z'] = float(i[1:])
 
+                # checking for the center of an arc
+                elif i[0] == 'I':
+                    k['i'] = float(i[1:])
+
+                elif i[0] == 'J':
+                    k['j'] = float(i[1:])
+
                 # checking for speed
                 elif i[0] == 'F':
                     # the division by 60 accounts for unit conversions in the
@@ -242,5 +288,69 @@ def read(file=None, **kwargs):
     if isinstance(file, str):
         f.close()
 
+    # counting the filament used by every line
+    if not code._track_e:
+        code._count_extrusion()
+        code._track_e = True
+
     # returning the filled gcode object
     return code
+
+
+# hidden function that loads a program from its cache if the file has not changed
+# since the cache was made. Otherwise the file is read and the cache is made
+def _cached(file, cache, kwargs):
+
+    # the cache is next to the file or in the given directory. The name of the
+    # directory of the file is hashed so files of the same name do not share a cache
+    if cache is True:
+        name = file + '.gcb'
+    else:
+        folder = blake2b(path.abspath(path.dirname(file)).encode('utf-8'), digest_size=4).hexdigest()
+        name = path.join(cache, '{}.{}.gcb'.format(path.basename(file), folder))
+
+    info = stat(file)
+    digest = None
+
+    # a cache that can not be read is made again. The contents are only hashed when
+    # the time modified changed, like after the file is copied
+    try:
+        meta = binary_header(name)['meta']
+        if meta[0] == info.st_size:
+            if meta[1] == info.st_mtime_ns:
+                return readbin(name, **kwargs)
+            digest = _file_hash(file)
+            if meta[2] == digest:
+                return readbin(name, **kwargs)
+    except (OSError, ValueError, KeyError, TypeError, IndexError):
+        pass
+
+    if digest is None:
+        digest = _file_hash(file)
+    key = [info.st_size, info.st_mtime_ns, digest]
+
+    code = read(file, **kwargs)
+
+    # writing to a temporary file first so a cache is never left half written. A
+    # cache that can not be written only costs the next read
+    try:
+        if cache is not True:
+            makedirs(cache, exist_ok=True)
+        save_binary(code, name + '.tmp', meta=key)
+        replace(name + '.tmp', name)
+    except OSError:
+        if path.exists(name + '.tmp'):
+            remove(name + '.tmp')
+
+    return code
+
+
+# hidden function that gives the hash of the contents of a file
+def _file_hash(file):
+
+    h = blake2b(digest_size=16)
+    with open(file, 'rb') as f:
+        for block in iter(lambda: f.read(2**20), b''):
+            h.update(block)
+
+    return h.hexdigest()
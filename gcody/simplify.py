@@ -0,0 +1,157 @@
+'''
+Module with functions to simplify the paths of gcode by removing points that
+lie within a tolerance of the simplified path
+'''
+from numpy import asarray, ascontiguousarray, zeros, arange, repeat, cumsum, concatenate, flatnonzero, \
+    maximum, sqrt, clip, where, searchsorted, bincount, nan, float64
+
+
+# function that gives the distance from each point to a line segment. The arrays are
+# given by columns so that each coordinate is contiguous in memory
+def distance(points, a, b):
+    '''
+    Parameters:
+
+    > POINTS: array of shape (3,n) of points. Each row is a coordinate
+    > A, B: arrays of shape (3,n) of the start and end of the segment of each point
+
+    * Notes: if a segment has zero length, the distance to its start is given
+    '''
+
+    ab = b - a
+    ap = points - a
+
+    # position along the segment of the closest point, limited to the segment
+    length = (ab*ab).sum(axis=0)
+    t = (ap*ab).sum(axis=0) / where(length > 0, length, 1) # numpy
+    t = clip(t, 0, 1) # numpy
+
+    ap -= t*ab
+    return sqrt((ap*ap).sum(axis=0)) # numpy
+
+
+# Ramer-Douglas-Peucker simplification of a path of points. The segments of all
+# parts of the path are split at the same time so each pass is vectorized
+def simplify_path(points, tol, keep=None):
+    '''
+    Parameters:
+
+    > POINTS: array of shape (n,3) of the points of the path in order
+    > TOL: the largest distance a removed point can be from the simplified path.
+        A tolerance of zero only removes points that are exactly collinear
+    > KEEP: optional boolean array of shape (n,) of points that must be kept. The
+        first and last points are always kept
+
+    Returns:
+
+    > KEEP: boolean array of shape (n,) of the points of the simplified path
+    > DEVIATION: the largest distance of a removed point from the simplified path
+    '''
+
+    # each coordinate as a contiguous row
+    points = ascontiguousarray(asarray(points, dtype=float64).T) # numpy
+    n = points.shape[1]
+
+    # points that must be kept
+    if keep is None:
+        keep = zeros(n, dtype=bool) # numpy
+    else:
+        keep = asarray(keep, dtype=bool).copy() # numpy
+
+    if n == 0:
+        return keep, 0.0
+
+    keep[0] = True
+    keep[-1] = True
+
+    # the segments between kept points that still have points to check
+    fixed = flatnonzero(keep) # numpy
+    start = fixed[:-1]
+    end = fixed[1:]
+
+    deviation = 0.0
+
+    while True:
+
+        # removing segments with no points between the ends
+        count = end - start - 1
+        left = count > 0
+        start, end, count = start[left], end[left], count[left]
+
+        if len(start) == 0:
+            break
+
+        # index of each point between the ends and the segment it belongs to
+        seg = repeat(arange(len(start)), count) # numpy
+        first = cumsum(count) - count # numpy
+        index = arange(count.sum()) - first[seg] + start[seg] + 1 # numpy
+
+        # distance of the points from their segment and the largest of each segment
+        d = distance(points[:, index], points[:, start][:, seg], points[:, end][:, seg])
+        d_max = maximum.reduceat(d, first) # numpy
+
+        # the first point of each segment with the largest distance
+        far = flatnonzero(d == d_max[seg]) # numpy
+        far = far[concatenate(([True], seg[far][1:] != seg[far][:-1]))] # numpy
+
+        # segments with all points within the tolerance are done
+        split = d_max > tol
+        if not split.all():
+            deviation = max(deviation, d_max[~split].max())
+
+        # keeping the farthest point and splitting the segment there
+        mid = index[far[split]]
+        keep[mid] = True
+        start = concatenate((start[split], mid)) # numpy
+        end = concatenate((mid, end[split])) # numpy
+
+    return keep, float(deviation)
+
+
+# function that fills each element that is not given with the last given element
+def fill_forward(x, given, first=0):
+    '''
+    Parameters:
+
+    > X: array of shape (n,)
+    > GIVEN: boolean array of shape (n,) of the elements to keep
+    > FIRST: the value of elements before the first given element
+    '''
+
+    index = where(given, arange(len(x)), -1) # numpy
+    maximum.accumulate(index, out=index) # numpy
+
+    out = asarray(x)[index]
+    out[index < 0] = first
+
+    return out
+
+
+# function that adds the values of the removed elements to the next element that is
+# kept. Used for relative extrusion where each line extrudes its own amount
+def merge_forward(x, keep):
+    '''
+    Parameters:
+
+    > X: array of shape (n,). Elements that are nan are not given
+    > KEEP: boolean array of shape (n,) of the elements that are kept. The last
+        element must be kept
+
+    * Notes: a new array of shape (n,) is returned. Kept elements are the sum of the
+        given elements since the last kept element. If none are given it is nan
+    '''
+
+    x = asarray(x, dtype=float64) # numpy
+    kept = flatnonzero(keep) # numpy
+
+    # the kept element that each element is added to
+    owner = kept[searchsorted(kept, arange(len(x)))] # numpy
+
+    given = x == x
+    total = bincount(owner, weights=where(given, x, 0), minlength=len(x)) # numpy
+    count = bincount(owner, weights=given, minlength=len(x)) # numpy
+
+    out = x.copy()
+    out[kept] = where(count[kept] > 0, total[kept], nan) # numpy
+
+    return out
@@ -0,0 +1,162 @@
+'''
+Module with functions to open GCODE files for reading and writing text. Files
+ending in .gz, .bz2, or .xz are compressed and decompressed as they are streamed
+so the whole file is never held in memory
+'''
+from io import TextIOWrapper, BufferedReader, BufferedWriter
+from threading import Thread
+from queue import Queue
+import gzip, bz2, lzma
+
+
+# the compression used for each file extension. gzip uses the level of the gzip
+# command since its highest level is several times slower for little gain
+CODECS = {'.gz': lambda file, mode: gzip.GzipFile(file, mode, compresslevel=6),
+          '.bz2': bz2.BZ2File, '.xz': lzma.LZMAFile}
+
+# the number of bytes read or written at a time
+BUFFER = 2**20
+
+
+# function that opens a text file, compressed or not, based on its extension
+def open_text(file, mode='r', threaded=False):
+    '''
+    Parameters:
+
+    > FILE: the file name. Names ending in .gz, .bz2, or .xz are compressed
+    > MODE: 'r' to read or 'w' to write
+    > THREADED: only for writing. If true, text is encoded and compressed in a
+        background thread so the lines can be formatted at the same time
+
+    Returns:
+
+    > F: a text file object
+    '''
+
+    if mode not in ('r', 'w'):
+        raise ValueError('Unknown mode {}. Options are r and w'.format(mode))
+
+    codec = CODECS.get(_extension(file))
+
+    # plain text files only need a larger buffer
+    if codec is None:
+        f = open(file, mode, buffering=BUFFER)
+    elif mode == 'r':
+        f = TextIOWrapper(BufferedReader(codec(file, 'rb'), BUFFER))
+    else:
+        f = TextIOWrapper(BufferedWriter(codec(file, 'wb'), BUFFER))
+
+    if threaded and mode == 'w':
+        return _background(f)
+
+    return f
+
+
+# hidden function that gives the extension of a file name in lower case
+def _extension(file):
+
+    dot = file.rfind('.')
+    return file[dot:].lower() if dot >= 0 else ''
+
+
+# hidden class that writes text to a file from a background thread. Lines are
+# joined into large blocks before they are passed to the thread
+class _background():
+
+    def __init__(self, f, size=8, lines=2**14):
+        '''
+        Parameters:
+
+        > F: the text file to write to
+        > SIZE: the number of blocks that can wait to be written
+        > LINES: the number of lines joined into a block
+        '''
+
+        self.f = f
+        self.lines = lines
+        self.error = None
+
+        # blocks of text waiting to be written. None ends the thread
+        self.queue = Queue(size)
+        self.thread = Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+        return
+
+
+    # methods ----------------------------------------------------------------------
+
+    # passes text to the thread
+    def write(self, text):
+
+        if self.error is not None:
+            raise self.error
+
+        self.queue.put(text)
+        return
+
+
+    # joins the lines into blocks and passes them to the thread
+    def writelines(self, lines):
+
+        block = []
+        for line in lines:
+            block.append(line)
+            if len(block) == self.lines:
+                self.write(''.join(block))
+                block = []
+
+        if block:
+            self.write(''.join(block))
+
+        return
+
+
+    # waits for all text to be written
+    def flush(self):
+        self.queue.join()
+        if self.error is not None:
+            raise self.error
+        self.f.flush()
+        return
+
+
+    # writes the remaining text and closes the file
+    def close(self):
+
+        if self.thread.is_alive():
+            self.queue.put(None)
+            self.thread.join()
+
+        self.f.close()
+        if self.error is not None:
+            raise self.error
+
+        return
+
+
+    # hidden method run by the thread. The text is encoded and compressed here. After
+    # an error the remaining text is taken from the queue but not written
+    def _run(self):
+
+        while True:
+            text = self.queue.get()
+            try:
+                if text is None:
+                    return
+                if self.error is None:
+                    self.f.write(text)
+            except Exception as e:
+                self.error = e
+            finally:
+                self.queue.task_done()
+
+
+    # ---------------------------------------------------------------------------------
+    # methods for builtin function access
+
+    def __enter__(self):
+        return self
+    def __exit__(self, *args):
+        self.close()
+        return
@@ -0,0 +1,537 @@
+'''
+Module with functions to order disconnected groups of a path, like islands of
+infill, so that the print head travels as little as possible between them
+'''
+from time import perf_counter
+from bisect import bisect_left
+from math import dist, inf
+from numpy import asarray, ascontiguousarray, zeros, arange, concatenate, where, sqrt, clip, flatnonzero, vstack, \
+    argsort, argpartition, take_along_axis, uint64, float64
+
+
+# function that gives the length of the travel between groups visited in an order
+def travel_length(starts, ends, order=None, flip=None, origin=None, end=None):
+    '''
+    Parameters:
+
+    > STARTS, ENDS: arrays of shape (k,3) of the first and last point of each group
+    > ORDER: array of shape (k,) of the groups in the order they are visited.
+        Default to the order they are given
+    > FLIP: boolean array of shape (k,) of the groups in ORDER that are visited from
+        their end to their start
+    > ORIGIN: the position before the first group. If None, the travel to the first
+        group is not counted
+    > END: the position after the last group. If None, the travel from the last
+        group is not counted
+    '''
+
+    starts = asarray(starts, dtype=float64) # numpy
+    ends = asarray(ends, dtype=float64) # numpy
+
+    if order is None:
+        order = arange(len(starts)) # numpy
+    if flip is None:
+        flip = zeros(len(order), dtype=bool) # numpy
+
+    if len(order) == 0:
+        return 0.0
+
+    # the point each group is entered and left at
+    s, e = starts[order], ends[order]
+    entry = where(flip[:, None], e, s) # numpy
+    exits = where(flip[:, None], s, e) # numpy
+
+    if origin is not None:
+        exits = concatenate((asarray(origin, dtype=float64)[None], exits)) # numpy
+    else:
+        entry = entry[1:]
+
+    if end is not None:
+        entry = concatenate((entry, asarray(end, dtype=float64)[None])) # numpy
+
+    return float(sqrt(((entry - exits[:len(entry)])**2).sum(axis=1)).sum()) # numpy
+
+
+# function that orders groups of a path to reduce the travel between them. Groups
+# are first visited nearest neighbour first, then the order is improved with 2-opt
+# and Or-opt moves until no move helps or the time runs out
+def order_groups(starts, ends, reversible=True, origin=None, end=None, time_budget=1.0, k=8):
+    '''
+    Parameters:
+
+    > STARTS, ENDS: arrays of shape (k,3) of the first and last point of each group
+    > REVERSIBLE: boolean or boolean array of shape (k,) of the groups that can be
+        visited from their end to their start
+    > ORIGIN: the position before the first group. Default to the start of the
+        first group
+    > END: the position the print head moves to after the last group. If None,
+        the last group can end anywhere
+    > TIME_BUDGET: the most seconds spent improving the order after the nearest
+        neighbour order is found
+    > K: the number of nearby group ends that are checked for each move
+
+    Returns:
+
+    > ORDER: array of shape (k,) of the groups in the order they are visited
+    > FLIP: boolean array of shape (k,) of the groups in ORDER that are reversed
+    > BEFORE: the length of the travel in the given order
+    > AFTER: the length of the travel in the new order
+
+    * Notes: nothing is computed between every pair of groups, the neighbours of
+        each group end are found from the order of the ends along a space filling
+        curve. If the new order is not shorter, the given order is returned
+    '''
+
+    starts = ascontiguousarray(starts, dtype=float64) # numpy
+    ends = ascontiguousarray(ends, dtype=float64) # numpy
+    n = len(starts)
+
+    reversible = asarray(reversible, dtype=bool) & (zeros(n) == 0) # numpy
+    if origin is None and n > 0:
+        origin = starts[0]
+
+    before = travel_length(starts, ends, origin=origin, end=end)
+    identity = arange(n), zeros(n, dtype=bool) # numpy
+
+    if n < 2:
+        return identity[0], identity[1], before, before
+
+    # the ends of every group. The start of group g is 2g and its end is 2g+1
+    points = zeros((2*n, 3)) # numpy
+    points[0::2] = starts
+    points[1::2] = ends
+    near = neighbors(points, k, owner=arange(2*n)//2) # numpy
+
+    # groups are visited the way with the shortest travel and improved from there
+    order, flip = _nearest(points, near, reversible, origin)
+    order, flip = _improve(points, near, reversible, origin, end, order, flip, time_budget)
+
+    after = travel_length(starts, ends, order, flip, origin, end)
+    if after >= before:
+        return identity[0], identity[1], before, before
+
+    return order, flip, before, after
+
+
+# function that orders a list of paths to reduce the travel between them
+def order_paths(paths, reverse=True, origin=None, time_budget=1.0):
+    '''
+    Parameters:
+
+    > PATHS: a list of arrays of shape (n,3) of the points of each path
+    > REVERSE: if true, paths can be printed from their last point to their first
+    > ORIGIN: the position before the first path. Default to the start of the
+        first path
+    > TIME_BUDGET: see order_groups
+
+    Returns:
+
+    > PATHS: a new list of the paths in order. Reversed paths are reversed copies
+    > BEFORE: the length of the travel in the given order
+    > AFTER: the length of the travel in the new order
+    '''
+
+    paths = [asarray(i, dtype=float64) for i in paths] # numpy
+    if len(paths) == 0:
+        return [], 0.0, 0.0
+
+    starts = asarray([i[0] for i in paths]) # numpy
+    ends = asarray([i[-1] for i in paths]) # numpy
+
+    order, flip, before, after = order_groups(starts, ends, reverse, origin, None, time_budget)
+
+    return [paths[i][::-1].copy() if f else paths[i] for i, f in zip(order.tolist(), flip.tolist())], before, after
+
+
+# function that finds the K nearest points of each point. The candidates of each
+# point are the points next to it along two space filling curves, so this is only
+# close to the true nearest points but takes O(n log n) time
+def neighbors(points, k=8, window=8, owner=None):
+    '''
+    Parameters:
+
+    > POINTS: array of shape (n,3) of points. Only x and y are used to find
+        candidates but the distance is in 3 dimensions
+    > K: the number of neighbours of each point
+    > WINDOW: the number of points checked on each side along each curve
+    > OWNER: optional array of shape (n,). Points with the same owner are not
+        neighbours
+
+    Returns:
+
+    > NEAR: array of shape (n,K) of the index of the neighbours of each point
+        sorted by distance. Missing neighbours are -1
+    '''
+
+    points = asarray(points, dtype=float64) # numpy
+    n = len(points)
+    if owner is None:
+        owner = arange(n) # numpy
+
+    # the points next to each point along a Z order curve and along the same curve
+    # moved by a third of the bed so points on either side of its seams are close
+    lo, span = _bounds(points)
+    offsets = arange(-window, window + 1) # numpy
+    offsets = offsets[offsets != 0]
+
+    cand = []
+    for shift in [0.0, span/3]:
+        rank = argsort(_morton((points[:, :2] - lo + shift)/(span + shift))) # numpy
+        where_is = zeros(n, dtype=int) # numpy
+        where_is[rank] = arange(n) # numpy
+        cand.append(rank[clip(where_is[:, None] + offsets[None, :], 0, n - 1)]) # numpy
+    cand = concatenate(cand, axis=1) # numpy
+
+    # each candidate only once
+    cand.sort(axis=1)
+    d = zeros(cand.shape) # numpy
+    for i in range(points.shape[1]):
+        d += (points[cand, i] - points[:, i, None])**2
+    d[owner[cand] == owner[:, None]] = inf
+    d[:, 1:][cand[:, 1:] == cand[:, :-1]] = inf
+
+    # the K closest candidates in order of distance
+    k = min(k, cand.shape[1])
+    best = argpartition(d, k - 1, axis=1)[:, :k] if k < cand.shape[1] else argsort(d, axis=1) # numpy
+    best = take_along_axis(best, argsort(take_along_axis(d, best, axis=1), axis=1), axis=1) # numpy
+
+    near = take_along_axis(cand, best, axis=1) # numpy
+    near[take_along_axis(d, best, axis=1) == inf] = -1
+
+
+    return near
+
+
+# hidden function that gives the Z order (Morton code) of points in the unit square
+def _morton(xy):
+
+    q = (clip(xy, 0, 1)*65535).astype(uint64) # numpy
+
+    # spreading the 16 bits of each coordinate out to every other bit
+    v = q.copy()
+    for s, m in _spread:
+        v = (v | (v << uint64(s))) & uint64(m) # numpy
+
+    return v[:, 0] | (v[:, 1] << uint64(1)) # numpy
+
+
+# hidden function that gives the Z order of a single point in the unit square
+def _morton_one(x, y):
+
+    code = 0
+    for i, v in enumerate([x, y]):
+        v = int(min(max(v, 0), 1)*65535)
+        for s, m in _spread:
+            v = (v | (v << s)) & m
+        code |= v << i
+
+    return code
+
+
+# the shifts and masks that spread 16 bits out to every other bit
+_spread = [(16, 0x0000FFFF0000FFFF), (8, 0x00FF00FF00FF00FF), (4, 0x0F0F0F0F0F0F0F0F),
+           (2, 0x3333333333333333), (1, 0x5555555555555555)]
+
+
+# hidden function that visits the groups nearest neighbour first. The nearest
+# unvisited group end is taken from the neighbours of the last end when it has one,
+# otherwise from the unvisited ends closest to the position along the Z order curves
+def _nearest(points, near, reversible, origin):
+
+    n = len(points)//2
+
+    # the group ends that can be entered at. Reversible groups can be entered at their end
+    enter = zeros(2*n, dtype=bool) # numpy
+    enter[0::2] = True
+    enter[1::2] = reversible
+    ends = flatnonzero(enter) # numpy
+
+    # the cells of a fine grid of the bed in the order of each curve. The cells
+    # of the ends are sorted so the cells next to any position can be found
+    lo, span = _bounds(vstack((points, asarray(origin)[None]))) # numpy
+    curves = []
+    for shift in [0.0, span/3]:
+        code = _morton((points[ends, :2] - lo + shift)/(span + shift))
+        rank = argsort(code) # numpy
+        curves.append(_curve(code[rank], ends[rank].tolist(), lo, span, shift))
+
+    # where each end is along each curve
+    slot = []
+    for c in curves:
+        s = zeros(2*n, dtype=int) # numpy
+        s[c.ids] = arange(len(c.ids)) # numpy
+        slot.append(s.tolist())
+    links = list(zip(curves, slot))
+
+    p = [tuple(i) for i in points.tolist()]
+    near = near.tolist()
+    alive = enter.tolist()
+
+    order = []
+    flip = []
+    here = tuple(origin)
+    last = -1
+
+    for _ in range(n):
+
+        # the closest unvisited neighbour of the last end
+        q = -1
+        if last >= 0:
+            for c in near[last]:
+                if c >= 0 and alive[c]:
+                    q = c
+                    break
+
+        # the closest of the unvisited ends on either side of the position along
+        # each curve
+        if q < 0:
+            best = inf
+            for c in curves:
+                for i in c.around(here):
+                    d = dist(here, p[i])
+                    if d < best:
+                        best, q = d, i
+
+        g = q//2
+        order.append(g)
+        flip.append(q % 2 == 1)
+
+        # removing both ends of the group from the curves
+        for i in [2*g, 2*g + 1]:
+            if alive[i]:
+                alive[i] = False
+                for c, s in links:
+                    j = s[i]
+                    c.right[j] = j + 1
+                    c.left[j + 1] = j - 1
+
+        # leaving the group from its other end
+        last = q ^ 1
+        here = p[last]
+
+    return asarray(order), asarray(flip, dtype=bool) # numpy
+
+
+# hidden function that gives the corner and the size of the square around the x,y
+# coordinates of points
+def _bounds(points):
+    lo = points[:, :2].min(axis=0)
+    span = max(float((points[:, :2].max(axis=0) - lo).max()), 1e-12)
+    return lo, span
+
+
+# hidden class of the points along a Z order curve that can be removed. Removed
+# points are skipped with pointers to the next point left on each side, which are
+# shortened each time they are followed
+class _curve():
+
+    def __init__(self, codes, ids, lo, span, shift, count=4):
+
+        self.codes = codes.tolist()
+        self.ids = ids
+        self.lo, self.span, self.shift = lo.tolist(), span, shift
+        self.count = count
+
+        # the point left at or after (right) and at or before (left) each slot.
+        # The slots past either end are m and -1. A point is removed by pointing
+        # its slot to the slots on either side
+        m = len(self.ids)
+        self.right = list(range(m + 1))
+        self.left = list(range(-1, m))
+
+        return
+
+    # the first point left at or after slot i
+    def _find_right(self, i):
+        right = self.right
+        while right[i] != i:
+            right[i] = right[right[i]]
+            i = right[i]
+        return i
+
+    # the first point left at or before slot i. Slot i of left is slot i-1
+    def _find_left(self, i):
+        left = self.left
+        while left[i + 1] != i:
+            left[i + 1] = left[left[i + 1] + 1]
+            i = left[i + 1]
+        return i
+
+    # the points left on either side of a position along the curve
+    def around(self, here):
+
+        x = (here[0] - self.lo[0] + self.shift)/(self.span + self.shift)
+        y = (here[1] - self.lo[1] + self.shift)/(self.span + self.shift)
+        start = bisect_left(self.codes, _morton_one(x, y))
+
+        m = len(self.ids)
+        found = []
+
+        i = start
+        for _ in range(self.count):
+            i = self._find_right(i)
+            if i >= m:
+                break
+            found.append(self.ids[i])
+            i += 1
+
+        i = start - 1
+        for _ in range(self.count):
+            if i < 0:
+                break
+            i = self._find_left(i)
+            if i < 0:
+                break
+            found.append(self.ids[i])
+            i -= 1
+
+        return found
+
+
+# hidden function that improves the order of the groups with 2-opt moves, which
+# reverse a run of groups, and Or-opt moves, which move up to 3 groups elsewhere
+def _improve(points, near, reversible, origin, end, order, flip, time_budget):
+
+    stop = perf_counter() + time_budget
+    n = len(order)
+
+    # the origin and end are the last points
+    p = [tuple(i) for i in points.tolist()] + [tuple(origin)]
+    o = len(p) - 1
+    z = -1
+    if end is not None:
+        p.append(tuple(end))
+        z = len(p) - 1
+    near = near.tolist()
+    rev = reversible.tolist()
+
+    order = order.tolist()
+    flip = flip.tolist()
+    pos = [0]*n
+    for i, g in enumerate(order):
+        pos[g] = i
+
+    # the ends a group is entered and left at in its position
+    def entry(i):
+        return 2*order[i] + flip[i]
+    def leave(i):
+        return o if i < 0 else 2*order[i] + 1 - flip[i]
+
+    # distance between ends. Without an end, the point after the last group is -1
+    # and costs nothing
+    def d(a, b):
+        return 0.0 if a < 0 or b < 0 else dist(p[a], p[b])
+    def entry_after(i):
+        return entry(i + 1) if i + 1 < n else z
+
+    # reverses the groups from position i to j
+    def reverse(i, j):
+        order[i:j + 1] = order[i:j + 1][::-1]
+        flip[i:j + 1] = [not f for f in flip[i:j + 1][::-1]]
+        for k in range(i, j + 1):
+            pos[order[k]] = k
+
+    # moves the L groups at position i to after position j
+    def move(i, L, j, backward):
+        seg, segf = order[i:i + L], flip[i:i + L]
+        if backward:
+            seg, segf = seg[::-1], [not f for f in segf[::-1]]
+        del order[i:i + L], flip[i:i + L]
+        j = j + 1 if j < i else j + 1 - L
+        order[j:j] = seg
+        flip[j:j] = segf
+        for k in range(min(i, j), max(i + L, j + L)):
+            pos[order[k]] = k
+
+    improved = True
+    while improved and perf_counter() < stop:
+        improved = False
+
+        for i in range(n):
+
+            if perf_counter() > stop:
+                break
+
+            # 2-opt. The travel into position i is swapped for one that is shorter
+            a, b = leave(i - 1), entry(i)
+            ab = d(a, b)
+            done = False
+
+            for c in near[a] if a != o else ():
+                if c < 0:
+                    break
+                dc = d(a, c)
+                if dc >= ab:
+                    break
+                j = pos[c//2]
+
+                # reversing i to j joins the end of j to the end of position i-1
+                if j >= i and c == leave(j):
+                    nxt = entry_after(j)
+                    gain = ab + d(c, nxt) - dc - d(b, nxt)
+                    if gain > 1e-9 and all(rev[g] for g in order[i:j + 1]):
+                        reverse(i, j)
+                        done = True
+                        break
+
+            if not done:
+                for c in near[b]:
+                    if c < 0:
+                        break
+                    dc = d(b, c)
+                    if dc >= ab:
+                        break
+                    j = pos[c//2]
+
+                    # reversing j to i-1 joins the start of j to the start of i
+                    if j < i and c == entry(j):
+                        prev = leave(j - 1)
+                        gain = d(prev, c) + ab - d(prev, a) - dc
+                        if gain > 1e-9 and all(rev[g] for g in order[j:i]):
+                            reverse(j, i - 1)
+                            done = True
+                            break
+
+            # Or-opt. Runs of 1 to 3 groups are moved between two other groups
+            if not done:
+                for L in [1, 2, 3]:
+                    if i + L > n:
+                        break
+
+                    s, e = entry(i), leave(i + L - 1)
+                    prev, nxt = leave(i - 1), entry_after(i + L - 1)
+                    removed = d(prev, s) + d(e, nxt) - d(prev, nxt)
+                    backward_ok = all(rev[g] for g in order[i:i + L])
+
+                    # positions to move the run after. The run is joined to a nearby
+                    # end on one side
+                    options = []
+                    for end, other in [(s, e), (e, s)]:
+                        for c in near[end]:
+                            if c < 0:
+                                break
+                            if d(end, c) >= removed:
+                                break
+                            j = pos[c//2]
+                            if c == leave(j):
+                                options.append((j, end != s))
+                            else:
+                                options.append((j - 1, end == s))
+
+                    for j, backward in options:
+                        if i - 1 <= j < i + L or (backward and not backward_ok):
+                            continue
+                        x, y = leave(j), entry_after(j)
+                        first, last = (e, s) if backward else (s, e)
+                        gain = removed - d(x, first) - d(last, y) + d(x, y)
+                        if gain > 1e-9:
+                            move(i, L, j, backward)
+                            done = True
+                            break
+
+                    if done:
+                        break
+
+            improved |= done
+
+    return asarray(order), asarray(flip, dtype=bool) # numpy
@@ -4,14 +4,15 @@
 import matplotlib.pyplot as plt
 from mpl_toolkits.mplot3d import Axes3D
 from matplotlib import style, use
-from numpy import array
+from numpy import array, asarray
+from numpy.linalg import inv
 from time import time as t
 
 
 # A function that generates a 3d line plot given a matrix of values
 def plot3(history, *args, title=None, give=False, plot_style='default',
          axis_label=None, make_square=True, figsize=None,backend='matplotlib',
-         **kwargs):
+         pick=None, **kwargs):
 
     '''
     Parameters:
@@ -23,6 +24,8 @@ def plot3(history, *args, title=None, give=False, plot_style='default',
     > GIVE : this command makes the method return the figure after the path data is
             plotted.
     > BACKEND: either matplotlib or mayavi.
+    > PICK: a function called with two points of shape (3,) on the line of sight
+        under a point that is double clicked. Only used with matplotlib
     '''
 
     if backend == 'matplotlib':
@@ -39,8 +42,8 @@ def plot3(history, *args, title=None, give=False, plot_style='default',
         ax = fig.gca(projection='3d')
         ax.set_aspect('equal')
 
-        # makes history a numpy array
-        history = array(history)
+        # makes history a numpy array. Does not copy if it already is one
+        history = asarray(history) # numpy
 
 
         # getting motion history
@@ -78,6 +81,10 @@ def plot3(history, *args, title=None, give=False, plot_style='default',
         if title:
             ax.set_title(title)
 
+        # double clicking gives PICK the line under the mouse
+        if pick is not None:
+            fig.canvas.mpl_connect('button_press_event', lambda event: _pick(ax, event, pick))
+
 
         # determines whether to show the figure or to return it
         if give:
@@ -91,8 +98,8 @@ def plot3(history, *args, title=None, give=False, plot_style='default',
         # getting the needing import to plot in mayavi
         from mayavi import mlab
 
-        # makes history a numpy array
-        history = array(history)
+        # makes history a numpy array. Does not copy if it already is one
+        history = asarray(history) # numpy
 
         # getting x,y,z coordinates
         x = history[:,0]
@@ -177,7 +184,7 @@ def color_view(history, time, *args, cmap='jet', axis_label=None, fig_title=None
 
         # makes history a numpy array
         # if history is already a numpy array then this does nothing
-        history = array(history)
+        history = asarray(history) # numpy
 
         # getting motion history
         X = history[:, 0]
@@ -474,3 +481,27 @@ def slider_view(update, *args, slide_geo=[0.25, 0.1, 0.65, 0.03],
     # showing the figure
     plt.show()
     return
+
+
+# hidden function that finds the line of sight under a double click in a 3d plot
+# and gives it to PICK
+def _pick(ax, event, pick):
+
+    if not event.dblclick or event.inaxes is not ax or event.xdata is None:
+        return
+
+    # the projection of the plot maps points to the plane of the figure and a depth.
+    # Points under the click at the nearest and farthest depth of the corners of the
+    # axes are on the line of sight
+    m = ax.get_proj()
+    corners = array([[x, y, z, 1] for x in ax.get_xlim3d() for y in ax.get_ylim3d() for z in ax.get_zlim3d()]) # numpy
+    depth = m @ corners.T
+    depth = depth[2]/depth[3]
+
+    ends = inv(m) @ array([[event.xdata, event.ydata, depth.min(), 1],
+                           [event.xdata, event.ydata, depth.max(), 1]]).T # numpy
+    ends = (ends[:3]/ends[3]).T
+
+    pick(ends[0], ends[1])
+
+    return